@@ -1,11 +1,22 @@
+from collections import namedtuple
 from json import loads, dumps
+import logging
+import os
+import threading
+import time
 from uuid import uuid4
 from datetime import datetime, timedelta
 from flask.sessions import SessionInterface, SessionMixin
 from flask_login import _create_identifier
+from dataactcore.config import CONFIG_BROKER
 from dataactcore.interfaces.db import GlobalDB
 from dataactcore.models.userModel import SessionMap
 
+logger = logging.getLogger(__name__)
+
+# Session as stored in the session table, data is the session's JSON and expiration is in seconds since 1970
+StoredSession = namedtuple('StoredSession', ['data', 'expiration'])
+
 
 class LoginSession:
     """
@@ -72,6 +83,93 @@ class UserSession(dict, SessionMixin):
     pass
 
 
+class SessionCache:
+    """
+    Sessions this process has read from or written to the session table, so session checks don't have to read their
+    session from the table. Other broker processes can change a session in the table, so entries are only trusted
+    for ttl seconds, and only session checks read from the cache.
+    """
+
+    def __init__(self, ttl, max_size=10000):
+        """
+
+        args
+
+        ttl - seconds a session is kept in the cache
+        max_size - number of sessions to keep, the cache is emptied when it grows past this
+
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # uid -> (StoredSession, time it was cached)
+        self.sessions = {}
+
+    def get(self, uid):
+        """ Get the cached session, None if it isn't cached or has been cached for longer than the TTL """
+        with self.lock:
+            cached = self.sessions.get(uid)
+            if cached is None:
+                return None
+            if time.time() - cached[1] > self.ttl:
+                del self.sessions[uid]
+                return None
+            return cached[0]
+
+    def set(self, uid, stored_session):
+        with self.lock:
+            if len(self.sessions) >= self.max_size:
+                self.sessions.clear()
+            self.sessions[uid] = (stored_session, time.time())
+
+    def remove(self, uid):
+        with self.lock:
+            self.sessions.pop(uid, None)
+
+    def remove_expired(self, now):
+        """ Drop the sessions that expired before now (seconds since 1970) """
+        with self.lock:
+            for uid in [uid for uid, (stored, _) in self.sessions.items() if stored.expiration < now]:
+                del self.sessions[uid]
+
+    def clear(self):
+        with self.lock:
+            self.sessions.clear()
+
+
+class SessionSweeper(threading.Thread):
+    """
+    Removes expired sessions from the session table every interval seconds, so it isn't done inside user requests
+    """
+
+    def __init__(self, app, interval):
+        """
+
+        args
+
+        app - Flask app to run the sweeps in
+        interval - seconds between sweeps
+
+        """
+        super(SessionSweeper, self).__init__(daemon=True)
+        self.app = app
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    SessionTable.clear_sessions()
+                except Exception:
+                    logger.exception('Unable to clear expired sessions')
+                finally:
+                    GlobalDB.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
 class UserSessionInterface(SessionInterface):
     """
 
@@ -79,12 +177,17 @@ class UserSessionInterface(SessionInterface):
 
     """
 
-    SESSION_CLEAR_COUNT_LIMIT = 10
-
-    CountLimit = 1
+    # Sessions are only written back to extend their expiration once it has moved by this many seconds
+    EXPIRATION_REFRESH_INTERVAL = 3600
+    SWEEP_INTERVAL = 3600
+    # Routes that may use a session cached by this process, which can be up to session_cache_ttl seconds out of date.
+    # Every other route reads its session from the table, so a logout applies to them right away in every process
+    CACHED_SESSION_PATHS = ('/v1/session/',)
 
     def __init__(self):
-        return
+        self.sweeper = None
+        self.sweeper_pid = None
+        self.sweeper_lock = threading.Lock()
 
     def open_session(self, app, request):
         """
@@ -97,14 +200,18 @@ class UserSessionInterface(SessionInterface):
         implements the open_session method that pulls or creates a new UserSession object
 
         """
+        self.start_sweeper(app)
         sid = request.headers.get("x-session-id")
-        if sid and SessionTable.does_session_exist(sid):
-            if SessionTable.get_timeout(sid) > to_unix_time(datetime.utcnow()):
+        if sid:
+            stored_session = SessionTable.get_session(sid, use_cache=request.path in self.CACHED_SESSION_PATHS)
+            if stored_session is not None and stored_session.expiration > to_unix_time(datetime.utcnow()):
                 session_dict = UserSession()
                 # Read data as json
-                data = loads(SessionTable.get_data(sid))
+                data = loads(stored_session.data)
                 for key in data.keys():
                     session_dict[key] = data[key]
+                # Kept so the session is only written back over the data it was read from
+                session_dict.stored_session = stored_session
                 return session_dict
         # This can be made better most likely need to do research
         # Maybe Hash(time + server id + random number)? Want to prevent any conflicts
@@ -121,36 +228,57 @@ class UserSessionInterface(SessionInterface):
         request -- (Request)  the request object
         session -- (Session)  the session object
 
-        implements the save_session method that saves the session or clears it
-        based on the timeout limit, this function also extends the expiration time of the current session
+        implements the save_session method that saves the session if it has changed, this function also extends the
+        expiration time of the current session
 
         """
         if not session:
             return
+        stored_session = getattr(session, 'stored_session', None)
         # Extend the expiration based on either the time out limit set here or
         # the permanent_session_lifetime property of the app
         if self.get_expiration_time(app, session):
             expiration = self.get_expiration_time(app, session)
         else:
-            if "session_check" in session and session["session_check"] and \
-                    SessionTable.does_session_exist(session["sid"]):
+            if "session_check" in session and session["session_check"] and stored_session is not None:
                 # This is just a session check, don't extend expiration time
-                expiration = SessionTable.get_timeout(session["sid"])
+                expiration = stored_session.expiration
                 # Make sure next route call does not get counted as session check
                 session["session_check"] = False
             else:
                 expiration = datetime.utcnow() + timedelta(seconds=SessionTable.TIME_OUT_LIMIT)
         if "_uid" not in session:
             LoginSession.reset_id(session)
-        SessionTable.new_session(session["sid"], session, expiration)
-        UserSessionInterface.CountLimit += 1
-        if UserSessionInterface.CountLimit % UserSessionInterface.SESSION_CLEAR_COUNT_LIMIT == 0:
-            SessionTable.clear_sessions()
-            UserSessionInterface.CountLimit = 1
+
+        # Only write the session back if its data changed or its expiration needs extending
+        expiration = to_unix_time(expiration)
+        if stored_session is None:
+            SessionTable.new_session(session["sid"], session, expiration)
+        elif dumps(session) != stored_session.data or \
+                abs(expiration - stored_session.expiration) >= self.EXPIRATION_REFRESH_INTERVAL:
+            stored_data = loads(stored_session.data)
+            if any(session.get(key) != stored_data.get(key) for key in ('login', 'name')):
+                # Logging in or out always applies, and the cached copy is dropped rather than trusted
+                SessionTable.new_session(session["sid"], session, expiration)
+                SessionTable.cache.remove(session["sid"])
+            else:
+                # Anything else is only written if the session hasn't changed since it was read, so a stale copy
+                # never undoes a logout made through another process
+                SessionTable.new_session(session["sid"], session, expiration, previous=stored_session)
 
         # Return session ID as header x-session-id
         response.headers["x-session-id"] = session["sid"]
 
+    def start_sweeper(self, app):
+        """ Start clearing expired sessions in the background, once in each process serving the app """
+        if self.sweeper_pid == os.getpid():
+            return
+        with self.sweeper_lock:
+            if self.sweeper_pid != os.getpid():
+                self.sweeper = SessionSweeper(app, CONFIG_BROKER.get('session_sweep_interval', self.SWEEP_INTERVAL))
+                self.sweeper.start()
+                self.sweeper_pid = os.getpid()
+
 
 class SessionTable:
     """
@@ -163,6 +291,8 @@ class SessionTable:
     """
     TIME_OUT_LIMIT = 604800
 
+    cache = SessionCache(CONFIG_BROKER.get('session_cache_ttl', 30))
+
     @staticmethod
     def clear_sessions():
         """
@@ -172,6 +302,25 @@ class SessionTable:
         sess = GlobalDB.db().session
         sess.query(SessionMap).filter(SessionMap.expiration < new_time).delete()
         sess.commit()
+        SessionTable.cache.remove_expired(new_time)
+
+    @staticmethod
+    def get_session(uid, use_cache=False):
+        """
+        arguments:
+
+        uid -- (String) the uid
+        use_cache -- (boolean) whether a copy of the session cached by this process will do
+        return (StoredSession) the session's data and expiration, None if there is no session
+        """
+        stored_session = SessionTable.cache.get(uid) if use_cache else None
+        if stored_session is None:
+            row = GlobalDB.db().session.query(SessionMap.data, SessionMap.expiration).filter_by(uid=uid).one_or_none()
+            if row is None:
+                return None
+            stored_session = StoredSession(row.data, row.expiration)
+            SessionTable.cache.set(uid, stored_session)
+        return stored_session
 
     @staticmethod
     def does_session_exist(uid):
@@ -181,12 +330,7 @@ class SessionTable:
         uid -- (String) the uid
         return (boolean) if the session
         """
-        item = GlobalDB.db().session.query(SessionMap).filter_by(uid=uid).one_or_none()
-        if item is not None:
-            # session found
-            return True
-        else:
-            return False
+        return SessionTable.get_session(uid) is not None
 
     @staticmethod
     def get_timeout(uid):
@@ -196,7 +340,7 @@ class SessionTable:
         uid -- (String) the uid
         return (int) time when the session expires
         """
-        return GlobalDB.db().session.query(SessionMap).filter_by(uid=uid).one().expiration
+        return SessionTable.get_session(uid).expiration
 
     @staticmethod
     def get_data(uid):
@@ -204,28 +348,40 @@ class SessionTable:
         uid -- (String) the uid
         return (Session) the session data
         """
-        return GlobalDB.db().session.query(SessionMap).filter_by(uid=uid).one().data
+        return SessionTable.get_session(uid).data
 
     @staticmethod
-    def new_session(uid, data, expiration):
+    def new_session(uid, data, expiration, previous=None):
         """ Updates current session or creates a new one if no session exists
         arguments:
 
         uid  -- (String) the session id
         data -- (String) the data for the session
         expiration -- (int) the time in seconds from 1970 when the session is no longer active
+        previous -- (StoredSession) the session as it was read, if given the session is only updated if it still
+            matches it in the table
 
         Updates the existing session or creates a new one
+
+        return (boolean) whether the session was written
         """
-        # Try converting session to json
+        # Try converting session to json, the expiration is stored in whole seconds
+        stored_session = StoredSession(dumps(data), int(to_unix_time(expiration)))
         sess = GlobalDB.db().session
-        user_session = sess.query(SessionMap).filter_by(uid=uid).one_or_none()
-        if user_session is None:
+        # Modify existing session
+        query = sess.query(SessionMap).filter_by(uid=uid)
+        if previous is not None:
+            query = query.filter_by(data=previous.data, expiration=previous.expiration)
+        updated = query.update({'data': stored_session.data, 'expiration': stored_session.expiration},
+                               synchronize_session=False)
+        if not updated:
+            if previous is not None:
+                # Changed or removed by another process since it was read, the next request reads it again
+                sess.commit()
+                SessionTable.cache.remove(uid)
+                return False
             # No existing session found, create a new one
-            new_session = SessionMap(uid=uid, data=dumps(data), expiration=to_unix_time(expiration))
-            sess.add(new_session)
-        else:
-            # Modify existing session
-            user_session.data = dumps(data)
-            user_session.expiration = to_unix_time(expiration)
+            sess.add(SessionMap(uid=uid, data=stored_session.data, expiration=stored_session.expiration))
         sess.commit()
+        SessionTable.cache.set(uid, stored_session)
+        return True
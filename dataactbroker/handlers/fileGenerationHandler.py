@@ -1,14 +1,12 @@
 import boto3
 import csv
 import logging
-import os
-import smart_open
 
 from datetime import datetime
 from contextlib import contextmanager
+from itertools import islice
 from flask import Flask
 
-from dataactcore.aws.s3Handler import S3Handler
 from dataactcore.config import CONFIG_BROKER
 from dataactcore.interfaces.db import GlobalDB
 from dataactcore.interfaces.function_bag import mark_job_status
@@ -19,11 +17,11 @@ from dataactcore.models.lookups import (JOB_STATUS_DICT, JOB_STATUS_DICT_ID, JOB
 from dataactcore.models.stagingModels import AwardFinancialAssistance, AwardProcurement
 from dataactcore.utils import fileD1, fileD2, fileE, fileF
 from dataactvalidator.filestreaming.csv_selection import write_csv
+from dataactvalidator.filestreaming.s3MultipartWriter import s3_text_writer
 
 
 logger = logging.getLogger(__name__)
 
-CHUNK_SIZE = 1024
 QUERY_SIZE = 10000
 
 
@@ -112,49 +110,36 @@ def generate_d_file(file_type, agency_code, start, end, job_id, file_name, uploa
             # start D file generation
             logger.debug('Starting file {} generation'.format(file_type))
             file_utils = fileD1 if file_type == 'D1' else fileD2
-            full_file_path = "".join([CONFIG_BROKER['d_file_storage_path'], file_name])
-            page_idx = 0
 
-            # create file locally
-            with open(full_file_path, 'w', newline='') as csv_file:
+            if is_local:
+                # create file locally
+                full_file_path = "".join([CONFIG_BROKER['d_file_storage_path'], file_name])
+                csv_file_context = open(full_file_path, 'w', newline='')
+            else:
+                # stream file straight to S3
+                s3 = boto3.client('s3', region_name=CONFIG_BROKER['aws_region'])
+                csv_file_context = s3_text_writer(s3, CONFIG_BROKER['aws_bucket'], upload_name)
+
+            with csv_file_context as csv_file:
                 out_csv = csv.writer(csv_file, delimiter=',', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
 
                 # write headers to file
                 headers = [key for key in file_utils.mapping]
                 out_csv.writerow(headers)
 
+                # stream the rows through a server-side cursor, fetching QUERY_SIZE rows at a time
+                query_rows = iter(file_utils.query_data(sess, agency_code, start, end).
+                                  execution_options(stream_results=True).yield_per(QUERY_SIZE))
+                page_start = 0
                 while True:
-                    # query QUERY_SIZE number of rows
-                    page_start = QUERY_SIZE * page_idx
-                    rows = file_utils.\
-                        query_data(sess, agency_code, start, end, page_start, (QUERY_SIZE * (page_idx + 1))).all()
-
-                    if rows is None:
+                    rows = list(islice(query_rows, QUERY_SIZE))
+                    if not rows:
                         break
 
                     # write records to file
                     logger.debug('Writing rows {}-{} to {} CSV'.format(page_start, page_start + len(rows), file_type))
                     out_csv.writerows(rows)
-                    if len(rows) < QUERY_SIZE:
-                        break
-                    page_idx += 1
-
-            # close file
-            csv_file.close()
-
-            if not is_local:
-                # stream file to S3
-                with open(full_file_path, 'rb') as csv_file:
-                    with smart_open.smart_open(S3Handler.create_file_path(upload_name), 'w') as writer:
-                        while True:
-                            chunk = csv_file.read(CHUNK_SIZE)
-                            if chunk:
-                                writer.write(chunk)
-                            else:
-                                break
-                # close and delete local copy
-                csv_file.close()
-                os.remove(full_file_path)
+                    page_start += len(rows)
 
             # mark this FileRequest as the cached version
             file_request.is_cached_file = True
@@ -270,16 +255,10 @@ def copy_parent_file_request_data(sess, child_job, parent_job, file_type, is_loc
                 logger.debug('Cached {} file CSV already exists in this location'.format(file_type))
                 return
 
-        # copy the parent file into the child's S3 location
+        # copy the parent file into the child's S3 location, S3 copies the data itself (in parts for large files)
         logger.debug('Copying {} file from job {} to job {}'.format(file_type, parent_job.job_id, child_job.job_id))
-        with smart_open.smart_open(S3Handler.create_file_path(parent_job.filename), 'r') as reader:
-            with smart_open.smart_open(S3Handler.create_file_path(child_job.filename), 'w') as writer:
-                while True:
-                    chunk = reader.read(CHUNK_SIZE)
-                    if chunk:
-                        writer.write(chunk)
-                    else:
-                        break
+        s3.copy({'Bucket': CONFIG_BROKER['aws_bucket'], 'Key': parent_job.filename}, CONFIG_BROKER['aws_bucket'],
+                child_job.filename)
 
     # mark job status last so the validation job doesn't start until everything is done
     mark_job_status(child_job.job_id, JOB_STATUS_DICT_ID[parent_job.job_status_id])
@@ -15,7 +15,7 @@ from flask import g, request
 import sqlalchemy as sa
 from sqlalchemy import func, and_
 from sqlalchemy.orm import aliased
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
 from sqlalchemy.sql.expression import case
 from werkzeug.utils import secure_filename
 
@@ -23,11 +23,9 @@ from dataactbroker.permissions import current_user_can, current_user_can_on_subm
 from dataactcore.aws.s3Handler import S3Handler
 from dataactcore.config import CONFIG_BROKER, CONFIG_SERVICES
 from dataactcore.interfaces.db import GlobalDB
-from dataactcore.models.domainModels import (
-    CGAC, FREC, CFDAProgram, SubTierAgency, Zips, States, CountyCode, CityCode, ZipCity, CountryCode)
+from dataactcore.models.domainModels import CGAC, FREC, SubTierAgency, States
 from dataactcore.models.errorModels import File
-from dataactcore.models.stagingModels import (DetachedAwardFinancialAssistance, PublishedAwardFinancialAssistance,
-                                              FPDSContractingOffice)
+from dataactcore.models.stagingModels import DetachedAwardFinancialAssistance, PublishedAwardFinancialAssistance
 from dataactcore.models.jobModels import (Job, Submission, SubmissionNarrative, SubmissionSubTierAffiliation,
                                           RevalidationThreshold, CertifyHistory, CertifiedFilesHistory, FileRequest)
 from dataactcore.models.userModel import User
@@ -37,18 +35,25 @@ from dataactcore.models.lookups import (
     FILE_TYPE_DICT_LETTER_NAME)
 from dataactcore.models.views import SubmissionUpdatedView
 from dataactcore.utils.jsonResponse import JsonResponse
+from dataactcore.utils.referenceDataCache import ReferenceData
 from dataactcore.utils.report import get_cross_file_pairs, report_file_name
 from dataactcore.utils.requestDictionary import RequestDictionary
 from dataactcore.utils.responseException import ResponseException
 from dataactcore.utils.statusCode import StatusCode
 from dataactcore.utils.stringCleaner import StringCleaner
 from dataactcore.interfaces.function_bag import (
-    create_jobs, create_submission, get_error_metrics_by_job_jd, get_error_type, get_submission_status, get_fabs_meta,
+    create_jobs, create_submission, get_error_metrics_by_job_jd, get_error_type, get_submission_summary, get_fabs_meta,
     get_submission_files, mark_job_status, run_job_checks, get_last_validated_date, get_lastest_certified_date)
 from dataactbroker.handlers.fileGenerationHandler import generate_d_file, generate_e_file, generate_f_file
 
 logger = logging.getLogger(__name__)
 
+# Number of FABS rows derived and inserted at a time when publishing
+FABS_PUBLISH_CHUNK_SIZE = 10000
+# Columns of the FABS staging table that aren't copied to the published table
+FABS_STAGING_ONLY_COLUMNS = ['detached_award_financial_assistance_id', 'submission_id', 'job_id', 'row_number',
+                             'is_valid', 'created_at', 'updated_at']
+
 
 class FileHandler:
     """ Responsible for all tasks relating to file upload
@@ -771,43 +776,7 @@ class FileHandler:
                                         "publish.",
                                         StatusCode.CLIENT_ERROR)
 
-            # get all valid lines for this submission
-            query = sess.query(DetachedAwardFinancialAssistance).\
-                filter_by(is_valid=True, submission_id=submission_id).all()
-
-            agency_codes_list = []
-            for row in query:
-                # remove all keys in the row that are not in the intermediate table
-                temp_obj = row.__dict__
-                temp_obj.pop('detached_award_financial_assistance_id', None)
-                temp_obj.pop('submission_id', None)
-                temp_obj.pop('job_id', None)
-                temp_obj.pop('row_number', None)
-                temp_obj.pop('is_valid', None)
-                temp_obj.pop('created_at', None)
-                temp_obj.pop('updated_at', None)
-                temp_obj.pop('_sa_instance_state', None)
-
-                temp_obj = fabs_derivations(temp_obj, sess)
-
-                # if it's a correction or deletion row and an old row is active, update the old row to be inactive
-                if row.correction_late_delete_ind is not None and row.correction_late_delete_ind.upper() in ['C', 'D']:
-                    check_row = sess.query(PublishedAwardFinancialAssistance).\
-                        filter_by(afa_generated_unique=row.afa_generated_unique, is_active=True).one_or_none()
-                    if check_row:
-                        # just creating this as a variable because flake thinks the row is too long
-                        row_id = check_row.published_award_financial_assistance_id
-                        sess.query(PublishedAwardFinancialAssistance).\
-                            filter_by(published_award_financial_assistance_id=row_id).\
-                            update({"is_active": False, "updated_at": row.modified_at}, synchronize_session=False)
-
-                # for all rows, insert the new row (active/inactive should be handled by fabs_derivations)
-                new_row = PublishedAwardFinancialAssistance(**temp_obj)
-                sess.add(new_row)
-
-                # update the list of affected agency_codes
-                if temp_obj['awarding_agency_code'] not in agency_codes_list:
-                    agency_codes_list.append(temp_obj['awarding_agency_code'])
+            agency_codes_list = publish_fabs_rows(sess, submission_id)
 
             # update all cached D2 FileRequest objects that could have been affected by the publish
             for agency_code in agency_codes_list:
@@ -1151,9 +1120,7 @@ def submission_to_dict_for_status(submission):
     JSON for the get_status function"""
     sess = GlobalDB.db().session
 
-    number_of_rows = sess.query(func.sum(Job.number_of_rows)).\
-        filter_by(submission_id=submission.submission_id).\
-        scalar() or 0
+    number_of_rows = get_submission_summary(submission.submission_id).number_of_rows
 
     # @todo replace with a relationship
     cgac = sess.query(CGAC).\
@@ -1224,12 +1191,12 @@ def get_error_metrics(submission):
     sess = GlobalDB.db().session
     return_dict = {}
     try:
-        jobs = sess.query(Job).filter_by(submission_id=submission.submission_id)
+        jobs = sess.query(Job).filter_by(submission_id=submission.submission_id,
+                                         job_type_id=JOB_TYPE_DICT['csv_record_validation'])
         for job in jobs:
-            if job.job_type.name == 'csv_record_validation':
-                file_type = job.file_type.name
-                data_list = get_error_metrics_by_job_jd(job.job_id)
-                return_dict[file_type] = data_list
+            file_type = job.file_type.name
+            data_list = get_error_metrics_by_job_jd(job.job_id)
+            return_dict[file_type] = data_list
         return JsonResponse.create(StatusCode.OK, return_dict)
     except (ValueError, TypeError) as e:
         return JsonResponse.error(e, StatusCode.CLIENT_ERROR)
@@ -1410,7 +1377,7 @@ def serialize_submission(submission):
 
     jobs = sess.query(Job).filter_by(submission_id=submission.submission_id)
     files = get_submission_files(jobs)
-    status = get_submission_status(submission, jobs)
+    status = get_submission_summary(submission.submission_id).status
     certified_on = get_lastest_certified_date(submission)
     agency_name = submission.cgac_agency_name if submission.cgac_agency_name else submission.frec_agency_name
     return {
@@ -1544,7 +1511,97 @@ def map_generate_status(upload_job, validation_job=None):
     return response_status
 
 
-def fabs_derivations(obj, sess):
+def publish_fabs_rows(sess, submission_id):
+    """ Copy the valid rows of a FABS submission to the published table along with their derivations, deactivating
+        the published rows replaced by corrections and deletions. Nothing is committed, so the whole publish can be
+        committed or rolled back together.
+
+    Args:
+        sess: current DB session
+        submission_id: ID of the FABS submission being published
+
+    Returns:
+        list of the awarding agency codes of the published rows
+
+    Raises:
+        MultipleResultsFound: a correction or deletion matches more than one active published row
+    """
+    dafa = DetachedAwardFinancialAssistance.__table__
+    pafa = PublishedAwardFinancialAssistance.__table__
+    valid_rows = and_(dafa.c.submission_id == submission_id, dafa.c.is_valid.is_(True))
+
+    # if it's a correction or deletion row and an old row is active, update the old row to be inactive
+    superseded = and_(valid_rows, func.upper(dafa.c.correction_late_delete_ind).in_(['C', 'D']),
+                      pafa.c.afa_generated_unique == dafa.c.afa_generated_unique, pafa.c.is_active.is_(True))
+    pafa_id = pafa.c.published_award_financial_assistance_id
+    multiple_active = sess.query(pafa.c.afa_generated_unique).filter(superseded).\
+        group_by(pafa.c.afa_generated_unique).having(func.count(sa.distinct(pafa_id)) > 1).first()
+    if multiple_active:
+        raise MultipleResultsFound("Multiple active published rows found for {}".format(multiple_active[0]))
+    sess.execute(pafa.update().where(superseded).values(is_active=False, updated_at=datetime.utcnow()))
+
+    # load the domain data used by the derivations, including the zips used in this submission, up front
+    reference_data = ReferenceData(sess)
+    zip5s, zip9s = set(), set()
+    zips = sess.query(dafa.c.place_of_performance_zip4a, dafa.c.legal_entity_zip5, dafa.c.legal_entity_zip_last4).\
+        filter(valid_rows).distinct()
+    for ppop_zip, legal_entity_zip5, legal_entity_zip_last4 in zips:
+        if ppop_zip and ppop_zip != 'city-wide':
+            zip5s.add(ppop_zip[:5])
+            if len(ppop_zip) > 5:
+                zip9s.add((ppop_zip[:5], ppop_zip[-4:]))
+        if legal_entity_zip5:
+            zip5s.add(legal_entity_zip5)
+            if legal_entity_zip_last4:
+                zip9s.add((legal_entity_zip5, legal_entity_zip_last4))
+    reference_data.load_zips(zip5s, zip9s)
+
+    # remove all keys in the row that are not in the intermediate table
+    row_id = dafa.c.detached_award_financial_assistance_id
+    columns = [column for column in dafa.columns if column.key not in FABS_STAGING_ONLY_COLUMNS]
+    column_keys = [column.key for column in columns]
+
+    agency_codes_list = []
+    last_row_id = None
+    while True:
+        # page through the rows by ID so each chunk is a single index range scan
+        query = sess.query(row_id, *columns).filter(valid_rows)
+        if last_row_id is not None:
+            query = query.filter(row_id > last_row_id)
+        rows = query.order_by(row_id).limit(FABS_PUBLISH_CHUNK_SIZE).all()
+        if not rows:
+            break
+        last_row_id = rows[-1][0]
+
+        published_rows = []
+        for row in rows:
+            published_row = fabs_derivations(dict(zip(column_keys, row[1:])), sess, reference_data)
+            published_rows.append(published_row)
+
+            # update the list of affected agency_codes
+            if published_row['awarding_agency_code'] not in agency_codes_list:
+                agency_codes_list.append(published_row['awarding_agency_code'])
+
+        # for all rows, insert the new row (active/inactive should be handled by fabs_derivations)
+        sess.bulk_insert_mappings(PublishedAwardFinancialAssistance, published_rows)
+
+    return agency_codes_list
+
+
+def fabs_derivations(obj, sess, reference_data=None):
+    """ Derive the values of a FABS row that are looked up from the domain tables
+
+    Args:
+        obj: dict of the row's values, updated in place
+        sess: current DB session
+        reference_data: ReferenceData to look values up in, loaded from the session if not provided. Pass the same
+            one for every row being published
+
+    Returns:
+        the updated dict
+    """
+    if reference_data is None:
+        reference_data = ReferenceData(sess)
 
     # initializing a few of the derivations so the keys exist
     obj['legal_entity_state_code'] = None
@@ -1556,7 +1613,7 @@ def fabs_derivations(obj, sess):
     obj['total_funding_amount'] = federal_action_obligation + non_federal_funding_amount
 
     # deriving cfda_title from program_title in cfda_program table
-    cfda_title = sess.query(CFDAProgram).filter_by(program_number=obj['cfda_number']).one_or_none()
+    cfda_title = reference_data.cfda_program(obj['cfda_number'])
     if cfda_title:
         obj['cfda_title'] = cfda_title.program_title
     else:
@@ -1565,12 +1622,9 @@ def fabs_derivations(obj, sess):
 
     if obj['awarding_sub_tier_agency_c']:
         # deriving awarding agency name and code
-        awarding_sub_tier = sess.query(SubTierAgency).\
-            filter_by(sub_tier_agency_code=obj['awarding_sub_tier_agency_c']).one()
-        use_frec = awarding_sub_tier.is_frec
-        awarding_agency = awarding_sub_tier.frec if use_frec else awarding_sub_tier.cgac
-        obj['awarding_agency_code'] = awarding_agency.frec_code if use_frec else awarding_agency.cgac_code
-        obj['awarding_agency_name'] = awarding_agency.agency_name
+        awarding_sub_tier = reference_data.one('sub_tier_agency', obj['awarding_sub_tier_agency_c'])
+        obj['awarding_agency_code'] = awarding_sub_tier.agency_code
+        obj['awarding_agency_name'] = awarding_sub_tier.agency_name
         obj['awarding_sub_tier_agency_n'] = awarding_sub_tier.sub_tier_agency_name
     else:
         obj['awarding_agency_code'] = None
@@ -1579,13 +1633,10 @@ def fabs_derivations(obj, sess):
 
     # deriving funding sub tier agency name
     if obj['funding_sub_tier_agency_co']:
-        funding_sub_tier_agency = sess.query(SubTierAgency).\
-            filter_by(sub_tier_agency_code=obj['funding_sub_tier_agency_co']).one()
+        funding_sub_tier_agency = reference_data.one('sub_tier_agency', obj['funding_sub_tier_agency_co'])
         obj['funding_sub_tier_agency_na'] = funding_sub_tier_agency.sub_tier_agency_name
-        use_frec = funding_sub_tier_agency.is_frec
-        funding_agency = funding_sub_tier_agency.frec if use_frec else funding_sub_tier_agency.cgac
-        obj['funding_agency_code'] = funding_agency.frec_code if use_frec else funding_agency.cgac_code
-        obj['funding_agency_name'] = funding_agency.agency_name
+        obj['funding_agency_code'] = funding_sub_tier_agency.agency_code
+        obj['funding_agency_name'] = funding_sub_tier_agency.agency_name
         obj['funding_sub_tier_agency_na'] = funding_sub_tier_agency.sub_tier_agency_name
     else:
         obj['funding_sub_tier_agency_na'] = None
@@ -1599,7 +1650,7 @@ def fabs_derivations(obj, sess):
     elif ppop_code == '00FORGN':
         ppop_state = States(state_code=None, state_name=None)
     else:
-        ppop_state = sess.query(States).filter_by(state_code=ppop_code[:2]).one()
+        ppop_state = reference_data.one('states', ppop_code[:2])
     obj['place_of_perform_state_nam'] = ppop_state.state_name
 
     # deriving place of performance values from zip4
@@ -1616,14 +1667,11 @@ def fabs_derivations(obj, sess):
         # if there's a 9-digit zip code, use both parts to get data, otherwise (or if that's invalid) just grab
         # the first instance of the zip5 we find
         if zip_four:
-            zip_info = sess.query(Zips).\
-                filter_by(zip5=zip_five, zip_last4=zip_four).first()
+            zip_info = reference_data.zip9(zip_five, zip_four)
         if not zip_info:
-            zip_info = sess.query(Zips).\
-                filter_by(zip5=zip_five).first()
+            zip_info = reference_data.zip5(zip_five)
             # if this is a 5-digit zip, there may be more than one congressional district associated with it
-            cd_count = sess.query(Zips.congressional_district_no.label('cd_count')).\
-                filter_by(zip5=zip_five).distinct().count()
+            cd_count = reference_data.zip5_district_count(zip_five)
 
         # deriving ppop congressional district
         if not obj['place_of_performance_congr']:
@@ -1634,15 +1682,14 @@ def fabs_derivations(obj, sess):
 
         # deriving PrimaryPlaceOfPerformanceCountyName/Code
         obj['place_of_perform_county_co'] = zip_info.county_number
-        county_info = sess.query(CountyCode).\
-            filter_by(county_number=zip_info.county_number, state_code=zip_info.state_abbreviation).first()
+        county_info = reference_data.first('county_code', (zip_info.county_number, zip_info.state_abbreviation))
         if county_info:
             obj['place_of_perform_county_na'] = county_info.county_name
         else:
             obj['place_of_perform_county_na'] = None
 
         # deriving PrimaryPlaceOfPerformanceCityName
-        city_info = sess.query(ZipCity).filter_by(zip_code=zip_five).one()
+        city_info = reference_data.one('zip_city', zip_five)
         obj['place_of_performance_city'] = city_info.city_name
     # if there is no ppop zip4, we need to try to derive county/city info from the ppop code
     else:
@@ -1650,8 +1697,7 @@ def fabs_derivations(obj, sess):
         if re.match('^[A-Z]{2}\*\*\d{3}$', ppop_code):
             # getting county name
             county_code = ppop_code[-3:]
-            county_info = sess.query(CountyCode).\
-                filter_by(county_number=county_code, state_code=ppop_state.state_code).first()
+            county_info = reference_data.first('county_code', (county_code, ppop_state.state_code))
             obj['place_of_perform_county_co'] = county_code
             obj['place_of_perform_county_na'] = county_info.county_name
             obj['place_of_performance_city'] = None
@@ -1659,7 +1705,7 @@ def fabs_derivations(obj, sess):
         elif re.match('^[A-Z]{2}\d{5}$', ppop_code) and not re.match('^[A-Z]{2}0{5}$', ppop_code):
             # getting city and county name
             city_code = ppop_code[-5:]
-            city_info = sess.query(CityCode).filter_by(city_code=city_code, state_code=ppop_state.state_code).first()
+            city_info = reference_data.first('city_code', (city_code, ppop_state.state_code))
             obj['place_of_performance_city'] = city_info.feature_name
             obj['place_of_perform_county_co'] = city_info.county_number
             obj['place_of_perform_county_na'] = city_info.county_name
@@ -1667,26 +1713,24 @@ def fabs_derivations(obj, sess):
     # deriving legal entity stuff where applicable (record type is 2 in this case)
     if obj['legal_entity_zip5']:
         # legal entity city data
-        city_info = sess.query(ZipCity).filter_by(zip_code=obj['legal_entity_zip5']).one()
+        city_info = reference_data.one('zip_city', obj['legal_entity_zip5'])
         obj['legal_entity_city_name'] = city_info.city_name
 
         zip_data = None
         # if we have a legal entity zip+4 provided
         if obj['legal_entity_zip_last4']:
-            zip_data = sess.query(Zips).\
-                filter_by(zip5=obj['legal_entity_zip5'], zip_last4=obj['legal_entity_zip_last4']).first()
+            zip_data = reference_data.zip9(obj['legal_entity_zip5'], obj['legal_entity_zip_last4'])
 
         # if legal_entity_zip_last4 returned no results (invalid combination), grab the first entry for this zip5
         # for derivation purposes. This will exist because we wouldn't have gotten this far if it didn't,
         # invalid legal_entity_zip5 when present is an error
         if not zip_data:
-            zip_data = sess.query(Zips).filter_by(zip5=obj['legal_entity_zip5']).first()
+            zip_data = reference_data.zip5(obj['legal_entity_zip5'])
 
         obj['legal_entity_congressional'] = zip_data.congressional_district_no
 
         # legal entity city data
-        county_info = sess.query(CountyCode).\
-            filter_by(county_number=zip_data.county_number, state_code=zip_data.state_abbreviation).first()
+        county_info = reference_data.first('county_code', (zip_data.county_number, zip_data.state_abbreviation))
         if county_info:
             obj['legal_entity_county_code'] = county_info.county_number
             obj['legal_entity_county_name'] = county_info.county_name
@@ -1695,7 +1739,7 @@ def fabs_derivations(obj, sess):
             obj['legal_entity_county_name'] = None
 
         # legal entity state data
-        state_info = sess.query(States).filter_by(state_code=zip_data.state_abbreviation).one()
+        state_info = reference_data.one('states', zip_data.state_abbreviation)
         obj['legal_entity_state_code'] = state_info.state_code
         obj['legal_entity_state_name'] = state_info.state_name
 
@@ -1703,8 +1747,7 @@ def fabs_derivations(obj, sess):
     if obj['record_type'] == 1:
         # legal entity county data
         county_code = ppop_code[-3:]
-        county_info = sess.query(CountyCode).\
-            filter_by(county_number=county_code, state_code=ppop_state.state_code).first()
+        county_info = reference_data.first('county_code', (county_code, ppop_state.state_code))
         obj['legal_entity_county_code'] = county_code
         obj['legal_entity_county_name'] = county_info.county_name
 
@@ -1717,8 +1760,7 @@ def fabs_derivations(obj, sess):
 
     # deriving awarding_office_name based off awarding_office_code
     if obj['awarding_office_code']:
-        award_office = sess.query(FPDSContractingOffice).\
-            filter_by(contracting_office_code=obj['awarding_office_code']).one_or_none()
+        award_office = reference_data.one_or_none('contracting_office', obj['awarding_office_code'])
         if award_office:
             obj['awarding_office_name'] = award_office.contracting_office_name
         else:
@@ -1726,45 +1768,23 @@ def fabs_derivations(obj, sess):
 
     # deriving funding_office_name based off funding_office_code
     if obj['funding_office_code']:
-        funding_office = sess.query(FPDSContractingOffice).\
-            filter_by(contracting_office_code=func.upper(obj['funding_office_code'])).one_or_none()
+        funding_office = reference_data.one_or_none('contracting_office', obj['funding_office_code'].upper())
         if funding_office:
             obj['funding_office_name'] = funding_office.contracting_office_name
         else:
             obj['funding_office_name'] = None
 
     if obj['legal_entity_city_name'] and obj['legal_entity_state_code']:
-        city_code = sess.query(CityCode).\
-            filter(func.lower(CityCode.feature_name) == func.lower(obj['legal_entity_city_name'].strip()),
-                   func.lower(CityCode.state_code) == func.lower(obj['legal_entity_state_code'].strip())).first()
+        city_code = reference_data.first('city_name', (obj['legal_entity_city_name'].strip().lower(),
+                                                       obj['legal_entity_state_code'].strip().lower()))
         if city_code:
             obj['legal_entity_city_code'] = city_code.city_code
         else:
             obj['legal_entity_city_code'] = None
 
-    # TODO consider making the CountryCode query before starting the for-loop and just having an object to look up from
-    # deriving place_of_perform_country_n from place_of_perform_country_c
-    if obj['place_of_perform_country_c']:
-        country_data = sess.query(CountryCode). \
-            filter_by(country_code=obj['place_of_perform_country_c'].upper()).one_or_none()
-        if country_data:
-            obj['place_of_perform_country_n'] = country_data.country_name
-        else:
-            obj['place_of_perform_country_n'] = None
-
-    # deriving legal_entity_country_name from legal_entity_country_code
-    if obj['legal_entity_country_code']:
-        country_data = sess.query(CountryCode).\
-            filter_by(country_code=obj['legal_entity_country_code'].upper()).one_or_none()
-        if country_data:
-            obj['legal_entity_country_name'] = country_data.country_name
-        else:
-            obj['legal_entity_country_name'] = None
-
     # deriving place_of_perform_country_n from place_of_perform_country_c
     if obj['place_of_perform_country_c']:
-        country_data = sess.query(CountryCode). \
-            filter_by(country_code=obj['place_of_perform_country_c'].upper()).one_or_none()
+        country_data = reference_data.one_or_none('country_code', obj['place_of_perform_country_c'].upper())
         if country_data:
             obj['place_of_perform_country_n'] = country_data.country_name
         else:
@@ -1772,8 +1792,7 @@ def fabs_derivations(obj, sess):
 
     # deriving legal_entity_country_name from legal_entity_country_code
     if obj['legal_entity_country_code']:
-        country_data = sess.query(CountryCode). \
-            filter_by(country_code=obj['legal_entity_country_code'].upper()).one_or_none()
+        country_data = reference_data.one_or_none('country_code', obj['legal_entity_country_code'].upper())
         if country_data:
             obj['legal_entity_country_name'] = country_data.country_name
         else:
@@ -1781,9 +1800,8 @@ def fabs_derivations(obj, sess):
 
     # deriving place_of_perform_county_co when record_type is 1
     if obj['record_type'] == 1:
-        county_data = sess.query(CountyCode). \
-            filter_by(county_number=obj['place_of_performance_code'][-3:],
-                      state_code=obj['place_of_performance_code'][:2]).one_or_none()
+        county_data = reference_data.one_or_none('county_code', (obj['place_of_performance_code'][-3:],
+                                                                 obj['place_of_performance_code'][:2]))
         if county_data:
             obj['place_of_perform_county_co'] = county_data.county_number
             obj['place_of_perform_county_na'] = county_data.county_name
@@ -1805,15 +1823,12 @@ def fabs_derivations(obj, sess):
         # if there's a 9-digit zip code, use both parts to get data, otherwise (or if that's invalid) just grab
         # the first instance of the zip5 we find
         if zip_four:
-            zip_info = sess.query(Zips). \
-                filter_by(zip5=zip_five, zip_last4=zip_four).first()
+            zip_info = reference_data.zip9(zip_five, zip_four)
         if not zip_info:
-            zip_info = sess.query(Zips). \
-                filter_by(zip5=zip_five).first()
+            zip_info = reference_data.zip5(zip_five)
         obj['place_of_perform_county_co'] = zip_info.county_number
-        county_data = sess.query(CountyCode). \
-            filter_by(county_number=zip_info.county_number,
-                      state_code=zip_info.state_abbreviation).one_or_none()
+        county_data = reference_data.one_or_none('county_code', (zip_info.county_number,
+                                                                 zip_info.state_abbreviation))
         if county_data:
             obj['place_of_perform_county_na'] = county_data.county_name
         else:
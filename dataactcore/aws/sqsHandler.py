@@ -1,10 +1,28 @@
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+
 import boto3
+from sqlalchemy import or_
+
 from dataactcore.config import CONFIG_BROKER
 from dataactcore.models.jobModels import SQS
 from dataactcore.interfaces.db import GlobalDB
 
+logger = logging.getLogger(__name__)
+
+# Seconds a received message is hidden from other receivers, as in SQS
+DEFAULT_VISIBILITY_TIMEOUT = 30
+
 
 class SQSMockQueue:
+    """ Queue backed by the sqs table for local use. Received messages are hidden from other receivers until they're
+        deleted or their visibility timeout runs out, so several validator workers can share the queue. """
+
+    # Seconds between checks for new messages while waiting
+    POLL_INTERVAL = 1
+
     @staticmethod
     def send_message(MessageBody):    # noqa
         sess = GlobalDB.db().session
@@ -13,12 +31,27 @@ class SQSMockQueue:
         return {"ResponseMetadata": {"HTTPStatusCode": 200}}
 
     @staticmethod
-    def receive_messages(WaitTimeSeconds):  # noqa
+    def receive_messages(WaitTimeSeconds, MaxNumberOfMessages=1, VisibilityTimeout=None):  # noqa
+        """ Receive up to MaxNumberOfMessages visible messages, waiting up to WaitTimeSeconds for one to arrive """
+        deadline = time.time() + WaitTimeSeconds
+        while True:
+            messages = SQSMockQueue._claim_messages(MaxNumberOfMessages,
+                                                    VisibilityTimeout or DEFAULT_VISIBILITY_TIMEOUT)
+            if messages or time.time() >= deadline:
+                return messages
+            time.sleep(SQSMockQueue.POLL_INTERVAL)
+
+    @staticmethod
+    def _claim_messages(max_messages, visibility_timeout):
+        """ Hide the next visible messages, skipping any another worker is claiming at the same time """
         sess = GlobalDB.db().session
-        messages = []
-        for sqs in sess.query(SQS):
-            messages.append(SQSMockMessage(sqs))
-        return messages
+        now = datetime.utcnow()
+        claimed = sess.query(SQS).filter(or_(SQS.hidden_until.is_(None), SQS.hidden_until <= now)).\
+            order_by(SQS.sqs_id).limit(max_messages).with_for_update(skip_locked=True).all()
+        for sqs in claimed:
+            sqs.hidden_until = now + timedelta(seconds=visibility_timeout)
+        sess.commit()
+        return [SQSMockMessage(sqs) for sqs in claimed]
 
     @staticmethod
     def purge():
@@ -29,17 +62,65 @@ class SQSMockQueue:
 
 class SQSMockMessage:
     def __init__(self, sqs):
-        self.sqs = sqs
+        self.sqs_id = sqs.sqs_id
         self.body = sqs.job_id
 
     def delete(self):
         sess = GlobalDB.db().session
-        sess.delete(self.sqs)
+        sess.query(SQS).filter_by(sqs_id=self.sqs_id).delete(synchronize_session=False)
         sess.commit()
 
     def change_visibility(self, VisibilityTimeout): # noqa
-        # Do nothing
-        pass
+        sess = GlobalDB.db().session
+        sess.query(SQS).filter_by(sqs_id=self.sqs_id).\
+            update({'hidden_until': datetime.utcnow() + timedelta(seconds=VisibilityTimeout)},
+                   synchronize_session=False)
+        sess.commit()
+
+
+class VisibilityHeartbeat(threading.Thread):
+    """ Keeps a message hidden from other receivers while a long job works on it by extending its visibility timeout
+        every interval seconds, until stopped """
+
+    def __init__(self, message, visibility_timeout, interval=None, app=None):
+        """
+
+        args
+
+        message - message being worked on
+        visibility_timeout - seconds the message is hidden for after each heartbeat
+        interval - seconds between heartbeats, defaults to a third of the timeout
+        app - Flask app to run the heartbeats in, needed by the local queue's database session
+
+        """
+        super(VisibilityHeartbeat, self).__init__(daemon=True)
+        self.message = message
+        self.visibility_timeout = visibility_timeout
+        self.interval = interval or visibility_timeout / 3
+        self.app = app
+        self.stopped = threading.Event()
+
+    def run(self):
+        if self.app is None:
+            self._beat()
+            return
+        with self.app.app_context():
+            try:
+                self._beat()
+            finally:
+                GlobalDB.close()
+
+    def _beat(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.message.change_visibility(VisibilityTimeout=self.visibility_timeout)
+            except Exception as e:
+                # The next heartbeat may still get through before the message becomes visible again
+                logger.warning('Unable to extend the visibility of message %s: %s', self.message.body, e)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
 
 
 def sqs_queue():
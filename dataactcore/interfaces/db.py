@@ -1,21 +1,51 @@
 from collections import namedtuple
 import logging
+import threading
 import sqlalchemy
 import flask
+from sqlalchemy import event, exc, select
 from sqlalchemy.orm import sessionmaker, scoped_session
 from dataactcore.config import CONFIG_DB
 
 
 logger = logging.getLogger(__name__)
 
+# Default connection pool settings, overridden by pool_size, max_overflow and pool_pre_ping in the db config
+POOL_SIZE = 100
+MAX_OVERFLOW = 50
+
+# uri -> engine, shared by every app context in the process
+_engines = {}
+_engines_lock = threading.Lock()
+
 
 class _DB(namedtuple('_DB', ['engine', 'connection', 'scoped_session_maker', 'session'])):
     """Represents a database connection, from engine to session."""
     def close(self):
+        """Return the session's and connection's connections to the pool, the engine stays open for reuse"""
         self.session.close()
         self.scoped_session_maker.remove()
         self.connection.close()
-        self.engine.dispose()
+
+
+class PoolMetrics:
+    """ Running counts of the connections checked out of an engine's pool """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def increment(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def counts(self):
+        with self.lock:
+            return {'checkouts': self.checkouts, 'overflow_checkouts': self.overflow_checkouts,
+                    'connects': self.connects, 'invalidations': self.invalidations}
 
 
 class GlobalDB:
@@ -48,7 +78,7 @@ class GlobalDB:
 
 
 def db_connection():
-    """Use the config to set up a database engine and connection."""
+    """Use the config to set up a session and connection on the process's database engine."""
     if not CONFIG_DB:
         raise ValueError("Database configuration is not defined")
 
@@ -56,9 +86,8 @@ def db_connection():
     if not db_name:
         raise ValueError("Need dbName defined")
 
-    # Create sqlalchemy connection and session
-    uri = db_uri(db_name)
-    engine = sqlalchemy.create_engine(uri, pool_size=100, max_overflow=50)
+    # Check a sqlalchemy connection and session out of the engine's pool
+    engine = get_engine(db_uri(db_name))
     connection = engine.connect()
     scoped_session_maker = scoped_session(sessionmaker(bind=engine))
     return _DB(engine, connection, scoped_session_maker, scoped_session_maker())
@@ -67,3 +96,116 @@ def db_connection():
 def db_uri(db_name):
     uri = "postgresql://{username}:{password}@{host}:{port}/{}".format(db_name, **CONFIG_DB)
     return uri
+
+
+def get_engine(uri):
+    """ Get the engine for a database, creating it the first time it's used in this process
+
+    Args:
+        uri: URI of the database
+
+    Returns:
+        sqlalchemy engine with a connection pool sized by the db config
+    """
+    with _engines_lock:
+        engine = _engines.get(uri)
+        if engine is None:
+            engine = sqlalchemy.create_engine(uri, pool_size=CONFIG_DB.get('pool_size', POOL_SIZE),
+                                              max_overflow=CONFIG_DB.get('max_overflow', MAX_OVERFLOW))
+            instrument_engine(engine, pre_ping=CONFIG_DB.get('pool_pre_ping', True))
+            force_custom_plans(engine)
+            _engines[uri] = engine
+        return engine
+
+
+def instrument_engine(engine, pre_ping=True):
+    """ Count the connections checked out of an engine's pool and, if pre_ping is set, test each connection as it's
+        checked out so connections the database has dropped are replaced instead of failing the request
+
+    Args:
+        engine: sqlalchemy engine to instrument
+        pre_ping: whether to run a SELECT 1 on each connection when it's checked out
+    """
+    metrics = PoolMetrics()
+    engine.pool_metrics = metrics
+
+    @event.listens_for(engine, 'connect')
+    def count_connect(dbapi_connection, connection_record):
+        metrics.increment('connects')
+
+    @event.listens_for(engine, 'checkout')
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.increment('checkouts')
+        if getattr(engine.pool, 'overflow', None) and engine.pool.overflow() > 0:
+            metrics.increment('overflow_checkouts')
+
+    if pre_ping:
+        @event.listens_for(engine, 'engine_connect')
+        def ping_connection(connection, branch):
+            if branch:
+                # Branches share their parent's connection, which has already been checked
+                return
+            should_close_with_result = connection.should_close_with_result
+            connection.should_close_with_result = False
+            try:
+                connection.scalar(select([1]))
+            except exc.DBAPIError as e:
+                if not e.connection_invalidated:
+                    raise
+                # The pool has thrown away the dead connection, so this one runs on a fresh connection
+                metrics.increment('invalidations')
+                logger.warning('Replacing a database connection that was dropped while in the pool')
+                connection.scalar(select([1]))
+            finally:
+                connection.should_close_with_result = should_close_with_result
+
+
+def force_custom_plans(engine):
+    """ Have each new connection of an engine plan every execution of a prepared statement for its own parameters.
+        A generic plan of a validation rule on a staging table partitioned by submission would lock and plan every
+        submission's partition, a custom plan only the one for the submission being checked.
+
+    Args:
+        engine: sqlalchemy engine whose connections to set up
+    """
+    @event.listens_for(engine, 'connect')
+    def set_plan_cache_mode(dbapi_connection, connection_record):
+        # plan_cache_mode is new in Postgres 12
+        if getattr(dbapi_connection, 'server_version', 0) < 120000:
+            return
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SET plan_cache_mode = force_custom_plan')
+        cursor.close()
+        # Committed, so the rollback when the connection is checked back into the pool doesn't undo it
+        dbapi_connection.commit()
+
+
+def pool_status(engine=None):
+    """ Get the state of an engine's connection pool
+
+    Args:
+        engine: engine to report on, defaults to the current database's engine
+
+    Returns:
+        dict of the pool's size, connections checked in and out, overflow connections open and running counts of
+        checkouts, overflow checkouts, new connections and connections replaced after failing a pre-ping
+    """
+    if engine is None:
+        engine = get_engine(db_uri(CONFIG_DB['db_name']))
+    pool = engine.pool
+    status = {}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    metrics = getattr(engine, 'pool_metrics', None)
+    if metrics is not None:
+        status.update(metrics.counts())
+    return status
+
+
+def dispose_engines():
+    """ Close every pooled connection in the process, e.g. before dropping a database """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
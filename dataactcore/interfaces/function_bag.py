@@ -5,12 +5,14 @@ import time
 import uuid
 
 from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.exc import NoResultFound
 
 from dataactcore.models.errorModels import ErrorMetadata, File
-from dataactcore.models.jobModels import Job, Submission, JobDependency, CertifyHistory
-from dataactcore.models.stagingModels import AwardFinancial, DetachedAwardFinancialAssistance
+from dataactcore.models.jobModels import Job, Submission, JobDependency, CertifyHistory, SubmissionSummary
+from dataactcore.models.stagingModels import (
+    AwardFinancial, DetachedAwardFinancialAssistance, submission_partition_name)
 from dataactcore.models.userModel import User, EmailTemplateType, EmailTemplate
 from dataactcore.models.validationModels import RuleSeverity
 from dataactcore.models.lookups import (FILE_TYPE_DICT, FILE_STATUS_DICT, JOB_TYPE_DICT,
@@ -65,6 +67,7 @@ def populate_submission_error_info(submission_id):
     submission.number_of_errors = sum_number_of_errors_for_job_list(submission_id)
     submission.number_of_warnings = sum_number_of_errors_for_job_list(submission_id, error_type='warning')
     sess.commit()
+    refresh_submission_summary(submission_id)
 
     return submission
 
@@ -296,6 +299,8 @@ def mark_job_status(job_id, status_name, skip_check=False):
     # update job status
     job.job_status_id = JOB_STATUS_DICT[status_name]
     sess.commit()
+    if job.submission_id is not None:
+        refresh_submission_summary(job.submission_id)
 
     # if status is changed to finished for the first time, check dependencies
     # and add to the job queue as necessary
@@ -582,6 +587,7 @@ def get_submission_files(jobs):
 
 def get_submission_status(submission, jobs):
     """Return the status of a submission."""
+    jobs = list(jobs)
 
     status_names = JOB_STATUS_DICT.keys()
     statuses = {name: 0 for name in status_names}
@@ -606,7 +612,7 @@ def get_submission_status(submission, jobs):
         status = "waiting"
     elif statuses["ready"] != 0:
         status = "ready"
-    elif statuses["finished"] == jobs.count() - skip_count:  # need to account for the jobs that were skipped above
+    elif statuses["finished"] == len(jobs) - skip_count:  # need to account for the jobs that were skipped above
         status = "validation_successful"
         if submission.number_of_warnings is not None and submission.number_of_warnings > 0:
             status = "validation_successful_warnings"
@@ -632,45 +638,94 @@ def get_lastest_certified_date(submission):
     return None
 
 
-def get_last_validated_date(submission_id):
-    """ Return the oldest last validated date for validation jobs """
-    sess = GlobalDB.db().session
-
+def oldest_validated_date(jobs):
+    """ Return the oldest last validated date of the validation jobs, None if any of them hasn't been validated """
     validation_job_types = [JOB_TYPE_DICT['csv_record_validation'], JOB_TYPE_DICT['validation']]
 
-    jobs = sess.query(Job).filter(Job.submission_id == submission_id,
-                                  Job.job_type_id.in_(validation_job_types)).all()
-
-    oldest_date = ''
+    oldest_date = None
     for job in jobs:
-        # if any job's last validated doesn't exist, return blank immediately
+        if job.job_type_id not in validation_job_types:
+            continue
+        # if any job's last validated doesn't exist, there is no date
         if not job.last_validated:
-            return ''
+            return None
 
         if not oldest_date or job.last_validated < oldest_date:
             oldest_date = job.last_validated
+    return oldest_date
 
-    # Still need to do a check here in case there aren't any jobs for a submission.
-    # This is the case for a single unit test
-    return oldest_date.strftime('%m/%d/%Y') if oldest_date else oldest_date
 
+def get_last_validated_date(submission_id):
+    """ Return the oldest last validated date for validation jobs """
+    last_validated = get_submission_summary(submission_id).last_validated
 
-def get_fabs_meta(submission_id):
+    # Blank if there aren't any validation jobs or any of them haven't been validated
+    return last_validated.strftime('%m/%d/%Y') if last_validated else ''
+
+
+def refresh_submission_summary(submission_id, count_fabs_rows=False):
+    """ Recompute the status, row count and last validated date of a submission from its jobs
+
+    Args:
+        submission_id: ID of the submission to summarize
+        count_fabs_rows: whether to recount the submission's FABS rows, they're always counted for a new summary
+
+    Returns:
+        the SubmissionSummary of the submission
+    """
+    sess = GlobalDB.db().session
+
+    # Lock the summary before reading the jobs, so a job changed while we're reading clears the status we write
+    summary = sess.query(SubmissionSummary).filter_by(submission_id=submission_id).with_for_update().one_or_none()
+    if summary is None:
+        summary = SubmissionSummary(submission_id=submission_id)
+        sess.add(summary)
+        count_fabs_rows = True
+
+    submission = sess.query(Submission).filter_by(submission_id=submission_id).one()
+    jobs = sess.query(Job).filter_by(submission_id=submission_id).all()
+    summary.status = get_submission_status(submission, jobs)
+    summary.number_of_rows = sum(job.number_of_rows or 0 for job in jobs)
+    summary.last_validated = oldest_validated_date(jobs)
+
+    if count_fabs_rows:
+        summary.fabs_total_rows, summary.fabs_valid_rows = sess.\
+            query(func.count(DetachedAwardFinancialAssistance.detached_award_financial_assistance_id),
+                  func.count(DetachedAwardFinancialAssistance.detached_award_financial_assistance_id).
+                  filter(DetachedAwardFinancialAssistance.is_valid)).\
+            filter(DetachedAwardFinancialAssistance.submission_id == submission_id).one()
+
+    try:
+        sess.commit()
+    except IntegrityError:
+        # Another process created the summary first, update theirs instead
+        sess.rollback()
+        return refresh_submission_summary(submission_id, count_fabs_rows)
+    return summary
 
+
+def get_submission_summary(submission_id):
+    """ Return the SubmissionSummary of a submission, recomputing it if it's missing or out of date """
     sess = GlobalDB.db().session
+    summary = sess.query(SubmissionSummary).filter_by(submission_id=submission_id).one_or_none()
+    if summary is None or summary.status is None:
+        summary = refresh_submission_summary(submission_id)
+    return summary
+
 
-    total_rows = sess.query(DetachedAwardFinancialAssistance).filter(
-                        DetachedAwardFinancialAssistance.submission_id == submission_id)
+def get_fabs_meta(submission_id):
 
-    valid_rows = total_rows.filter(DetachedAwardFinancialAssistance.is_valid)
+    sess = GlobalDB.db().session
+
+    summary = get_submission_summary(submission_id)
 
     submission = sess.query(Submission).filter(Submission.submission_id == submission_id).one()
 
     publish_date = get_lastest_certified_date(submission)
 
     return {
-        'valid_rows': len(valid_rows.all()),
-        'total_rows': len(total_rows.all()),
+        'valid_rows': summary.fabs_valid_rows,
+        'total_rows': summary.fabs_total_rows,
         'publish_date': publish_date.strftime('%-I:%M%p %m/%d/%Y') if publish_date else None
     }
 
@@ -691,3 +746,20 @@ def get_action_dates(submission_id):
                       func.max(DetachedAwardFinancialAssistance.action_date).label("max_action_date"))\
         .filter(DetachedAwardFinancialAssistance.submission_id == submission_id,
                 DetachedAwardFinancialAssistance.is_valid.is_(True)).one()
+
+
+def clear_submission_rows(sess, model, submission_id):
+    """ Remove all of a submission's rows from a staging table. The submission's partition is truncated if it has one,
+        which leaves no dead rows behind the way a DELETE does. The caller commits.
+
+    Arguments:
+        sess: current DB session
+        model: ORM model of the staging table
+        submission_id: submission to remove the rows of
+    """
+    partition = submission_partition_name(model.__tablename__, submission_id)
+    if sess.execute('SELECT to_regclass(:partition)', {'partition': partition}).scalar() is not None:
+        sess.execute('TRUNCATE {}'.format(partition))
+    else:
+        # Tables that aren't partitioned, and submissions that have been archived
+        sess.query(model).filter_by(submission_id=submission_id).delete()
@@ -0,0 +1,109 @@
+"""partition the staging tables by submission
+
+Revision ID: c4e8a2f17b93
+Revises: b7d3e91c5a2f
+Create Date: 2017-11-20 10:12:45.610284
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2f17b93'
+down_revision = 'b7d3e91c5a2f'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# staging tables with the column holding their IDs. New submissions get a partition of their own in each table when
+# they're created, the rows of the existing submissions go to one archive partition
+PARTITIONED_TABLES = [
+    ('flex_field', 'flex_field_id'),
+    ('appropriation', 'appropriation_id'),
+    ('object_class_program_activity', 'object_class_program_activity_id'),
+    ('award_financial', 'award_financial_id'),
+    ('award_financial_assistance', 'award_financial_assistance_id'),
+    ('award_procurement', 'award_procurement_id'),
+    ('detached_award_financial_assistance', 'detached_award_financial_assistance_id'),
+]
+
+
+def upgrade(engine_name):
+    globals()["upgrade_%s" % engine_name]()
+
+
+def downgrade(engine_name):
+    globals()["downgrade_%s" % engine_name]()
+
+
+def supports_partitioning(conn):
+    # Postgres 11 is the first to allow primary keys, foreign keys and indexes on partitioned tables, and 12 the first
+    # to attach a partition without blocking reads and writes of the table. Older databases keep the plain tables,
+    # which the validator clears with a DELETE as before
+    return conn.dialect.server_version_info >= (12,)
+
+
+def is_partitioned(conn, table):
+    return conn.execute(sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+                        table=table).scalar()
+
+
+def rebuild_table(conn, table, id_column, partitioned, archive_end=None):
+    """ Replace a table with a copy that is or isn't partitioned by submission, keeping its ID sequence, indexes and
+        foreign keys. The rows of submissions before archive_end go to a single archive partition of a partitioned
+        table """
+    indexes = [row.indexdef for row in conn.execute(sa.text(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table "
+        "AND indexdef NOT LIKE 'CREATE UNIQUE%'"), table=table)]
+    foreign_keys = conn.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) AS definition FROM pg_constraint "
+        "WHERE conrelid = to_regclass(:table) AND contype = 'f'"), table=table).fetchall()
+    sequence = conn.execute(sa.text("SELECT pg_get_serial_sequence(:table, :column)"), table=table,
+                            column=id_column).scalar()
+
+    op.execute('ALTER TABLE {0} RENAME TO {0}_old'.format(table))
+    if partitioned:
+        # LIKE keeps the NOT NULL on submission_id, so every row has a partition to go to
+        op.execute('CREATE TABLE {0} (LIKE {0}_old INCLUDING DEFAULTS) PARTITION BY RANGE (submission_id)'.format(
+            table))
+        # named the way dataactcore/scripts/archiveStagingPartitions.py names the partitions it archives to
+        op.execute('CREATE TABLE {0}_archive_0_{1} PARTITION OF {0} FOR VALUES FROM (MINVALUE) TO ({1})'.format(
+            table, archive_end))
+    else:
+        op.execute('CREATE TABLE {0} (LIKE {0}_old INCLUDING DEFAULTS)'.format(table))
+    op.execute('INSERT INTO {0} SELECT * FROM {0}_old'.format(table))
+    if sequence:
+        op.execute('ALTER SEQUENCE {} OWNED BY {}.{}'.format(sequence, table, id_column))
+    # dropping the old table, and its partitions if it had any, frees up the names of its indexes and constraints
+    op.execute('DROP TABLE {}_old'.format(table))
+
+    if partitioned:
+        # the partition key has to be part of the primary key of a partitioned table
+        op.execute('ALTER TABLE {0} ADD CONSTRAINT {0}_pkey PRIMARY KEY ({1}, submission_id)'.format(table, id_column))
+    else:
+        op.execute('ALTER TABLE {0} ADD CONSTRAINT {0}_pkey PRIMARY KEY ({1})'.format(table, id_column))
+    for index in indexes:
+        op.execute(index)
+    for foreign_key in foreign_keys:
+        op.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(table, foreign_key.conname, foreign_key.definition))
+
+
+def upgrade_data_broker():
+    conn = op.get_bind()
+    if not supports_partitioning(conn):
+        return
+    # no submissions can be created while the tables are rebuilt, every submission after the existing ones gets its
+    # own partitions when it's created
+    op.execute('LOCK TABLE submission IN SHARE MODE')
+    archive_end = conn.execute('SELECT COALESCE(MAX(submission_id), 0) + 1 FROM submission').scalar()
+    for table, id_column in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            rebuild_table(conn, table, id_column, partitioned=True, archive_end=archive_end)
+
+
+def downgrade_data_broker():
+    conn = op.get_bind()
+    for table, id_column in PARTITIONED_TABLES:
+        if is_partitioned(conn, table):
+            rebuild_table(conn, table, id_column, partitioned=False)
@@ -1,8 +1,9 @@
 from datetime import timedelta
+import re
 
 import sqlalchemy as sa
 
-from sqlalchemy import Column, Date, ForeignKey, Index, Integer, Numeric, Text, Float, UniqueConstraint, Boolean
+from sqlalchemy import Column, Date, ForeignKey, Index, Integer, Numeric, Text, Float, Boolean
 from sqlalchemy.orm import relationship
 from dataactcore.models.baseModel import Base
 
@@ -273,18 +274,45 @@ class CFDAProgram(Base):
     archived_date = Column(Text, index=True)
 
 
-class Zips(Base):
-    """ Zip and other address data for validation """
-    __tablename__ = "zips"
+class ZipRange(Base):
+    """ Zip and other address data for validation. Each row covers a range of ZIP+4s with the same address data, as
+        they're listed in the USPS files, and zip5s only listed in the city/state file have a row with no range. """
+    __tablename__ = "zip_range"
 
-    zips_id = Column(Integer, primary_key=True)
-    zip5 = Column(Text, index=True)
-    zip_last4 = Column(Text, index=True)
+    zip_range_id = Column(Integer, primary_key=True)
+    zip5 = Column(Text, nullable=False)
+    zip4_low = Column(Text)
+    zip4_high = Column(Text)
     state_abbreviation = Column(Text, index=True)
-    county_number = Column(Text, index=True)
-    congressional_district_no = Column(Text, index=True)
+    county_number = Column(Text)
+    congressional_district_no = Column(Text)
+
+    __table_args__ = (Index('ix_zip_range_zip5_zip4_low_zip4_high', 'zip5', 'zip4_low', 'zip4_high'),)
+
 
-    __table_args__ = (UniqueConstraint('zip5', 'zip_last4', name='uniq_zip5_zip_last4'),)
+# Zip4s are compared as text, which only orders them correctly when they're four digits
+ZIP4_REGEX = re.compile(r'^\d{4}$')
+
+
+def find_zip(sess, zip5, zip_last4=None):
+    """ Look up the address data of a zip5 or ZIP+4
+
+    Args:
+        sess: current DB session
+        zip5: first five digits of the zip
+        zip_last4: last four digits of the zip, or None to look up the zip5 on its own
+
+    Returns:
+        the ZipRange containing the ZIP+4, or the first ZipRange of the zip5 if zip_last4 isn't given, None if there
+        isn't one. When ranges overlap, the one loaded last is used.
+    """
+    query = sess.query(ZipRange).filter_by(zip5=zip5)
+    if zip_last4 is None:
+        return query.order_by(ZipRange.zip_range_id).first()
+    if not ZIP4_REGEX.match(zip_last4):
+        return None
+    return query.filter(ZipRange.zip4_low <= zip_last4, ZipRange.zip4_high >= zip_last4).\
+        order_by(ZipRange.zip_range_id.desc()).first()
 
 
 class CityCode(Base):
@@ -1,10 +1,14 @@
 """ These classes define the ORM models to be used by sqlalchemy for the job tracker database """
 from datetime import datetime
-from sqlalchemy import Boolean, Column, Date, DateTime, ForeignKey, Integer, Text, UniqueConstraint
-from sqlalchemy.orm import relationship
+import logging
+from sqlalchemy import Boolean, Column, Date, DateTime, ForeignKey, Integer, Text, UniqueConstraint, event
+from sqlalchemy.orm import Session, object_session, relationship
 from dataactcore.models.baseModel import Base
 from dataactcore.models.domainModels import SubTierAgency
 from dataactcore.models.lookups import FILE_TYPE_DICT_ID, JOB_STATUS_DICT_ID, JOB_TYPE_DICT_ID
+from dataactcore.models.stagingModels import create_submission_partitions
+
+logger = logging.getLogger(__name__)
 
 
 def generate_fiscal_year(context):
@@ -123,6 +127,66 @@ class Job(Base):
         return FILE_TYPE_DICT_ID.get(self.file_type_id)
 
 
+class SubmissionSummary(Base):
+    """ Status and row counts of a submission, kept so status checks don't have to recompute them from every job
+        and row in the submission. The status is cleared whenever the submission or one of its jobs changes, and is
+        recomputed the next time the summary is read. """
+    __tablename__ = "submission_summary"
+
+    submission_id = Column(Integer, ForeignKey("submission.submission_id", ondelete="CASCADE",
+                                               name="fk_submission_summary_submission_id"), primary_key=True)
+    status = Column(Text)
+    number_of_rows = Column(Integer, nullable=False, default=0, server_default='0')
+    fabs_total_rows = Column(Integer, nullable=False, default=0, server_default='0')
+    fabs_valid_rows = Column(Integer, nullable=False, default=0, server_default='0')
+    last_validated = Column(DateTime)
+
+
+def clear_submission_summary_status(mapper, connection, target):
+    """ Mark the summary of a submission out of date when the submission or one of its jobs changes """
+    if target.submission_id is not None:
+        connection.execute(SubmissionSummary.__table__.update().
+                           where(SubmissionSummary.submission_id == target.submission_id).values(status=None))
+
+
+for event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Job, event_name, clear_submission_summary_status)
+event.listen(Submission, 'after_update', clear_submission_summary_status)
+
+
+def note_new_submission(mapper, connection, target):
+    """ Remember a new submission on its session, so its partitions of the staging tables are created once it's
+        committed """
+    object_session(target).info.setdefault('new_submission_ids', set()).add(target.submission_id)
+
+
+def create_staging_partitions(session):
+    """ Give the submissions a session has just committed their partitions of the staging tables, before any of their
+        files are loaded. Attaching partitions serializes with every other attach to the same staging tables, so each
+        submission's partitions are created in a short transaction of their own rather than in the one that created
+        it. If this fails the validator creates any missing partitions before it loads the submission's files. """
+    submission_ids = session.info.pop('new_submission_ids', None)
+    if not submission_ids:
+        return
+    engine = session.get_bind()
+    for submission_id in sorted(submission_ids):
+        try:
+            with engine.begin() as connection:
+                create_submission_partitions(connection, submission_id)
+        except Exception:
+            logger.exception('Could not create the staging partitions of submission %s', submission_id)
+
+
+def forget_new_submissions(session):
+    """ Forget the submissions a session created once they've been rolled back """
+    session.info.pop('new_submission_ids', None)
+
+
+event.listen(Submission, 'after_insert', note_new_submission)
+event.listen(Session, 'after_commit', create_staging_partitions)
+event.listen(Session, 'after_rollback', forget_new_submissions)
+
+
 class JobDependency(Base):
     __tablename__ = "job_dependency"
 
@@ -184,6 +248,7 @@ class SQS(Base):
 
     sqs_id = Column(Integer, primary_key=True)
     job_id = Column(Integer, nullable=False)
+    hidden_until = Column(DateTime, nullable=True)
 
     __table_args__ = (UniqueConstraint('job_id', name='uniq_job_id'),)
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, Numeric, Index, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Text, Numeric, Index, Boolean, ForeignKey, DateTime, text
 from sqlalchemy.orm import relationship
 
 from dataactcore.models.baseModel import Base
@@ -972,3 +972,50 @@ class FPDSContractingOffice(Base):
         # so get rid of any extraneous kwargs before instantiating
         clean_kwargs = {k: v for k, v in kwargs.items() if hasattr(self, k)}
         super(FPDSContractingOffice, self).__init__(**clean_kwargs)
+
+
+# Staging tables holding the data of each submission's files, range partitioned by submission_id on databases that
+# support it. Each submission gets a partition of its own when it's created, so its rows can be cleared with a
+# TRUNCATE. Submissions that are no longer being worked on are merged into archive partitions covering a range of
+# submissions by dataactcore/scripts/archiveStagingPartitions.py, which keeps the number of partitions down.
+SUBMISSION_PARTITIONED_MODELS = [FlexField, Appropriation, ObjectClassProgramActivity, AwardFinancial,
+                                 AwardFinancialAssistance, AwardProcurement, DetachedAwardFinancialAssistance]
+
+
+def submission_partition_name(table_name, submission_id):
+    """ Name of the partition holding a submission's rows of a staging table, until it's archived """
+    return '{}_submission_{}'.format(table_name, int(submission_id))
+
+
+def partitioned_tables(connection):
+    """ Names of the staging tables that are partitioned by submission in the database, none of them on databases
+        that don't support it """
+    names = [model.__tablename__ for model in SUBMISSION_PARTITIONED_MODELS]
+    rows = connection.execute(text("SELECT relname FROM pg_class WHERE relkind = 'p' AND relname = ANY(:names) "
+                                   "AND relnamespace = CAST(current_schema() AS regnamespace)"), {'names': names})
+    partitioned = {row.relname for row in rows}
+    return [name for name in names if name in partitioned]
+
+
+def create_submission_partitions(connection, submission_id):
+    """ Give a submission a partition of its own in each partitioned staging table that it doesn't have one in yet.
+        The partitions are created empty and then attached, which doesn't block reads or writes of the tables the way
+        CREATE TABLE ... PARTITION OF does. Attaching still takes a lock on each staging table that other attaches,
+        and the archiving of partitions, wait on, and adding the partition's foreign key locks the submission table
+        against writes. Both are held until the transaction ends, so the caller commits right away.
+
+    Args:
+        connection: connection or session to create the partitions on, in a transaction of their own
+        submission_id: ID of the submission
+    """
+    submission_id = int(submission_id)
+    for table_name in partitioned_tables(connection):
+        partition = submission_partition_name(table_name, submission_id)
+        if connection.execute(text('SELECT to_regclass(:partition)'), {'partition': partition}).scalar() is not None:
+            # Only when a submission is created with the ID of one that was deleted before it was archived
+            continue
+        # The check matches the partition's bounds, so attaching it doesn't need to scan it
+        connection.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS, CHECK (submission_id >= {} AND '
+                           'submission_id < {}))'.format(partition, table_name, submission_id, submission_id + 1))
+        connection.execute('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM ({}) TO ({})'.format(
+            table_name, partition, submission_id, submission_id + 1))
@@ -1,6 +1,6 @@
 """ These classes define the ORM models to be used by sqlalchemy for the job tracker database """
 
-from sqlalchemy import Column, Integer, Text, ForeignKey, Boolean
+from sqlalchemy import BigInteger, Column, Float, Integer, Index, Text, ForeignKey, Boolean
 from sqlalchemy.orm import relationship
 from dataactcore.models.baseModel import Base
 
@@ -57,3 +57,26 @@ class RuleSql(Base):
     target_file_id = Column(Integer, ForeignKey("file_type.file_type_id", name="fk_target_file"), nullable=True)
     target_file = relationship("FileType", uselist=False, foreign_keys=[target_file_id])
     query_name = Column(Text)
+
+
+class RuleExecutionStats(Base):
+    """ How long a rule or fused rule query took for one job, and how many rows it read and returned """
+    __tablename__ = "rule_execution_stats"
+
+    rule_execution_stats_id = Column(Integer, primary_key=True)
+    submission_id = Column(Integer, index=True)
+    job_id = Column(Integer)
+    query_name = Column(Text, nullable=False)
+    rule_label = Column(Text)
+    file_type_id = Column(Integer, ForeignKey("file_type.file_type_id", name="fk_rule_execution_stats_file_type"),
+                          nullable=True)
+    target_file_type_id = Column(Integer, ForeignKey("file_type.file_type_id",
+                                                     name="fk_rule_execution_stats_target_file_type"), nullable=True)
+    file_rows = Column(Integer)
+    duration = Column(Float)
+    rows_returned = Column(Integer)
+    rows_scanned = Column(BigInteger)
+    flex_duration = Column(Float)
+    report_duration = Column(Float)
+
+    __table_args__ = (Index('ix_rule_execution_stats_query_file_rows', 'query_name', 'file_type_id', 'file_rows'),)
@@ -0,0 +1,111 @@
+import argparse
+from datetime import datetime, timedelta
+import logging
+import re
+
+from dataactcore.interfaces.db import GlobalDB
+from dataactcore.logging import configure_logging
+from dataactcore.models.stagingModels import partitioned_tables, submission_partition_name
+from dataactcore.models.views import SubmissionUpdatedView
+from dataactvalidator.health_check import create_app
+
+logger = logging.getLogger(__name__)
+
+
+def list_partitions(sess, table_name):
+    """ Partitions of a staging table, as the range of submissions each one holds
+
+    Args:
+        sess: current DB session
+        table_name: name of the partitioned staging table
+
+    Returns:
+        sorted list of (first submission ID, submission ID after the last, whether it's an archive partition)
+    """
+    own_partition = re.compile(r'^{}_submission_(\d+)$'.format(table_name))
+    archive_partition = re.compile(r'^{}_archive_(\d+)_(\d+)$'.format(table_name))
+    partitions = []
+    for row in sess.execute('SELECT CAST(inhrelid AS regclass) AS name FROM pg_inherits '
+                            'WHERE inhparent = to_regclass(:table_name)', {'table_name': table_name}):
+        name = str(row.name)
+        own = own_partition.match(name)
+        archive = archive_partition.match(name)
+        if own:
+            partitions.append((int(own.group(1)), int(own.group(1)) + 1, False))
+        elif archive:
+            partitions.append((int(archive.group(1)), int(archive.group(2)), True))
+    return sorted(partitions)
+
+
+def archivable_runs(partitions, active_ids, min_run=2):
+    """ Runs of neighbouring submission partitions that can be merged into one archive partition
+
+    Args:
+        partitions: partitions of the table, as returned by list_partitions
+        active_ids: IDs of the submissions that keep their own partitions
+        min_run: number of submission partitions it takes to be worth merging
+
+    Returns:
+        list of lists of the submission IDs in each run, in order
+    """
+    runs = [[]]
+    for start, _, archive in partitions:
+        if archive or start in active_ids:
+            runs.append([])
+        else:
+            runs[-1].append(start)
+    return [run for run in runs if len(run) >= min_run]
+
+
+def archive_run(sess, table_name, submission_ids):
+    """ Merge the partitions of a run of submissions into one archive partition covering all of them
+
+    Args:
+        sess: current DB session
+        table_name: name of the partitioned staging table
+        submission_ids: IDs of the submissions in the run, in order
+    """
+    start, end = submission_ids[0], submission_ids[-1] + 1
+    archive = '{}_archive_{}_{}'.format(table_name, start, end)
+    sess.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS, CHECK (submission_id >= {} AND submission_id < {}))'.
+                 format(archive, table_name, start, end))
+    for submission_id in submission_ids:
+        partition = submission_partition_name(table_name, submission_id)
+        sess.execute('ALTER TABLE {} DETACH PARTITION {}'.format(table_name, partition))
+        sess.execute('INSERT INTO {} SELECT * FROM {}'.format(archive, partition))
+        sess.execute('DROP TABLE {}'.format(partition))
+    sess.execute('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM ({}) TO ({})'.format(
+        table_name, archive, start, end))
+    sess.commit()
+    logger.info('Archived %s submissions of %s to %s', len(submission_ids), table_name, archive)
+
+
+def archive_partitions(sess, days):
+    """ Merge the staging partitions of the submissions that haven't been updated for a number of days, or that have
+        been deleted, into archive partitions. Detaching a partition locks its table, so this is run when the broker
+        isn't busy. Archived submissions can still be validated again, their rows are deleted rather than truncated.
+
+    Args:
+        sess: current DB session
+        days: days since its last update a submission keeps its own partitions
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    # updated whenever the submission or one of its jobs is
+    updated_view = SubmissionUpdatedView()
+    active_ids = {row.submission_id for row in
+                  sess.query(updated_view.submission_id).filter(updated_view.updated_at >= cutoff)}
+    for table_name in partitioned_tables(sess):
+        for run in archivable_runs(list_partitions(sess, table_name), active_ids):
+            archive_run(sess, table_name, run)
+
+
+if __name__ == '__main__':
+    configure_logging()
+    parser = argparse.ArgumentParser(description='Merge the staging table partitions of submissions that are no '
+                                                 'longer being worked on into archive partitions')
+    parser.add_argument('-d', '--days', type=int, default=30,
+                        help='Days since its last update a submission keeps its own partitions')
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        archive_partitions(GlobalDB.db().session, args.days)
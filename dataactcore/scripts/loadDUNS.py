@@ -6,7 +6,6 @@ import re
 from collections import OrderedDict
 import numpy as np
 import argparse
-import zipfile
 import paramiko
 import time
 from sqlalchemy.exc import IntegrityError
@@ -15,7 +14,7 @@ from dataactcore.models.domainModels import DUNS
 from dataactcore.interfaces.db import GlobalDB
 from dataactcore.logging import configure_logging
 from dataactvalidator.health_check import create_app
-from dataactvalidator.scripts.loaderUtils import clean_data, insert_dataframe
+from dataactvalidator.scripts.loaderUtils import clean_data, insert_dataframe, read_zipped_csv
 from dataactcore.config import CONFIG_BROKER
 
 
@@ -119,76 +118,57 @@ def parse_sam_file(file_path, sess, monthly=False, benchmarks=False):
         }
         column_header_mapping_ordered = OrderedDict(sorted(column_header_mapping.items(), key=lambda c: c[1]))
 
-        # Initial sweep of the file to see rows and possibly what DUNS we're updating
-        if benchmarks:
-            initial_sweep = time.time()
-        nrows = 0
-        with zipfile.ZipFile(file_path) as zip_file:
-            with zip_file.open(dat_file_name) as dat_file:
-                nrows = len(dat_file.readlines())
-        if benchmarks:
-            logger.info("Initial sweep took {} seconds".format(time.time() - initial_sweep))
-
         block_size = 10000
-        batches = nrows//block_size
-        # skip the first line again if the last batch is also the first batch
-        skiplastrows = 2 if batches == 0 else 1
-        last_block_size = (nrows % block_size)-skiplastrows
-        batch = 0
         added_rows = 0
-        while batch <= batches:
-            skiprows = 1 if batch == 0 else (batch*block_size)
-            nrows = (((batch+1)*block_size)-skiprows) if (batch < batches) else last_block_size
-            logger.info('loading rows %s to %s', skiprows+1, nrows+skiprows)
-
-            with zipfile.ZipFile(file_path) as zip_file:
-                with zip_file.open(dat_file_name) as dat_file:
-                    csv_data = pd.read_csv(dat_file, dtype=str, header=None, skiprows=skiprows, nrows=nrows, sep='|',
-                                           usecols=column_header_mapping_ordered.values(),
-                                           names=column_header_mapping_ordered.keys(), quoting=3)
-
-                    # add deactivation_date column for delete records
-                    lambda_func = (lambda sam_extract: pd.Series([dat_file_date if sam_extract == "1" else np.nan]))
-                    csv_data = csv_data.assign(deactivation_date=pd.Series([np.nan], name='deactivation_date')
-                                               if monthly else csv_data["sam_extract_code"].apply(lambda_func))
-                    # removing rows where DUNS number isn't even provided
-                    csv_data = csv_data.where(csv_data["awardee_or_recipient_uniqu"].notnull())
-                    # cleaning and replacing NaN/NaT with None's
-                    csv_data = clean_sam_data(csv_data.where(pd.notnull(csv_data), None))
-
-                    if monthly:
-                        logger.info("adding all monthly data with bulk load")
-                        if benchmarks:
-                            bulk_month_load = time.time()
-                        del csv_data["sam_extract_code"]
-                        insert_dataframe(csv_data, DUNS.__table__.name, sess.connection())
-                        if benchmarks:
-                            logger.info("Bulk month load took {} seconds".format(time.time()-bulk_month_load))
-                    else:
-                        add_data = csv_data[csv_data.sam_extract_code == '2']
-                        update_delete_data = csv_data[(csv_data.sam_extract_code == '3') |
-                                                      (csv_data.sam_extract_code == '1')]
-                        for dataframe in [add_data, update_delete_data]:
-                            del dataframe["sam_extract_code"]
-
-                        if not add_data.empty:
-                            try:
-                                logger.info("attempting to bulk load add data")
-                                insert_dataframe(add_data, DUNS.__table__.name, sess.connection())
-                            except IntegrityError:
-                                logger.info("bulk loading add data failed, loading add data by row")
-                                sess.rollback()
-                                models, activated_models = get_relevant_models(add_data, benchmarks=benchmarks)
-                                logger.info("loading add data ({} rows)".format(len(add_data.index)))
-                                load_duns_by_row(add_data, sess, models, activated_models, benchmarks=benchmarks)
-                        if not update_delete_data.empty:
-                            models, activated_models = get_relevant_models(update_delete_data, benchmarks=benchmarks)
-                            logger.info("loading update_delete data ({} rows)".format(len(update_delete_data.index)))
-                            load_duns_by_row(update_delete_data, sess, models, activated_models, benchmarks=benchmarks)
-                    sess.commit()
+        # skip the header and footer lines
+        for csv_data in read_zipped_csv(file_path, dat_file_name, chunk_size=block_size, skip_footer=1, dtype=str,
+                                        header=None, skiprows=1, sep='|',
+                                        usecols=column_header_mapping_ordered.values(),
+                                        names=column_header_mapping_ordered.keys(), quoting=3):
+            nrows = len(csv_data.index)
+            logger.info('loading rows %s to %s', added_rows + 1, added_rows + nrows)
+
+            # add deactivation_date column for delete records
+            lambda_func = (lambda sam_extract: pd.Series([dat_file_date if sam_extract == "1" else np.nan]))
+            csv_data = csv_data.assign(deactivation_date=pd.Series([np.nan], name='deactivation_date')
+                                       if monthly else csv_data["sam_extract_code"].apply(lambda_func))
+            # removing rows where DUNS number isn't even provided
+            csv_data = csv_data.where(csv_data["awardee_or_recipient_uniqu"].notnull())
+            # cleaning and replacing NaN/NaT with None's
+            csv_data = clean_sam_data(csv_data.where(pd.notnull(csv_data), None))
+
+            if monthly:
+                logger.info("adding all monthly data with bulk load")
+                if benchmarks:
+                    bulk_month_load = time.time()
+                del csv_data["sam_extract_code"]
+                insert_dataframe(csv_data, DUNS.__table__.name, sess.connection())
+                if benchmarks:
+                    logger.info("Bulk month load took {} seconds".format(time.time()-bulk_month_load))
+            else:
+                add_data = csv_data[csv_data.sam_extract_code == '2']
+                update_delete_data = csv_data[(csv_data.sam_extract_code == '3') |
+                                              (csv_data.sam_extract_code == '1')]
+                for dataframe in [add_data, update_delete_data]:
+                    del dataframe["sam_extract_code"]
+
+                if not add_data.empty:
+                    try:
+                        logger.info("attempting to bulk load add data")
+                        insert_dataframe(add_data, DUNS.__table__.name, sess.connection())
+                    except IntegrityError:
+                        logger.info("bulk loading add data failed, loading add data by row")
+                        sess.rollback()
+                        models, activated_models = get_relevant_models(add_data, benchmarks=benchmarks)
+                        logger.info("loading add data ({} rows)".format(len(add_data.index)))
+                        load_duns_by_row(add_data, sess, models, activated_models, benchmarks=benchmarks)
+                if not update_delete_data.empty:
+                    models, activated_models = get_relevant_models(update_delete_data, benchmarks=benchmarks)
+                    logger.info("loading update_delete data ({} rows)".format(len(update_delete_data.index)))
+                    load_duns_by_row(update_delete_data, sess, models, activated_models, benchmarks=benchmarks)
+            sess.commit()
 
             added_rows += nrows
-            batch += 1
             logger.info('%s DUNS records inserted', added_rows)
         if benchmarks:
             logger.info("Parsing {} took {} seconds with {} rows".format(dat_file_name, time.time()-parse_start_time,
@@ -15,7 +15,7 @@ from dataactcore.interfaces.db import GlobalDB
 from dataactcore.models.jobModels import Submission # noqa
 from dataactcore.models.userModel import User # noqa
 from dataactcore.models.stagingModels import PublishedAwardFinancialAssistance
-from dataactcore.models.domainModels import SubTierAgency, CountyCode, States, Zips, ZipCity, CityCode
+from dataactcore.models.domainModels import SubTierAgency, CountyCode, States, ZipCity, CityCode, find_zip
 from dataactvalidator.health_check import create_app
 from dataactvalidator.scripts.loaderUtils import clean_data, insert_dataframe
 
@@ -300,16 +300,11 @@ def derive_place_of_perform_county_na(row, sess, fips_state_list, state_code_lis
     zip_four = None
     if len(row['principal_place_zip']) > 5:
         zip_four = row['principal_place_zip'][-4:]
-    if zip_four:
-        zip_info = sess.query(Zips.state_abbreviation, Zips.county_number).\
-            filter_by(zip5=zip_five, zip_last4=zip_four).first()
-    else:
-        zip_info = sess.query(Zips.state_abbreviation, Zips.county_number).\
-            filter_by(zip5=zip_five).first()
+    zip_info = find_zip(sess, zip_five, zip_four)
     if not zip_info:
         return None
     county_info = sess.query(CountyCode.county_name).\
-        filter_by(county_number=zip_info[0], state_code=zip_info[1]).first()
+        filter_by(county_number=zip_info.county_number, state_code=zip_info.state_abbreviation).first()
     if county_info:
         return county_info[0]
     return None
@@ -358,17 +353,16 @@ def derive_legal_entity_state_name(row, sess, fips_state_list, state_code_list):
         zip_data = None
         # if we have a legal entity zip+4 provided
         if row['legal_entity_zip_last4'] and not pd.isnull(row['legal_entity_zip_last4']):
-            zip_data = sess.query(Zips.state_abbreviation).\
-                filter_by(zip5=row['legal_entity_zip5'], zip_last4=row['legal_entity_zip_last4']).first()
+            zip_data = find_zip(sess, row['legal_entity_zip5'], row['legal_entity_zip_last4'])
 
         # if legal_entity_zip_last4 returned no results (invalid combination), grab the first entry for this zip5
         # for derivation purposes.
         if not zip_data:
-            zip_data = sess.query(Zips.state_abbreviation).filter_by(zip5=row['legal_entity_zip5']).first()
+            zip_data = find_zip(sess, row['legal_entity_zip5'])
         if not zip_data:
             return None
         # legal entity state data
-        state_info = state_code_list[zip_data[0]]
+        state_info = state_code_list[zip_data.state_abbreviation]
         if not state_info:
             return None
         return state_info.state_name
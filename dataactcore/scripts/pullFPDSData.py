@@ -1,25 +1,26 @@
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 import os
 import urllib.request
 import boto
-import zipfile
 import logging
 import argparse
 import requests
 import xmltodict
 import numpy as np
-import pandas as pd
 import csv
 
 import datetime
 import time
 import re
-import threading
 
 from dataactcore.logging import configure_logging
 from dataactcore.config import CONFIG_BROKER
 
+from sqlalchemy import text
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 from dataactcore.interfaces.db import GlobalDB
 from dataactcore.utils.statusCode import StatusCode
@@ -32,11 +33,39 @@ from dataactcore.models.jobModels import Submission  # noqa
 from dataactcore.models.userModel import User  # noqa
 
 from dataactvalidator.health_check import create_app
-from dataactvalidator.scripts.loaderUtils import clean_data, insert_dataframe
+from dataactvalidator.scripts.loaderUtils import clean_data, insert_dataframe, read_zipped_csv
 
 feed_url = "https://www.fpds.gov/ezsearch/FEEDS/ATOM?FEEDNAME=PUBLIC&templateName=1.4.5&q="
 delete_url = "https://www.fpds.gov/ezsearch/FEEDS/ATOM?FEEDNAME=DELETED&templateName=1.4.5&q="
 
+feed_namespaces = {'http://www.fpdsng.com/FPDS': None, 'http://www.w3.org/2005/Atom': None}
+
+# Entries on each page of the feeds, a page with fewer is the last one
+FEED_PAGE_SIZE = 10
+# Number of pages requested at once
+FEED_REQUESTS = 10
+# Number of pages requested and processed ahead of the one being written
+FEED_LOOKAHEAD = 100
+# Number of threads parsing and processing pages
+FEED_PARSERS = 4
+# Number of entries written to the DB at once
+WRITE_BATCH_SIZE = 1000
+# Seconds to wait before each retry of a failed request
+RETRY_SLEEP_TIMES = [5, 30, 60]
+# Most values bound in one upsert statement, postgres allows 65535
+MAX_STATEMENT_PARAMS = 60000
+# Number of deleted entries removed by each delete statement
+DELETE_BATCH_SIZE = 10000
+
+# Deletes the entries in a batch from the delete feed which haven't been modified since they were deleted
+delete_statement = text("""
+    DELETE FROM detached_award_procurement AS dap
+    USING unnest(CAST(:uniques AS TEXT[]), CAST(:last_modifieds AS TEXT[]))
+        AS deleted(detached_award_proc_unique, last_modified)
+    WHERE dap.detached_award_proc_unique = deleted.detached_award_proc_unique
+        AND dap.last_modified < deleted.last_modified
+""")
+
 logger = logging.getLogger(__name__)
 logging.getLogger("requests").setLevel(logging.WARNING)
 
@@ -752,15 +781,37 @@ def vendor_site_details_values(data, obj):
     return obj
 
 
+# Agency a sub-tier belongs to, its FREC when the sub-tier is a FREC agency and its CGAC otherwise
+SubTier = namedtuple('SubTier', ['agency_code', 'agency_name', 'sub_tier_agency_name'])
+
+
+def load_sub_tiers(sess):
+    """ Load every sub-tier agency with the agency it belongs to, as plain data that the threads processing the
+        feeds can read without going through the session
+
+    Args:
+        sess: current DB session
+
+    Returns:
+        dict of sub-tier agency code to SubTier
+    """
+    sub_tiers = sess.query(SubTierAgency).options(joinedload(SubTierAgency.cgac), joinedload(SubTierAgency.frec)).all()
+    sub_tier_list = {}
+    for sub_tier in sub_tiers:
+        agency = sub_tier.frec if sub_tier.is_frec else sub_tier.cgac
+        agency_code = agency.frec_code if sub_tier.is_frec else agency.cgac_code
+        sub_tier_list[sub_tier.sub_tier_agency_code] = SubTier(agency_code, agency.agency_name,
+                                                               sub_tier.sub_tier_agency_name)
+    return sub_tier_list
+
+
 def calculate_remaining_fields(obj, sub_tier_list):
     """ calculate values that aren't in any feed but can be calculated """
     if obj['awarding_sub_tier_agency_c']:
         try:
             sub_tier_agency = sub_tier_list[obj['awarding_sub_tier_agency_c']]
-            use_frec = sub_tier_agency.is_frec
-            agency_data = sub_tier_agency.frec if use_frec else sub_tier_agency.cgac
-            obj['awarding_agency_code'] = agency_data.frec_code if use_frec else agency_data.cgac_code
-            obj['awarding_agency_name'] = agency_data.agency_name
+            obj['awarding_agency_code'] = sub_tier_agency.agency_code
+            obj['awarding_agency_name'] = sub_tier_agency.agency_name
         except KeyError:
             logger.info('WARNING: MissingSubtierCGAC: The awarding sub-tier cgac_code: %s does not exist in cgac table.'
                         ' The FPDS-provided awarding sub-tier agency name (if given) for this cgac_code is %s. '
@@ -772,10 +823,8 @@ def calculate_remaining_fields(obj, sub_tier_list):
     if obj['funding_sub_tier_agency_co']:
         try:
             sub_tier_agency = sub_tier_list[obj['funding_sub_tier_agency_co']]
-            use_frec = sub_tier_agency.is_frec
-            agency_data = sub_tier_agency.frec if use_frec else sub_tier_agency.cgac
-            obj['funding_agency_code'] = agency_data.frec_code if use_frec else agency_data.cgac_code
-            obj['funding_agency_name'] = agency_data.agency_name
+            obj['funding_agency_code'] = sub_tier_agency.agency_code
+            obj['funding_agency_name'] = sub_tier_agency.agency_name
         except KeyError:
             logger.info('WARNING: MissingSubtierCGAC: The funding sub-tier cgac_code: %s does not exist in cgac table. '
                         'The FPDS-provided funding sub-tier agency name (if given) for this cgac_code is %s. '
@@ -1013,27 +1062,161 @@ def add_processed_data_list(data, sess):
         sess.commit()
     except IntegrityError:
         sess.rollback()
-        logger.error("Attempted to insert duplicate FPDS data. Inserting each row in batch individually.")
-
-        for fpds_obj in data:
-            insert_statement = insert(DetachedAwardProcurement).values(**fpds_obj). \
-                on_conflict_do_update(index_elements=['detached_award_proc_unique'], set_=fpds_obj)
-            sess.execute(insert_statement)
+        logger.error("Attempted to insert duplicate FPDS data. Upserting the batch instead.")
+        upsert_processed_data_list(data, sess)
         sess.commit()
 
 
-def process_and_add(data, contract_type, sess, sub_tier_list):
-    """ start the processing for data and add it to the DB """
-    for value in data:
-        tmp_obj = process_data(value['content'][contract_type], atom_type=contract_type, sub_tier_list=sub_tier_list)
-        insert_statement = insert(DetachedAwardProcurement).values(**tmp_obj).\
-            on_conflict_do_update(index_elements=['detached_award_proc_unique'], set_=tmp_obj)
-        sess.execute(insert_statement)
+def upsert_processed_data_list(data, sess):
+    """ Add processed data to the DB with multi-row upserts, replacing any entries already there
+
+    Args:
+        data: list of processed entries, where an entry is listed more than once the last one is kept
+        sess: current DB session
+    """
+    # a statement can't update the same row twice
+    latest = OrderedDict()
+    for fpds_obj in data:
+        latest[fpds_obj['detached_award_proc_unique']] = fpds_obj
+
+    # rows inserted by the same statement need the same columns, only the columns given are updated
+    by_columns = OrderedDict()
+    for fpds_obj in latest.values():
+        by_columns.setdefault(tuple(sorted(fpds_obj)), []).append(fpds_obj)
+
+    for columns, rows in by_columns.items():
+        rows_per_statement = max(1, MAX_STATEMENT_PARAMS // len(columns))
+        for start in range(0, len(rows), rows_per_statement):
+            insert_statement = insert(DetachedAwardProcurement).values(rows[start:start + rows_per_statement])
+            sess.execute(insert_statement.on_conflict_do_update(
+                index_elements=['detached_award_proc_unique'],
+                set_={column: insert_statement.excluded[column] for column in columns}))
+
+
+def delete_processed_data_list(data, sess):
+    """ Delete the entries listed in a delete feed, unless they've been modified since they were deleted
+
+    Args:
+        data: list of (last_modified, detached_award_proc_unique) of the deleted entries
+        sess: current DB session
+
+    Returns:
+        the number of rows deleted
+    """
+    # an entry is deleted if any of its deletions are later than its last modification
+    latest = {}
+    for last_modified, unique_string in data:
+        if unique_string not in latest or last_modified > latest[unique_string]:
+            latest[unique_string] = last_modified
+
+    deletions = list(latest.items())
+    deleted = 0
+    for start in range(0, len(deletions), DELETE_BATCH_SIZE):
+        chunk = deletions[start:start + DELETE_BATCH_SIZE]
+        deleted += sess.execute(delete_statement, {'uniques': [unique_string for unique_string, _ in chunk],
+                                                   'last_modifieds': [last_modified for _, last_modified in chunk]}
+                                ).rowcount
+    return deleted
+
+
+def get_feed_page(url, start):
+    """ Request a page of a feed, retrying failed requests after a growing delay
+
+    Args:
+        url: feed url, including the query
+        start: index of the first entry on the page
+
+    Returns:
+        the text of the response
+
+    Raises:
+        ResponseException: if every retry failed
+    """
+    for retry_sleep in RETRY_SLEEP_TIMES + [None]:
+        try:
+            resp = requests.get(url + '&start=' + str(start), timeout=60)
+            resp.raise_for_status()
+            return resp.text
+        except (requests.exceptions.RequestException, ConnectionResetError) as e:
+            if retry_sleep is None:
+                raise ResponseException(
+                    "Connection to FPDS feed lost, maximum retry attempts exceeded.", StatusCode.INTERNAL_ERROR
+                )
+            logger.warning('Request for FPDS feed entries from %s failed, retrying in %s seconds: %s', start,
+                           retry_sleep, e)
+            time.sleep(retry_sleep)
+
+
+def parse_feed_page(text):
+    """ Get the list of entries on a page of a feed """
+    resp_data = xmltodict.parse(text, process_namespaces=True, namespaces=feed_namespaces)
+    # only list the data if there's data to list
+    try:
+        return list_data(resp_data['feed']['entry'])
+    except KeyError:
+        return []
+
+
+def pull_feed(url, process_entries, write_entries):
+    """ Read every entry of a feed. Pages are requested several at a time and parsed and processed on a pool of
+        threads, while the calling thread writes the processed entries in batches, in the order they're in the feed.
+
+    Args:
+        url: feed url, including the query
+        process_entries: function to process a page's list of entries, returning a list of what's written
+        write_entries: function to write a list of processed entries, only called from the calling thread
+
+    Returns:
+        the number of entries in the feed
+    """
+    fetch_pool = ThreadPoolExecutor(max_workers=FEED_REQUESTS)
+    parse_pool = ThreadPoolExecutor(max_workers=FEED_PARSERS)
+
+    def submit_page(start):
+        processed = Future()
+
+        def parse(fetched):
+            try:
+                entries = parse_feed_page(fetched.result())
+                processed.set_result((len(entries), process_entries(entries)))
+            except Exception as e:
+                processed.set_exception(e)
+
+        processed.fetched = fetch_pool.submit(get_feed_page, url, start)
+        processed.fetched.add_done_callback(lambda fetched: parse_pool.submit(parse, fetched))
+        return processed
+
+    pages = deque()
+    next_start = 0
+    total = 0
+    data = []
+    last_page = False
+    try:
+        while not last_page:
+            while len(pages) < FEED_LOOKAHEAD:
+                pages.append(submit_page(next_start))
+                next_start += FEED_PAGE_SIZE
+
+            entry_count, processed = pages.popleft().result()
+            total += entry_count
+            data.extend(processed)
+            # if we got less than a full page of records, we can stop calling the feed
+            last_page = entry_count < FEED_PAGE_SIZE
+
+            if len(data) >= WRITE_BATCH_SIZE or last_page:
+                write_entries(data)
+                data = []
+    finally:
+        # don't request pages past the end of the feed that haven't been requested yet
+        for page in pages:
+            page.fetched.cancel()
+        fetch_pool.shutdown()
+        parse_pool.shutdown()
+    return total
 
 
 def get_data(contract_type, award_type, now, sess, sub_tier_list, last_run=None):
     """ get the data from the atom feed based on contract/award type and the last time the script was run """
-    data = []
     yesterday = now - datetime.timedelta(days=1)
     # if a date that the script was last successfully run is not provided, get all data
     if not last_run:
@@ -1050,75 +1233,21 @@ def get_data(contract_type, award_type, now, sess, sub_tier_list, last_run=None)
     # params = 'VENDOR_ADDRESS_COUNTRY_CODE:"GBR"'
     # params = 'PIID:"0046"+REF_IDV_PIID:"W56KGZ15A6000"'
 
-    i = 0
-    loops = 0
-    logger.info('Starting get feed: ' + feed_url + params + 'CONTRACT_TYPE:"' + contract_type.upper() +
-                '" AWARD_TYPE:"' + award_type + '"')
-    while True:
-        loops += 1
-        exception_retries = -1
-        retry_sleep_times = [5, 30, 60]
-        # looping in case feed breaks
-        while True:
-            try:
-                resp = requests.get(feed_url + params + 'CONTRACT_TYPE:"' + contract_type.upper() + '" AWARD_TYPE:"' +
-                                    award_type + '"&start=' + str(i), timeout=60)
-                resp_data = xmltodict.parse(resp.text, process_namespaces=True,
-                                            namespaces={'http://www.fpdsng.com/FPDS': None,
-                                                        'http://www.w3.org/2005/Atom': None})
-                break
-            except ConnectionResetError:
-                exception_retries += 1
-                # retry up to 3 times before raising an error
-                if exception_retries < 3:
-                    time.sleep(retry_sleep_times[exception_retries])
-                else:
-                    raise ResponseException(
-                        "Connection to FPDS feed lost, maximum retry attempts exceeded.", StatusCode.INTERNAL_ERROR
-                    )
-
-        # only list the data if there's data to list
-        try:
-            listed_data = list_data(resp_data['feed']['entry'])
-        except KeyError:
-            listed_data = []
+    url = feed_url + params + 'CONTRACT_TYPE:"' + contract_type.upper() + '" AWARD_TYPE:"' + award_type + '"'
+    logger.info('Starting get feed: ' + url)
 
-        # if we're calling threads, we want to just add to the list, otherwise we want to process the data now
+    def write_entries(data):
+        logger.info("Writing %s lines of get %s: %s feed to DB", len(data), contract_type, award_type)
+        # when getting the latest data, entries may already be in the DB
         if last_run:
-            for ld in listed_data:
-                data.append(ld)
-                i += 1
+            upsert_processed_data_list(data, sess)
         else:
-            data.extend(create_processed_data_list(listed_data, contract_type, sub_tier_list))
-            i += len(listed_data)
-
-        # Log which one we're on so we can keep track of how far we are, insert into DB ever 1k lines
-        if loops % 100 == 0 and loops != 0:
-            logger.info("Retrieved %s lines of get %s: %s feed, writing next 1,000 to DB", i, contract_type, award_type)
-            # if we're calling threads, we want process_and_add, otherwise we want add_processed_data_list
-            if last_run:
-                process_and_add(data, contract_type, sess, sub_tier_list)
-            else:
-                add_processed_data_list(data, sess)
-            data = []
-
-            logger.info("Successfully inserted 1,000 lines of get %s: %s feed, continuing feed retrieval",
-                        contract_type, award_type)
-
-        # if we got less than 10 records, we can stop calling the feed
-        if len(listed_data) < 10:
-            break
+            add_processed_data_list(data, sess)
 
-    logger.info("Total entries in %s: %s feed: " + str(i), contract_type, award_type)
-
-    # insert whatever is left
-    logger.info("Processing remaining lines for %s: %s feed", contract_type, award_type)
-    # if we're calling threads, we want process_and_add, otherwise we want add_processed_data_list
-    if last_run:
-        process_and_add(data, contract_type, sess, sub_tier_list)
-    else:
-        add_processed_data_list(data, sess)
+    total = pull_feed(url, lambda entries: create_processed_data_list(entries, contract_type, sub_tier_list),
+                      write_entries)
 
+    logger.info("Total entries in %s: %s feed: " + str(total), contract_type, award_type)
     logger.info("processed " + contract_type + ": " + award_type + " data")
 
 
@@ -1129,53 +1258,19 @@ def get_delete_data(contract_type, now, sess, last_run):
     last_run_date = last_run.update_date
     params = 'LAST_MOD_DATE:[' + last_run_date.strftime('%Y/%m/%d') + ',' + yesterday.strftime('%Y/%m/%d') + '] '
 
-    i = 0
-    logger.info('Starting delete feed: ' + delete_url + params + 'CONTRACT_TYPE:"' + contract_type.upper() + '"')
-    while True:
-        resp = requests.get(delete_url + params + 'CONTRACT_TYPE:"' + contract_type.upper() + '"&start=' + str(i),
-                            timeout=60)
-        resp_data = xmltodict.parse(resp.text, process_namespaces=True,
-                                    namespaces={'http://www.fpdsng.com/FPDS': None,
-                                                'http://www.w3.org/2005/Atom': None})
-        # only list the data if there's data to list
-        try:
-            listed_data = list_data(resp_data['feed']['entry'])
-        except KeyError:
-            listed_data = []
-
-        for ld in listed_data:
-            data.append(ld)
-            i += 1
-
-        # Every 100 lines, log which one we're on so we can keep track of how far we are
-        if i % 100 == 0:
-            logger.info("On line " + str(i) + " of %s delete feed", contract_type)
-
-        # if we got less than 10 records, we can stop calling the feed
-        if len(listed_data) < 10:
-            break
-
-    logger.info("Total entries in %s delete feed: " + str(i), contract_type)
-
-    delete_list = []
-    for value in data:
-        # get last modified date
-        last_modified = value['content'][contract_type]['transactionInformation']['lastModifiedDate']
-        unique_string = process_delete_data(value['content'][contract_type], atom_type=contract_type)
+    url = delete_url + params + 'CONTRACT_TYPE:"' + contract_type.upper() + '"'
+    logger.info('Starting delete feed: ' + url)
 
-        existing_item = sess.query(DetachedAwardProcurement).\
-            filter_by(detached_award_proc_unique=unique_string).one_or_none()
+    def process_entries(entries):
+        # get last modified date and unique key of each entry
+        return [(value['content'][contract_type]['transactionInformation']['lastModifiedDate'],
+                 process_delete_data(value['content'][contract_type], atom_type=contract_type)) for value in entries]
 
-        if existing_item:
-            # only add to delete list if the last modified date is later than the existing entry's last modified date
-            if last_modified > existing_item.last_modified:
-                delete_list.append(existing_item.detached_award_procurement_id)
+    total = pull_feed(url, process_entries, data.extend)
+    logger.info("Total entries in %s delete feed: " + str(total), contract_type)
 
-    # only need to delete values if there's something to delete
-    if delete_list:
-        sess.query(DetachedAwardProcurement).\
-            filter(DetachedAwardProcurement.detached_award_procurement_id.in_(delete_list)).\
-            delete(synchronize_session=False)
+    deleted = delete_processed_data_list(data, sess)
+    logger.info("Deleted %s entries from the %s delete feed", deleted, contract_type)
 
 
 def parse_fpds_file(f, sess, sub_tier_list, naics_dict):
@@ -1183,17 +1278,6 @@ def parse_fpds_file(f, sess, sub_tier_list, naics_dict):
 
     csv_file = 'datafeeds\\' + os.path.splitext(os.path.basename(f.name))[0]
 
-    nrows = 0
-    with zipfile.ZipFile(f.name) as zfile:
-        with zfile.open(csv_file) as dat_file:
-            nrows = len(dat_file.readlines())
-
-    block_size = 10000
-    batches = nrows // block_size
-    last_block_size = (nrows % block_size)
-    batch = 0
-    added_rows = 0
-
     all_cols = [
         "unique_transaction_id", "transaction_status", "dollarsobligated", "baseandexercisedoptionsvalue",
         "baseandalloptionsvalue", "maj_agency_cat", "mod_agency", "maj_fund_agency_cat", "contractingofficeagencyid",
@@ -1251,23 +1335,20 @@ def parse_fpds_file(f, sess, sub_tier_list, naics_dict):
         "prime_awardee_executive4_compensation", "prime_awardee_executive5", "prime_awardee_executive5_compensation",
         "interagencycontractingauthority", "last_modified_date"]
 
-    while batch <= batches:
-        skiprows = 1 if batch == 0 else (batch * block_size)
-        nrows = (((batch + 1) * block_size) - skiprows) if (batch < batches) else last_block_size
-        logger.info('loading rows %s to %s', skiprows + 1, nrows + skiprows)
-
-        with zipfile.ZipFile(f.name) as zfile:
-            with zfile.open(csv_file) as dat_file:
-                data = pd.read_csv(dat_file, dtype=str, header=None, skiprows=skiprows, nrows=nrows, names=all_cols)
+    block_size = 10000
+    added_rows = 0
+    # skip the header
+    for data in read_zipped_csv(f.name, csv_file, chunk_size=block_size, dtype=str, header=None, skiprows=1,
+                                names=all_cols):
+        logger.info('loading rows %s to %s', added_rows + 1, added_rows + len(data.index))
 
-                cdata = format_fpds_data(data, sub_tier_list, naics_dict)
-                if cdata is not None:
-                    logger.info("loading {} rows".format(len(cdata.index)))
+        cdata = format_fpds_data(data, sub_tier_list, naics_dict)
+        if cdata is not None:
+            logger.info("loading {} rows".format(len(cdata.index)))
 
-                    insert_dataframe(cdata, DetachedAwardProcurement.__table__.name, sess.connection())
+            insert_dataframe(cdata, DetachedAwardProcurement.__table__.name, sess.connection())
 
-        added_rows += nrows
-        batch += 1
+        added_rows += len(data.index)
     sess.commit()
 
 
@@ -1856,10 +1937,7 @@ def map_description_manual(row, header, mappings):
 def map_agency_code(row, header, sub_tier_list):
     try:
         code = str(row[header])
-        sub_tier_agency = sub_tier_list[code]
-        use_frec = sub_tier_agency.is_frec
-        agency_data = sub_tier_agency.frec if use_frec else sub_tier_agency.cgac
-        return agency_data.frec_code if use_frec else agency_data.cgac_code
+        return sub_tier_list[code].agency_code
     except KeyError:
         return '999'
 
@@ -1867,10 +1945,7 @@ def map_agency_code(row, header, sub_tier_list):
 def map_agency_name(row, header, sub_tier_list):
     try:
         code = str(row[header])
-        sub_tier_agency = sub_tier_list[code]
-        use_frec = sub_tier_agency.is_frec
-        agency_data = sub_tier_agency.frec if use_frec else sub_tier_agency.cgac
-        return agency_data.agency_name
+        return sub_tier_list[code].agency_name
     except KeyError:
         return None
 
@@ -1942,11 +2017,9 @@ def main():
     award_types_award = ["BPA Call", "Definitive Contract", "Purchase Order", "Delivery Order"]
     award_types_idv = ["GWAC", "BOA", "BPA", "FSS", "IDC"]
 
-    sub_tiers = sess.query(SubTierAgency).all()
-    sub_tier_list = {}
-
-    for sub_tier in sub_tiers:
-        sub_tier_list[sub_tier.sub_tier_agency_code] = sub_tier
+    # load the agencies up front as plain data, they're used from the threads processing the feeds, which can't share
+    # the session, and commits while writing the feeds would expire ORM objects
+    sub_tier_list = load_sub_tiers(sess)
 
     if args.all:
         if (not args.delivery and not args.other) or (args.delivery and args.other):
@@ -1989,29 +2062,12 @@ def main():
             raise ValueError(
                 "No last_update date present, please run the script with the -a flag to generate an initial dataset")
 
-        thread_list = []
-        # loop through and check all award types, check IDV stuff first because it generally has less content
-        # so the threads will actually leave earlier and can be terminated in the loop
+        # loop through and check all award types, each feed is read with several requests at a time
         for award_type in award_types_idv:
-            t = threading.Thread(target=get_data, args=("IDV", award_type, now, sess, sub_tier_list, last_update),
-                                 name=award_type)
-            thread_list.append(t)
-            t.start()
-
-        # join the threads between types and then start with a fresh set of threads. We don't want to overtax
-        # the CPU
-        for t in thread_list:
-            t.join()
+            get_data("IDV", award_type, now, sess, sub_tier_list, last_update)
 
-        thread_list = []
         for award_type in award_types_award:
-            t = threading.Thread(target=get_data, args=("award", award_type, now, sess, sub_tier_list, last_update),
-                                 name=award_type)
-            thread_list.append(t)
-            t.start()
-
-        for t in thread_list:
-            t.join()
+            get_data("award", award_type, now, sess, sub_tier_list, last_update)
 
         # We also need to process the delete feed
         get_delete_data("IDV", now, sess, last_update)
@@ -75,7 +75,7 @@ mapping = OrderedDict([
 db_columns = [val for key, val in mapping.items()]
 
 
-def query_data(session, agency_code, start, end, page_start, page_stop):
+def query_data(session, agency_code, start, end):
     """ Request D2 file data
 
         Args:
@@ -83,8 +83,9 @@ def query_data(session, agency_code, start, end, page_start, page_stop):
             agency_code - FREC or CGAC code for generation
             start - Beginning of period for D file
             end - End of period for D file
-            page_start - Beginning of pagination
-            page_stop - End of pagination
+
+        Returns:
+            query for the file's rows
     """
     rows = session.query(
         file_model.action_type,
@@ -154,6 +155,5 @@ def query_data(session, agency_code, start, end, page_start, page_stop):
         filter(file_model.is_active.is_(True)).\
         filter(file_model.awarding_agency_code == agency_code).\
         filter(cast(file_model.action_date, Date) >= start).\
-        filter(cast(file_model.action_date, Date) <= end).\
-        slice(page_start, page_stop)
+        filter(cast(file_model.action_date, Date) <= end)
     return rows
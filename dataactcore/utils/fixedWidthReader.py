@@ -0,0 +1,88 @@
+""" Reading files of fixed width records, like the USPS zip code files, without copying the file around per record """
+from collections import namedtuple
+
+# Bytes read from a file at a time
+READ_SIZE = 1024 * 1024
+
+
+class FixedWidthLayout:
+    """ The size of a file's fixed width records and where each field sits in a record.
+
+    Records are read as memoryviews over the bytes read from the file, so walking through a file only copies it once,
+    and only the fields that are needed are decoded.
+    """
+
+    def __init__(self, record_size, fields, encoding='utf-8'):
+        """
+
+        args
+
+        record_size - length of each record in bytes, including any line break
+        fields - list of (name, start, end) byte offsets of each field within a record
+        encoding - encoding of the file's text
+
+        """
+        self.record_size = record_size
+        self.slices = {name: slice(start, end) for name, start, end in fields}
+        self.record_type = namedtuple('Record', [name for name, _, _ in fields])
+        self.encoding = encoding
+
+    def field(self, record, name):
+        """ Decode a single field of a record """
+        return str(record[self.slices[name]], self.encoding)
+
+    def parse(self, record):
+        """ Decode every field of a record
+
+        Args:
+            record: memoryview or bytes of the record
+
+        Returns:
+            namedtuple of the fields, in the order they were given in the layout
+        """
+        return self.record_type(*(str(record[field_slice], self.encoding) for field_slice in self.slices.values()))
+
+    def text(self, record):
+        """ The whole record as text, for logging """
+        return str(record, self.encoding)
+
+    def buffer_records(self, buffer):
+        """ Iterate over the complete records in a buffer, ignoring any partial record at the end
+
+        Args:
+            buffer: bytes, bytearray, mmap or anything else supporting the buffer protocol
+
+        Yields:
+            memoryview of each record, which is only valid until the buffer changes
+        """
+        view = memoryview(buffer)
+        for offset in range(0, len(view) - self.record_size + 1, self.record_size):
+            yield view[offset:offset + self.record_size]
+
+    def records(self, f, skip=0, read_size=READ_SIZE):
+        """ Iterate over the records in a file, reading it a large block at a time
+
+        Args:
+            f: file or response to read from, in binary mode (text is encoded back into bytes)
+            skip: number of records at the start of the file to skip, such as a header
+            read_size: bytes read from the file at a time
+
+        Yields:
+            memoryview of each complete record, which is only valid until the next record is requested
+        """
+        leftover = b''
+        while True:
+            block = f.read(read_size)
+            if not block:
+                break
+            if isinstance(block, str):
+                block = block.encode(self.encoding)
+            # Only the partial record at the end of the last block is copied along with the new block
+            buffer = leftover + block if leftover else block
+            complete_size = len(buffer) - len(buffer) % self.record_size
+            for record in self.buffer_records(memoryview(buffer)[:complete_size]):
+                if skip:
+                    skip -= 1
+                    continue
+                yield record
+            leftover = buffer[complete_size:]
@@ -0,0 +1,256 @@
+""" In-memory copies of the domain tables used to derive FABS fields, so publishing doesn't query them for every row """
+from collections import defaultdict, namedtuple
+import logging
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
+
+from dataactcore.models.domainModels import (
+    CFDAProgram, CGAC, CityCode, CountryCode, CountyCode, FREC, States, SubTierAgency, ZipCity, ZipRange, ZIP4_REGEX)
+from dataactcore.models.stagingModels import FPDSContractingOffice
+
+logger = logging.getLogger(__name__)
+
+CfdaRow = namedtuple('CfdaRow', ['program_number', 'program_title'])
+SubTierRow = namedtuple('SubTierRow', ['sub_tier_agency_code', 'sub_tier_agency_name', 'agency_code', 'agency_name'])
+StateRow = namedtuple('StateRow', ['state_code', 'state_name'])
+CountyRow = namedtuple('CountyRow', ['county_number', 'county_name', 'state_code'])
+ZipCityRow = namedtuple('ZipCityRow', ['zip_code', 'city_name'])
+CityRow = namedtuple('CityRow', ['city_code', 'feature_name', 'state_code', 'county_number', 'county_name'])
+OfficeRow = namedtuple('OfficeRow', ['contracting_office_code', 'contracting_office_name'])
+CountryRow = namedtuple('CountryRow', ['country_code', 'country_name'])
+ZipRow = namedtuple('ZipRow', ['zip5', 'zip4_low', 'zip4_high', 'state_abbreviation', 'county_number',
+                               'congressional_district_no'])
+
+# Number of zips looked up in each query when loading the zips a submission uses
+ZIP_QUERY_SIZE = 1000
+
+
+def lower(value):
+    return value.lower() if value is not None else None
+
+
+def load_cfda(sess):
+    rows = sess.query(CFDAProgram.program_number, CFDAProgram.program_title).order_by(CFDAProgram.cfda_program_id)
+    return {'cfda_program': [(row.program_number, CfdaRow(*row)) for row in rows]}
+
+
+def load_sub_tier_agencies(sess):
+    sub_tiers = sess.query(SubTierAgency).options(joinedload(SubTierAgency.cgac), joinedload(SubTierAgency.frec)).\
+        order_by(SubTierAgency.sub_tier_agency_id)
+    rows = []
+    for sub_tier in sub_tiers:
+        agency = sub_tier.frec if sub_tier.is_frec else sub_tier.cgac
+        agency_code, agency_name = None, None
+        if agency is not None:
+            agency_code = agency.frec_code if sub_tier.is_frec else agency.cgac_code
+            agency_name = agency.agency_name
+        rows.append((sub_tier.sub_tier_agency_code, SubTierRow(sub_tier.sub_tier_agency_code,
+                                                               sub_tier.sub_tier_agency_name, agency_code,
+                                                               agency_name)))
+    return {'sub_tier_agency': rows}
+
+
+def load_states(sess):
+    rows = sess.query(States.state_code, States.state_name).order_by(States.states_id)
+    return {'states': [(row.state_code, StateRow(*row)) for row in rows]}
+
+
+def load_counties(sess):
+    rows = sess.query(CountyCode.county_number, CountyCode.county_name, CountyCode.state_code).\
+        order_by(CountyCode.county_code_id)
+    return {'county_code': [((row.county_number, row.state_code), CountyRow(*row)) for row in rows]}
+
+
+def load_zip_cities(sess):
+    rows = sess.query(ZipCity.zip_code, ZipCity.city_name).order_by(ZipCity.zip_city_id)
+    return {'zip_city': [(row.zip_code, ZipCityRow(*row)) for row in rows]}
+
+
+def load_cities(sess):
+    rows = [CityRow(*row) for row in sess.query(CityCode.city_code, CityCode.feature_name, CityCode.state_code,
+                                                CityCode.county_number, CityCode.county_name).
+            order_by(CityCode.city_code_id)]
+    return {
+        'city_code': [((row.city_code, row.state_code), row) for row in rows],
+        'city_name': [((lower(row.feature_name), lower(row.state_code)), row) for row in rows]
+    }
+
+
+def load_offices(sess):
+    rows = sess.query(FPDSContractingOffice.contracting_office_code, FPDSContractingOffice.contracting_office_name).\
+        order_by(FPDSContractingOffice.FPDS_contracting_office_id)
+    return {'contracting_office': [(row.contracting_office_code, OfficeRow(*row)) for row in rows]}
+
+
+def load_countries(sess):
+    rows = sess.query(CountryCode.country_code, CountryCode.country_name).order_by(CountryCode.country_code_id)
+    return {'country_code': [(row.country_code, CountryRow(*row)) for row in rows]}
+
+
+# Each loader, with the tables whose contents it depends on
+LOADERS = [
+    (load_cfda, [CFDAProgram]),
+    (load_sub_tier_agencies, [SubTierAgency, CGAC, FREC]),
+    (load_states, [States]),
+    (load_counties, [CountyCode]),
+    (load_zip_cities, [ZipCity]),
+    (load_cities, [CityCode]),
+    (load_offices, [FPDSContractingOffice]),
+    (load_countries, [CountryCode])
+]
+
+_cache_lock = threading.Lock()
+# loader -> (table versions, {index name: {key: [rows]}})
+_cached_indexes = {}
+
+
+def table_version(sess, model):
+    """ Get a value that changes whenever one of the loader scripts adds, removes or updates rows in the table
+
+    Args:
+        sess: current DB session
+        model: model of the table
+
+    Returns:
+        tuple of the row count, highest primary key and latest update time of the table
+    """
+    primary_key = model.__table__.primary_key.columns.values()[0]
+    return tuple(sess.query(func.count(primary_key), func.max(primary_key), func.max(model.updated_at)).one())
+
+
+def build_index(rows):
+    """ Group (key, row) pairs by key, keeping the order they were loaded in """
+    index = defaultdict(list)
+    for key, row in rows:
+        index[key].append(row)
+    return dict(index)
+
+
+def clear_reference_data_cache():
+    """ Drop the cached tables so they're reloaded the next time they're used """
+    with _cache_lock:
+        _cached_indexes.clear()
+
+
+class ReferenceData:
+    """ Lookups into the domain tables used by FABS derivations.
+
+    The small tables are loaded into memory in full and shared between publishes for as long as they're unchanged.
+    Each loader's tables are checked when a ReferenceData is created and reloaded if a loader script has changed them
+    since they were cached. The zip_range table is too big to hold in memory, so only the zips a submission uses are
+    loaded, either all at once with load_zips or one at a time as they're looked up.
+    """
+
+    def __init__(self, sess):
+        """
+
+        args
+
+        sess - current DB session
+
+        """
+        self.sess = sess
+        self.indexes = {}
+        with _cache_lock:
+            for loader, models in LOADERS:
+                versions = [table_version(sess, model) for model in models]
+                cached = _cached_indexes.get(loader)
+                if cached is None or cached[0] != versions:
+                    logger.debug('Loading reference data with %s', loader.__name__)
+                    cached = (versions, {name: build_index(rows) for name, rows in loader(sess).items()})
+                    _cached_indexes[loader] = cached
+                self.indexes.update(cached[1])
+
+        # zip5 -> first ZipRow for the zip5 (None if there isn't one), (zip5, zip_last4) -> ZipRow containing it or None
+        self.zip5_rows = {}
+        self.zip9_rows = {}
+        # zip5 -> number of distinct congressional districts in the zip5
+        self.zip5_district_counts = {}
+
+    def first(self, index_name, key):
+        """ Same as query(...).filter_by(...).first() """
+        rows = self.indexes[index_name].get(key)
+        return rows[0] if rows else None
+
+    def one_or_none(self, index_name, key):
+        """ Same as query(...).filter_by(...).one_or_none() """
+        rows = self.indexes[index_name].get(key)
+        if not rows:
+            return None
+        if len(rows) > 1:
+            raise MultipleResultsFound("Multiple rows were found for {} {}".format(index_name, key))
+        return rows[0]
+
+    def one(self, index_name, key):
+        """ Same as query(...).filter_by(...).one() """
+        row = self.one_or_none(index_name, key)
+        if row is None:
+            raise NoResultFound("No row was found for {} {}".format(index_name, key))
+        return row
+
+    def cfda_program(self, cfda_number):
+        """ Find the CFDA program for a CFDA number, program numbers are stored as floats """
+        try:
+            program_number = float(cfda_number) if cfda_number is not None else None
+        except ValueError:
+            return None
+        return self.one_or_none('cfda_program', program_number)
+
+    def load_zips(self, zip5s, zip9s):
+        """ Load the zips a submission uses in a few large queries
+
+        Args:
+            zip5s: set of zip5s looked up without a zip_last4
+            zip9s: set of (zip5, zip_last4) pairs
+        """
+        zip_columns = [ZipRange.zip5, ZipRange.zip4_low, ZipRange.zip4_high, ZipRange.state_abbreviation,
+                       ZipRange.county_number, ZipRange.congressional_district_no]
+        zip5s = [zip5 for zip5 in zip5s if zip5 not in self.zip5_rows]
+        for start in range(0, len(zip5s), ZIP_QUERY_SIZE):
+            chunk = zip5s[start:start + ZIP_QUERY_SIZE]
+            self.zip5_rows.update(dict.fromkeys(chunk))
+            self.zip5_district_counts.update(dict.fromkeys(chunk, 0))
+            # DISTINCT ON gives the first row of each zip5
+            for row in self.sess.query(*zip_columns).filter(ZipRange.zip5.in_(chunk)).distinct(ZipRange.zip5).\
+                    order_by(ZipRange.zip5, ZipRange.zip_range_id):
+                self.zip5_rows[row.zip5] = ZipRow(*row)
+            for row in self.sess.query(ZipRange.zip5, ZipRange.congressional_district_no).\
+                    filter(ZipRange.zip5.in_(chunk)).distinct():
+                self.zip5_district_counts[row.zip5] += 1
+
+        zip9s = [zip9 for zip9 in zip9s if zip9 not in self.zip9_rows]
+        for start in range(0, len(zip9s), ZIP_QUERY_SIZE):
+            chunk = zip9s[start:start + ZIP_QUERY_SIZE]
+            self.zip9_rows.update(dict.fromkeys(chunk))
+            # the ranges of each zip5 are few enough to search through here, latest first since the range loaded
+            # last wins when they overlap
+            ranges = defaultdict(list)
+            for row in self.sess.query(*zip_columns).filter(ZipRange.zip5.in_({zip5 for zip5, _ in chunk}),
+                                                            ZipRange.zip4_low.isnot(None)).\
+                    order_by(ZipRange.zip_range_id.desc()):
+                ranges[row.zip5].append(ZipRow(*row))
+            for zip5, zip_last4 in chunk:
+                if zip_last4 is not None and ZIP4_REGEX.match(zip_last4):
+                    self.zip9_rows[(zip5, zip_last4)] = next(
+                        (row for row in ranges[zip5] if row.zip4_low <= zip_last4 <= row.zip4_high), None)
+
+    def zip5(self, zip5):
+        """ Same as find_zip(sess, zip5) """
+        if zip5 not in self.zip5_rows:
+            self.load_zips([zip5], [])
+        return self.zip5_rows[zip5]
+
+    def zip5_district_count(self, zip5):
+        """ Number of distinct congressional districts (counting no district as one) in the zip5 """
+        if zip5 not in self.zip5_district_counts:
+            self.load_zips([zip5], [])
+        return self.zip5_district_counts[zip5]
+
+    def zip9(self, zip5, zip_last4):
+        """ Same as find_zip(sess, zip5, zip_last4) """
+        if (zip5, zip_last4) not in self.zip9_rows:
+            self.load_zips([], [(zip5, zip_last4)])
+        return self.zip9_rows[(zip5, zip_last4)]
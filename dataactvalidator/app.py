@@ -4,25 +4,39 @@ import csv
 from flask import Flask, g, current_app
 
 from dataactcore.config import CONFIG_BROKER, CONFIG_SERVICES
-from dataactcore.interfaces.db import GlobalDB
+from dataactcore.interfaces.db import GlobalDB, pool_status
 from dataactcore.logging import configure_logging
 from dataactvalidator.validation_handlers.validationManager import ValidationManager
-from dataactcore.aws.sqsHandler import sqs_queue
+from dataactcore.aws.sqsHandler import sqs_queue, VisibilityHeartbeat
 from dataactcore.interfaces.function_bag import mark_job_status, write_file_error
 from dataactcore.utils.responseException import ResponseException
 from dataactvalidator.validation_handlers.validationError import ValidationError
 from dataactcore.models.jobModels import Job
+from dataactvalidator.workerSupervisor import WorkerSupervisor
 
 
 logger = logging.getLogger(__name__)
 
+# Seconds a message is hidden from other workers after each heartbeat while its job runs
+VISIBILITY_TIMEOUT = 60
+
 
 def create_app():
     return Flask(__name__)
 
 
 def run_app():
-    """Run the application."""
+    """Run the validator, working on up to validator_job_workers jobs at once in separate worker processes."""
+    supervisor = WorkerSupervisor(run_worker, CONFIG_BROKER.get('validator_job_workers', 1))
+    supervisor.run()
+
+
+def run_worker(stop_event):
+    """Receive and validate jobs one at a time until stop_event is set.
+
+    Args:
+        stop_event: event set when the worker should stop, checked between jobs so the current job can finish
+    """
     app = Flask(__name__)
 
     with app.app_context():
@@ -36,69 +50,91 @@ def run_app():
         current_app.config.from_envvar('VALIDATOR_SETTINGS', silent=True)
 
         queue = sqs_queue()
+        visibility_timeout = CONFIG_BROKER.get('validator_visibility_timeout', VISIBILITY_TIMEOUT)
 
         logger.info("Starting SQS polling")
-        current_message = None
-        while True:
+        while not stop_event.is_set():
             try:
-                # Grabs one (or more) messages from the queue
-                messages = queue.receive_messages(WaitTimeSeconds=10)
-                for message in messages:
-                    logger.info("Message received: %s", message.body)
-                    current_message = message
-                    GlobalDB.db()
-                    g.job_id = message.body
-                    mark_job_status(g.job_id, "ready")
-                    validation_manager = ValidationManager(local, error_report_path)
-                    validation_manager.validate_job(g.job_id)
-
-                    # delete from SQS once processed
-                    message.delete()
-            except ResponseException as e:
-                # Handle exceptions explicitly raised during validation.
-                logger.error(str(e))
-
-                job = get_current_job()
-                if job:
-                    if job.filename is not None:
-                        # insert file-level error info to the database
-                        write_file_error(job.job_id, job.filename, e.errorType, e.extraInfo)
-                    if e.errorType != ValidationError.jobError:
-                        # job pass prerequisites for validation, but an error
-                        # happened somewhere. mark job as 'invalid'
-                        mark_job_status(job.job_id, 'invalid')
-                        if current_message:
-                            if e.errorType in [ValidationError.rowCountError, ValidationError.headerError,
-                                               ValidationError.fileTypeError]:
-                                current_message.delete()
+                # Grabs one message from the queue, each worker only works on one job at a time
+                messages = queue.receive_messages(WaitTimeSeconds=10, MaxNumberOfMessages=1,
+                                                  VisibilityTimeout=visibility_timeout)
             except Exception as e:
-                # Handle uncaught exceptions in validation process.
                 logger.error(str(e))
-
-                # csv-specific errors get a different job status and response code
-                if isinstance(e, ValueError) or isinstance(e, csv.Error) or isinstance(e, UnicodeDecodeError):
-                    job_status = 'invalid'
-                else:
-                    job_status = 'failed'
-                job = get_current_job()
-                if job:
-                    if job.filename is not None:
-                        error_type = ValidationError.unknownError
-                        if isinstance(e, UnicodeDecodeError):
-                            error_type = ValidationError.encodingError
-                            # TODO Is this really the only case where the message should be deleted?
-                            if current_message:
-                                current_message.delete()
-                        write_file_error(job.job_id, job.filename, error_type)
-                    mark_job_status(job.job_id, job_status)
-            finally:
                 GlobalDB.close()
-                # Set visibility to 0 so that another attempt can be made to process in SQS immediately,
-                # instead of waiting for the timeout window to expire
-                for message in messages:
+                stop_event.wait(10)
+                continue
+            for message in messages:
+                # Keep the message hidden from other workers for as long as the job takes
+                heartbeat = VisibilityHeartbeat(message, visibility_timeout, app=app)
+                heartbeat.start()
+                try:
+                    validate_message(message, local, error_report_path)
+                finally:
+                    heartbeat.stop()
+                    GlobalDB.close()
+                    # Set visibility to 0 so that another attempt can be made to process in SQS immediately,
+                    # instead of waiting for the timeout window to expire
                     message.change_visibility(VisibilityTimeout=0)
 
 
+def validate_message(message, local, error_report_path):
+    """Validate the job in a message, deleting the message once the job doesn't need another attempt.
+
+    Args:
+        message: SQS message with the job ID as its body
+        local: whether the broker is running locally
+        error_report_path: path error reports are written to when running locally
+    """
+    try:
+        logger.info("Message received: %s", message.body)
+        GlobalDB.db()
+        g.job_id = message.body
+        mark_job_status(g.job_id, "ready")
+        validation_manager = ValidationManager(local, error_report_path)
+        validation_manager.validate_job(g.job_id)
+
+        # delete from SQS once processed
+        message.delete()
+        logger.info("Database pool status: %s", pool_status())
+    except ResponseException as e:
+        # Handle exceptions explicitly raised during validation.
+        logger.error(str(e))
+
+        job = get_current_job()
+        if job:
+            if job.filename is not None:
+                # insert file-level error info to the database
+                write_file_error(job.job_id, job.filename, e.errorType, e.extraInfo)
+            if e.errorType != ValidationError.jobError:
+                # job pass prerequisites for validation, but an error
+                # happened somewhere. mark job as 'invalid'
+                mark_job_status(job.job_id, 'invalid')
+                if e.errorType in [ValidationError.rowCountError, ValidationError.headerError,
+                                   ValidationError.fileTypeError]:
+                    message.delete()
+    except Exception as e:
+        # Handle uncaught exceptions in validation process.
+        logger.error(str(e))
+
+        # csv-specific errors get a different job status and response code
+        if isinstance(e, ValueError) or isinstance(e, csv.Error) or isinstance(e, UnicodeDecodeError):
+            job_status = 'invalid'
+        else:
+            job_status = 'failed'
+        job = get_current_job()
+        if job:
+            if job.filename is not None:
+                error_type = ValidationError.unknownError
+                if isinstance(e, UnicodeDecodeError):
+                    error_type = ValidationError.encodingError
+                    # TODO Is this really the only case where the message should be deleted?
+                    message.delete()
+                write_file_error(job.job_id, job.filename, error_type)
+            mark_job_status(job.job_id, job_status)
+    finally:
+        g.job_id = None
+
+
 def get_current_job():
     """Return the job currently stored in flask.g"""
     # the job_id is added to flask.g at the beginning of the validate
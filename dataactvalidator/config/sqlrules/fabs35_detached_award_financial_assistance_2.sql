@@ -7,6 +7,6 @@ WHERE dafa.submission_id = {0}
     AND COALESCE(dafa.legal_entity_zip5, '') != ''
     AND NOT EXISTS (
 		SELECT *
-		FROM zips as z
+		FROM zip_range as z
 		WHERE z.zip5 = dafa.legal_entity_zip5
 	)
\ No newline at end of file
@@ -9,6 +9,7 @@ WHERE submission_id = {0}
     AND COALESCE(dafa.legal_entity_zip_last4, '') != ''
     AND NOT EXISTS
         (SELECT *
-		FROM zips AS z
+		FROM zip_range AS z
 		WHERE dafa.legal_entity_zip5 = z.zip5
-		    AND dafa.legal_entity_zip_last4 = z.zip_last4)
\ No newline at end of file
+		    AND dafa.legal_entity_zip_last4 ~ '^\d\d\d\d$'
+		    AND dafa.legal_entity_zip_last4 BETWEEN z.zip4_low AND z.zip4_high)
\ No newline at end of file
@@ -18,8 +18,8 @@ WHERE CASE WHEN (COALESCE(dafa.place_of_performance_zip4a, '') != ''
                  AND (dafa.place_of_performance_zip4a ~ '^\d\d\d\d\d$'
                       OR dafa.place_of_performance_zip4a ~ '^\d\d\d\d\d\-?\d\d\d\d$'))
            THEN NOT EXISTS (SELECT *
-                            FROM zips
-                            WHERE UPPER(LEFT(dafa.place_of_performance_code, 2)) = zips.state_abbreviation
-                            AND LEFT(dafa.place_of_performance_zip4a, 5) = zips.zip5)
+                            FROM zip_range
+                            WHERE UPPER(LEFT(dafa.place_of_performance_code, 2)) = zip_range.state_abbreviation
+                            AND LEFT(dafa.place_of_performance_zip4a, 5) = zip_range.zip5)
            ELSE FALSE
            END
\ No newline at end of file
@@ -17,11 +17,12 @@ WHERE COALESCE(dafa.place_of_performance_zip4a, '') != ''
     AND dafa.place_of_performance_zip4a != 'city-wide'
     AND dafa.place_of_performance_zip4a ~ '^\d\d\d\d\d\-?\d\d\d\d$'
     AND EXISTS (SELECT *
-                FROM zips
-                WHERE UPPER(LEFT(dafa.place_of_performance_code, 2)) = zips.state_abbreviation
-                    AND LEFT(dafa.place_of_performance_zip4a, 5) = zips.zip5)
+                FROM zip_range
+                WHERE UPPER(LEFT(dafa.place_of_performance_code, 2)) = zip_range.state_abbreviation
+                    AND LEFT(dafa.place_of_performance_zip4a, 5) = zip_range.zip5)
     AND NOT EXISTS (SELECT *
-                    FROM zips
-                    WHERE UPPER(LEFT(dafa.place_of_performance_code, 2)) = zips.state_abbreviation
-                        AND LEFT(dafa.place_of_performance_zip4a, 5) = zips.zip5
-                        AND RIGHT(dafa.place_of_performance_zip4a, 4) = zips.zip_last4)
\ No newline at end of file
+                    FROM zip_range
+                    WHERE UPPER(LEFT(dafa.place_of_performance_code, 2)) = zip_range.state_abbreviation
+                        AND LEFT(dafa.place_of_performance_zip4a, 5) = zip_range.zip5
+                        AND RIGHT(dafa.place_of_performance_zip4a, 4) BETWEEN zip_range.zip4_low
+                                                                           AND zip_range.zip4_high)
\ No newline at end of file
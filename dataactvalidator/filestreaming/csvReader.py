@@ -3,6 +3,7 @@ import os
 import tempfile
 
 import boto3
+from botocore.exceptions import BotoCoreError, ClientError
 
 from dataactcore.config import CONFIG_BROKER
 from dataactcore.models.stagingModels import FlexField
@@ -11,16 +12,24 @@ from dataactcore.utils.statusCode import StatusCode
 from dataactvalidator.filestreaming.csvS3Writer import CsvS3Writer
 from dataactvalidator.filestreaming.csvLocalWriter import CsvLocalWriter
 from dataactvalidator.filestreaming.fieldCleaner import FieldCleaner
+from dataactvalidator.filestreaming.s3StreamReader import open_s3_text
 from dataactvalidator.validation_handlers.validationError import ValidationError
 
 
 class CsvReader(object):
     """
-    Reads data from local CSV file (first downloading from S3 if necessary)
+    Reads data from local CSV file, or streams it from S3 (falling back to downloading it first if it can't be
+    streamed)
     """
 
     header_report_headers = ["Error type", "Header name"]
 
+    def __init__(self):
+        self.filename = None
+        self.has_tempfile = False
+        self.file_size = None
+        self.row_count = 0
+
     def get_filename(self, region, bucket, filename, from_open_file=None):
         """Creates a filename based on the file path
         Args:
@@ -56,14 +65,19 @@ class CsvReader(object):
             long_to_short_dict: mapping of long to short schema column names
         """
 
-        if not self.filename:
-            self.get_filename(region, bucket, filename)
-
         self.is_local = is_local
-        try:
-            self.file = open(self.filename, "r", newline=None)
-        except:
-            raise ValueError("".join(["Filename provided not found : ", str(self.filename)]))
+        self.file_size = None
+        # Decoding happens as the file is read, so non-UTF8 characters raise a UnicodeDecodeError while the
+        # records are being processed rather than in a separate pass over the file
+        self.file = None
+        if region and bucket and CONFIG_BROKER.get('stream_s3_files', True):
+            self.file = self.open_s3_stream(region, bucket, filename)
+        if self.file is None:
+            self.get_filename(region, bucket, filename)
+            try:
+                self.file = open(self.filename, "r", newline=None, encoding='utf-8')
+            except:
+                raise ValueError("".join(["Filename provided not found : ", str(self.filename)]))
 
         self.unprocessed = ''
         self.extra_line = False
@@ -72,6 +86,9 @@ class CsvReader(object):
         self.is_finished = False
         self.column_count = 0
         header_line = self.file.readline()
+        # Number of CSV rows read so far including the header and blank rows, checked against the number of rows
+        # validated once the whole file has been read
+        self.row_count = 1
         # make sure we have not finished reading the file
 
         if self.is_finished:
@@ -98,6 +115,26 @@ class CsvReader(object):
 
         return long_headers
 
+    def open_s3_stream(self, region, bucket, filename):
+        """Opens a file in S3 to be parsed as it downloads
+        Args:
+            region: AWS region where the bucket is located
+            bucket: bucket the file is in
+            filename: The file path for the CSV file in S3
+
+        Returns:
+            text file object streaming the file, None if the file can't be streamed and should be downloaded instead
+        """
+        s3 = boto3.client('s3', region_name=region)
+        try:
+            self.file_size = s3.head_object(Bucket=bucket, Key=filename)['ContentLength']
+        except (BotoCoreError, ClientError):
+            return None
+
+        self.has_tempfile = False
+        self.filename = filename
+        return open_s3_text(s3, bucket, filename, size=self.file_size)
+
     @staticmethod
     def get_writer(bucket_name, filename, header, is_local, region=None):
         """
@@ -144,9 +181,11 @@ class CsvReader(object):
         try:
             # read next until we get a non-empty line or get an empty string signifying end of file
             line = next(self.csv_reader)
+            self.row_count += 1
             while line == '\n' or line == []:
                 line = next(self.csv_reader)
-        except:
+                self.row_count += 1
+        except StopIteration:
             # If we cannot continue, we've reached the end of the file
             line = ''
             self.is_finished = True
@@ -233,6 +272,8 @@ class CsvReader(object):
         """
         Gets the size of the file
         """
+        if self.file_size is not None:
+            return self.file_size
         return os.path.getsize(self.filename)
 
 
@@ -128,45 +128,65 @@ class FieldCleaner(StringCleaner):
         Returns:
             Cleaned row
         """
+        return ColumnPlan(long_to_short_dict, fields).clean_row(row)
 
-        for field in fields:
-            key = long_to_short_dict[field.name]
-            field_type = FIELD_TYPE_DICT_ID[field.field_types_id]
-            value = row[key]
-            if value is not None:
-                # Remove extra whitespace
-                value = value.strip()
-                # If field is wrapped in quotes then remove
-                if value.startswith('"') and value.endswith('"'):
-                    value = value[1:-1].strip()
-                if field_type in ["INT", "DECIMAL", "LONG"]:
-                    temp_value = value.replace(",", "")
-                    if FieldCleaner.is_numeric(temp_value):
-                        value = temp_value
-                if value == "":
-                    # Replace empty strings with null
-                    value = None
-
-                row[key] = cls.pad_field(field, value)
-        return row
 
-    @staticmethod
-    def pad_field(field, value):
-        """ Pad value with appropriate number of leading zeros if needed
+class ColumnPlan(object):
+    """ What FieldCleaner.clean_row needs to know about each column of a file type, looked up once per job rather
+        than once per row """
+
+    __slots__ = ['columns']
+
+    NUMERIC_TYPES = ("INT", "DECIMAL", "LONG")
+
+    def __init__(self, long_to_short_dict, fields):
+        """
+
+        args
+
+        long_to_short_dict - Maps long column names to short
+        fields - List of FileColumn objects for this file type
+
+        """
+        # (key, numeric, padded length) for each column, padded length is None if the column isn't padded
+        self.columns = tuple(
+            (long_to_short_dict[field.name], FIELD_TYPE_DICT_ID[field.field_types_id] in self.NUMERIC_TYPES,
+             field.length if field.padded_flag and field.length is not None else None)
+            for field in fields
+        )
+
+    def clean_row(self, row):
+        """ Strips whitespace, replaces empty strings with None, and pads fields that need it
 
         Args:
-            field: FileColumn object
-            value: Value present in row
+            row: Record in this row
 
         Returns:
-            Padded value
+            Cleaned row
         """
-        # Check padded flag for this field and file
-        if value is not None and field.padded_flag and field.length is not None:
-            # Pad to specified length with leading zeros
-            return value.zfill(field.length)
-        else:
-            return value
+        is_numeric = FieldCleaner.is_numeric
+        for key, numeric, padded_length in self.columns:
+            value = row[key]
+            if value is None:
+                continue
+            # Remove extra whitespace
+            value = value.strip()
+            # If field is wrapped in quotes then remove
+            if value.startswith('"') and value.endswith('"'):
+                value = value[1:-1].strip()
+            if numeric and "," in value:
+                temp_value = value.replace(",", "")
+                if is_numeric(temp_value):
+                    value = temp_value
+            if value == "":
+                # Replace empty strings with null
+                value = None
+            elif padded_length is not None:
+                # Pad to specified length with leading zeros
+                value = value.zfill(padded_length)
+            row[key] = value
+        return row
+
 
 if __name__ == '__main__':
     configure_logging()
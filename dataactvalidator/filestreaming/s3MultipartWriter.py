@@ -0,0 +1,131 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only file object that uploads to S3 as it is written. Data is sent in large parts of a multipart upload,
+    with several parts uploading at once while the next one is filled. Objects smaller than one part are uploaded
+    with a single PUT.
+    """
+
+    PART_SIZE = 16 * 1024 * 1024
+    MAX_CONCURRENCY = 4
+
+    def __init__(self, client, bucket, key, part_size=None, max_concurrency=None):
+        """
+
+        args
+
+        client - boto3 S3 client
+        bucket - bucket to upload to
+        key - key of the object to create
+        part_size - size in bytes of each part of the upload, defaults to PART_SIZE (S3 requires at least 5MB)
+        max_concurrency - number of parts to upload at once, defaults to MAX_CONCURRENCY
+
+        """
+        super(S3MultipartWriter, self).__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size or self.PART_SIZE
+        self.max_concurrency = max_concurrency or self.MAX_CONCURRENCY
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.executor = None
+        self.parts = []
+        self.aborted = False
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        """ Add data to the current part, uploading each part once it is full
+
+        Returns:
+            number of bytes written
+        """
+        if self.aborted:
+            # The upload has been thrown away, so is anything still buffered above it
+            return len(data)
+        self.buffer.extend(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, data):
+        """ Start uploading the next part, waiting if the maximum number of parts are already uploading """
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        if len(self.parts) >= self.max_concurrency:
+            # Bound the memory held by parts that haven't been sent yet
+            self.parts[-self.max_concurrency].result()
+        self.parts.append(self.executor.submit(self._put_part, len(self.parts) + 1, data))
+
+    def _put_part(self, part_number, data):
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=part_number, Body=data)
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+
+    def close(self):
+        """ Upload whatever is left and complete the upload """
+        if self.closed:
+            return
+        try:
+            if not self.aborted:
+                if self.upload_id is None:
+                    self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+                else:
+                    if self.buffer:
+                        self._upload_part(bytes(self.buffer))
+                    parts = [part.result() for part in self.parts]
+                    self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                          MultipartUpload={'Parts': parts})
+                self.buffer = bytearray()
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+            super(S3MultipartWriter, self).close()
+
+    def abort(self):
+        """ Throw away the upload, nothing is written to the key """
+        if self.aborted:
+            return
+        self.aborted = True
+        self.buffer = bytearray()
+        if self.upload_id is not None:
+            for part in self.parts:
+                part.cancel()
+            self.executor.shutdown()
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+@contextmanager
+def s3_text_writer(client, bucket, key, **kwargs):
+    """ Open a text file that is uploaded to S3 as it is written. The upload is only completed if the with block
+        finishes without an error, otherwise it is aborted.
+
+    Args:
+        client: boto3 S3 client
+        bucket: bucket to upload to
+        key: key of the object to create
+        kwargs: passed on to S3MultipartWriter
+
+    Yields:
+        UTF-8 text file object
+    """
+    upload = S3MultipartWriter(client, bucket, key, **kwargs)
+    text_file = io.TextIOWrapper(io.BufferedWriter(upload), encoding='utf-8', newline='')
+    try:
+        yield text_file
+    except BaseException:
+        upload.abort()
+        text_file.close()
+        raise
+    text_file.close()
@@ -0,0 +1,125 @@
+import io
+import queue
+import threading
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+
+class S3StreamReader(io.RawIOBase):
+    """
+    Read-only file object over an S3 object. Byte ranges of the object are fetched ahead of the reader on a background
+    thread and held in a bounded buffer, so the file can be parsed while the rest of it is still downloading.
+    """
+
+    CHUNK_SIZE = 8 * 1024 * 1024
+    BUFFER_CHUNKS = 4
+    RETRIES = 3
+    RETRY_DELAY = 0.5
+
+    def __init__(self, client, bucket, key, size=None, chunk_size=None, buffer_chunks=None):
+        """
+
+        args
+
+        client - boto3 S3 client
+        bucket - bucket the object is in
+        key - key of the object to read
+        size - size of the object in bytes, looked up with a HEAD request if not provided
+        chunk_size - number of bytes to request in each ranged GET, defaults to CHUNK_SIZE
+        buffer_chunks - number of fetched chunks to hold ahead of the reader, defaults to BUFFER_CHUNKS
+
+        """
+        super(S3StreamReader, self).__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = size if size is not None else client.head_object(Bucket=bucket, Key=key)['ContentLength']
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.chunks = queue.Queue(maxsize=buffer_chunks or self.BUFFER_CHUNKS)
+        self.stopped = threading.Event()
+        self.current = memoryview(b'')
+        self.finished = False
+
+        self.thread = threading.Thread(target=self._fetch_chunks, daemon=True)
+        self.thread.start()
+
+    def _fetch_chunks(self):
+        """ Fetch each chunk of the object in order, ending with an empty chunk (or the error that stopped us) """
+        try:
+            for start in range(0, self.size, self.chunk_size):
+                if not self._put(self._get_range(start, min(start + self.chunk_size, self.size) - 1)):
+                    return
+            self._put(b'')
+        except Exception as e:
+            self._put(e)
+
+    def _get_range(self, start, end):
+        """ GET the bytes from start to end (inclusive), retrying failed requests after waiting RETRY_DELAY seconds,
+            doubled after each failure. Closing the reader ends the wait and raises the last error """
+        for attempt in range(self.RETRIES):
+            try:
+                response = self.client.get_object(Bucket=self.bucket, Key=self.key,
+                                                  Range='bytes={}-{}'.format(start, end))
+                return response['Body'].read()
+            except (BotoCoreError, ClientError):
+                if attempt == self.RETRIES - 1 or self.stopped.wait(self.RETRY_DELAY * 2 ** attempt):
+                    raise
+
+    def _put(self, item):
+        """ Wait for room in the buffer, giving up if the reader has been closed
+
+        Returns:
+            True if the item was buffered, False if the reader was closed first
+        """
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        """ Copy the next bytes of the object into buffer, waiting for the next chunk if needed
+
+        Returns:
+            number of bytes copied, 0 at the end of the object
+        """
+        while not self.current and not self.finished:
+            chunk = self.chunks.get()
+            if isinstance(chunk, Exception):
+                self.finished = True
+                raise chunk
+            if not chunk:
+                self.finished = True
+            self.current = memoryview(chunk)
+
+        count = min(len(buffer), len(self.current))
+        buffer[:count] = self.current[:count]
+        self.current = self.current[count:]
+        return count
+
+    def close(self):
+        """ Stop fetching and release the buffered chunks """
+        self.stopped.set()
+        self.current = memoryview(b'')
+        super(S3StreamReader, self).close()
+
+
+def open_s3_text(client, bucket, key, **kwargs):
+    """ Open an S3 object as a streamed UTF-8 text file
+
+    Args:
+        client: boto3 S3 client
+        bucket: bucket the object is in
+        key: key of the object to read
+        kwargs: passed on to S3StreamReader
+
+    Returns:
+        Text file object reading from the stream, decoding as the bytes arrive
+    """
+    return io.TextIOWrapper(io.BufferedReader(S3StreamReader(client, bucket, key, **kwargs)), encoding='utf-8',
+                            newline=None)
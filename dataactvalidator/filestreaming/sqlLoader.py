@@ -8,6 +8,7 @@ from dataactcore.models.lookups import FILE_TYPE_DICT, RULE_SEVERITY_DICT
 from dataactcore.models.validationModels import RuleSql
 from dataactvalidator.health_check import create_app
 from dataactvalidator.filestreaming.fieldCleaner import FieldCleaner
+from dataactvalidator.validation_handlers.ruleCompiler import normalize_rule_sql
 
 
 class SQLLoader:
@@ -24,7 +25,7 @@ class SQLLoader:
 
     @classmethod
     def load_sql(cls, filename):
-        """Load SQL-based validation rules to db."""
+        """Load SQL-based validation rules to db, normalized to take the submission ID as a bind parameter."""
         with create_app().app_context():
             sess = GlobalDB.db().session
 
@@ -54,7 +55,7 @@ class SQLLoader:
 
                 reader = csv.DictReader(csvfile, fieldnames=field_names)
                 for row in reader:
-                    sql = cls.read_sql_str(row['query_name'])
+                    sql = normalize_rule_sql(cls.read_sql_str(row['query_name']))
 
                     rule_sql = RuleSql(rule_sql=sql, rule_label=row['rule_label'],
                                        rule_description=row['rule_description'],
@@ -1,3 +1,5 @@
+import zipfile
+
 import pandas as pd
 import numpy as np
 
@@ -32,6 +34,31 @@ def insert_dataframe(df, table, engine):
     return len(df.index)
 
 
+def read_zipped_csv(zip_path, file_name, chunk_size=10000, skip_footer=0, **kwargs):
+    """ Read a csv out of a zip archive a chunk at a time, decompressing and parsing it once from start to end.
+
+    Args:
+        zip_path: path of the zip archive
+        file_name: name of the csv within the archive
+        chunk_size: number of rows in each chunk
+        skip_footer: number of rows at the end of the file to leave out, which pandas can't do itself when reading
+            in chunks
+        kwargs: any other arguments to pass to pd.read_csv, such as skiprows to leave out a header
+
+    Yields:
+        a dataframe of each chunk of rows, indexed from 0
+    """
+    with zipfile.ZipFile(zip_path) as zip_file, zip_file.open(file_name) as data_file:
+        # Hold each chunk back until the next one's read so the footer can be dropped from the last one
+        previous = None
+        for chunk in pd.read_csv(data_file, chunksize=chunk_size, **kwargs):
+            if previous is not None:
+                yield previous
+            previous = chunk.reset_index(drop=True)
+        if previous is not None and len(previous.index) > skip_footer:
+            yield previous.iloc[:len(previous.index) - skip_footer]
+
+
 def trim_item(item):
     if type(item) == np.str:
         return item.strip()
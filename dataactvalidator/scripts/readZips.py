@@ -1,5 +1,5 @@
-# Local tests took 1 hour to insert 5 million lines. Estimated 9 hours to insert all data as of 05/2017.
-# Suggested to run on a weekend during off hours
+# Each line of the zip4 files is stored as one range of ZIP+4s rather than a row for every ZIP+4 in it, so a full
+# load is a few million rows and takes minutes.
 
 import os
 import re
@@ -7,20 +7,34 @@ import logging
 import boto
 import urllib.request
 
-from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.exc import IntegrityError
-
 from dataactcore.logging import configure_logging
 from dataactcore.config import CONFIG_BROKER
 from dataactcore.interfaces.db import GlobalDB
-from dataactcore.models.domainModels import Zips, StateCongressional
+from dataactcore.models.domainModels import ZipRange, StateCongressional
+from dataactcore.utils.fixedWidthReader import FixedWidthLayout
 
 from dataactvalidator.health_check import create_app
 
 logger = logging.getLogger(__name__)
 zip4_line_size = 182
 citystate_line_size = 129
-chunk_size = 1024 * 10
+# Number of ranges inserted at once
+batch_size = 50000
+
+zip4_layout = FixedWidthLayout(zip4_line_size, [
+    ("zip5", 1, 6),
+    ("zip4_low", 140, 144),
+    ("zip4_high", 144, 148),
+    ("state", 157, 159),
+    ("county", 159, 162),
+    ("congressional_district", 162, 164)
+])
+citystate_layout = FixedWidthLayout(citystate_line_size, [
+    ("record_type", 0, 1),
+    ("zip5", 1, 6),
+    ("state", 99, 101),
+    ("county", 101, 104)
+])
 
 
 # update contents of state_congressional table based on zips we just inserted
@@ -31,188 +45,133 @@ def update_state_congr_table(sess):
     sess.commit()
 
     # get new data
-    distinct_list = sess.query(Zips.state_abbreviation, Zips.congressional_district_no).distinct().\
-        order_by(Zips.state_abbreviation, Zips.congressional_district_no)
+    distinct_list = sess.query(ZipRange.state_abbreviation, ZipRange.congressional_district_no).distinct().\
+        order_by(ZipRange.state_abbreviation, ZipRange.congressional_district_no)
     sess.bulk_save_objects([StateCongressional(state_code=state_data.state_abbreviation,
                                                congressional_district_no=state_data.congressional_district_no)
                             for state_data in distinct_list])
     sess.commit()
 
 
-# add data to the zips table
+# add data to the zip_range table
 def add_to_table(data, sess):
-    try:
-        sess.bulk_save_objects([Zips(**zip_data) for _, zip_data in data.items()])
-        sess.commit()
-    except IntegrityError:
-        sess.rollback()
-        logger.error("Attempted to insert duplicate zip. Inserting each row in batch individually.")
-
-        i = 0
-        # loop through all the items in the current array
-        for _, new_zip in data.items():
-            # create an insert statement that overrides old values if there's a conflict
-            insert_statement = insert(Zips).values(**new_zip). \
-                on_conflict_do_update(index_elements=[Zips.zip5, Zips.zip_last4],
-                                      set_=dict(state_abbreviation=new_zip["state_abbreviation"],
-                                                county_number=new_zip["county_number"],
-                                                congressional_district_no=new_zip["congressional_district_no"]))
-            sess.execute(insert_statement)
-
-            if i % 10000 == 0:
-                logger.info("inserting row " + str(i) + " of current batch")
-            i += 1
-        sess.commit()
+    sess.bulk_insert_mappings(ZipRange, data)
+    sess.commit()
 
 
 def parse_zip4_file(f, sess):
     logger.info("starting file " + str(f))
-    # pull out the copyright data
-    f.read(zip4_line_size)
-
-    data_array = {}
-    curr_chunk = ""
-    while True:
-        # grab the next chunk
-        next_chunk = f.read(chunk_size)
-        # when streaming from S3 it reads in as bytes, we need to decode it as a utf-8 string
-        if not type(next_chunk) == str:
-            next_chunk = next_chunk.decode("utf-8")
-
-        # add the new chunk of the file to the current chunk we're processing
-        curr_chunk += next_chunk
-
-        # if the current chunk is smaller than the line size, we're done
-        if len(curr_chunk) < zip4_line_size:
-            break
-
-        # while we can still do more processing on the current chunk, process it per line
-        while len(curr_chunk) >= zip4_line_size:
-            # grab another line and get the data that's always the same
-            curr_row = curr_chunk[:zip4_line_size]
-            state = curr_row[157:159]
-
-            # ignore state codes AA, AE, and AP because they're just for military routing
-            if state not in ['AA', 'AE', 'AP']:
-                zip5 = curr_row[1:6]
-                # zip of 96898 is a special case
-                if zip5 == "96898":
-                    congressional_district = "99"
-                    state = "UM"
-                    county = "450"
-                else:
-                    county = curr_row[159:162]
-                    congressional_district = curr_row[162:164]
-
-                # certain states require specific CDs
-                if state in ["AK", "DE", "MT", "ND", "SD", "VT", "WY"]:
-                    congressional_district = "00"
-                elif state in ["AS", "DC", "GU", "MP", "PR", "VI"]:
-                    congressional_district = "98"
-                elif state in ["FM", "MH", "PW", "UM"]:
-                    congressional_district = "99"
-
-                try:
-                    zip4_low = int(curr_row[140:144])
-                    zip4_high = int(curr_row[144:148])
-                    # if the zip4 low and zip4 high are the same, it's just one zip code and we can just add it
-                    if zip4_low == zip4_high:
-                        zip_string = str(zip4_low).zfill(4)
-                        data_array[zip5 + zip_string] = {"zip5": zip5, "zip_last4": zip_string, "county_number": county,
-                                                         "state_abbreviation": state,
-                                                         "congressional_district_no": congressional_district}
-                    # if the zip codes are different, we have to loop through and add each zip4
-                    # as a different object/key
-                    else:
-                        i = zip4_low
-                        while i <= zip4_high:
-                            zip_string = str(i).zfill(4)
-                            data_array[zip5 + zip_string] = {"zip5": zip5, "zip_last4": zip_string,
-                                                             "state_abbreviation": state, "county_number": county,
-                                                             "congressional_district_no": congressional_district}
-                            i += 1
-                # catch entries where zip code isn't an int (12ND for example, ND stands for "no delivery")
-                except ValueError:
-                    logger.error("error parsing entry: " + curr_row)
-
-            # cut the current line out of the chunk we're processing
-            curr_chunk = curr_chunk[zip4_line_size:]
-
-        # we want to do DB adding in large chunks so we can hopefully remove duplicates that are near each other
-        # in the file just by them having the same key in the dict
-        if len(data_array) > 50000:
-            logger.info("inserting next 50k+ records")
+    data_array = []
+    # the range from the previous line, kept back in case the next line continues it
+    curr_range = None
+    # skip the copyright data
+    for record in zip4_layout.records(f, skip=1):
+        state = zip4_layout.field(record, "state")
+
+        # ignore state codes AA, AE, and AP because they're just for military routing
+        if state in ['AA', 'AE', 'AP']:
+            continue
+
+        row = zip4_layout.parse(record)
+        zip5 = row.zip5
+        # zip of 96898 is a special case
+        if zip5 == "96898":
+            congressional_district = "99"
+            state = "UM"
+            county = "450"
+        else:
+            county = row.county
+            congressional_district = row.congressional_district
+
+        # certain states require specific CDs
+        if state in ["AK", "DE", "MT", "ND", "SD", "VT", "WY"]:
+            congressional_district = "00"
+        elif state in ["AS", "DC", "GU", "MP", "PR", "VI"]:
+            congressional_district = "98"
+        elif state in ["FM", "MH", "PW", "UM"]:
+            congressional_district = "99"
+
+        try:
+            zip4_low = int(row.zip4_low)
+            zip4_high = int(row.zip4_high)
+        # catch entries where zip code isn't an int (12ND for example, ND stands for "no delivery")
+        except ValueError:
+            logger.error("error parsing entry: " + zip4_layout.text(record))
+            continue
+
+        # a line picking up where the previous one left off with the same data extends its range
+        if curr_range and curr_range["zip5"] == zip5 and int(curr_range["zip4_high"]) + 1 == zip4_low \
+                and (curr_range["state_abbreviation"], curr_range["county_number"],
+                     curr_range["congressional_district_no"]) == (state, county, congressional_district):
+            curr_range["zip4_high"] = str(zip4_high).zfill(4)
+            continue
+
+        if curr_range:
+            data_array.append(curr_range)
+        curr_range = {"zip5": zip5, "zip4_low": str(zip4_low).zfill(4), "zip4_high": str(zip4_high).zfill(4),
+                      "state_abbreviation": state, "county_number": county,
+                      "congressional_district_no": congressional_district}
+
+        # we want to do DB adding in large chunks
+        if len(data_array) >= batch_size:
+            logger.info("inserting next 50k ranges")
             add_to_table(data_array, sess)
-            data_array.clear()
+            data_array = []
 
     # add the final chunk of data to the DB
+    if curr_range:
+        data_array.append(curr_range)
     if len(data_array) > 0:
         logger.info("adding last set of records for current file")
         add_to_table(data_array, sess)
-        data_array.clear()
 
 
 def parse_citystate_file(f, sess):
     logger.info("starting file " + str(f))
-    # pull out the copyright data
-    f.read(citystate_line_size)
-
     data_array = {}
-    curr_chunk = ""
-    while True:
-        # grab the next chunk
-        next_chunk = f.read(chunk_size)
-        # when streaming from S3 it reads in as bytes, we need to decode it as a utf-8 string
-        if not type(next_chunk) == str:
-            next_chunk = next_chunk.decode("utf-8")
-
-        # add the new chunk of the file to the current chunk we're processing
-        curr_chunk += next_chunk
-
-        # if the current chunk is smaller than the line size, we're done
-        if len(curr_chunk) < citystate_line_size:
-            break
-
-        # while we can still do more processing on the current chunk, process it per line
-        while len(curr_chunk) >= citystate_line_size:
-            # grab another line and get the data if it's a "detail record"
-            curr_row = curr_chunk[:citystate_line_size]
-            if curr_row[0] == "D":
-                state = curr_row[99:101]
-
-                # ignore state codes AA, AE, and AP because they're just for military routing
-                if state not in ['AA', 'AE', 'AP']:
-                    zip5 = curr_row[1:6]
-                    # zip of 96898 is a special case
-                    if zip5 == "96898":
-                        congressional_district = "99"
-                        state = "UM"
-                        county = "450"
-                    else:
-                        congressional_district = None
-                        county = curr_row[101:104]
-
-                    # certain states require specific CDs
-                    if state in ["AK", "DE", "MT", "ND", "SD", "VT", "WY"]:
-                        congressional_district = "00"
-                    elif state in ["AS", "DC", "GU", "MP", "PR", "VI"]:
-                        congressional_district = "98"
-                    elif state in ["FM", "MH", "PW", "UM"]:
-                        congressional_district = "99"
-
-                    data_array[zip5] = {"zip5": zip5, "zip_last4": None, "state_abbreviation": state,
-                                        "county_number": county, "congressional_district_no": congressional_district}
-
-            # cut the current line out of the chunk we're processing
-            curr_chunk = curr_chunk[citystate_line_size:]
+    # skip the copyright data
+    for record in citystate_layout.records(f, skip=1):
+        # only "detail records" have zip data
+        if citystate_layout.field(record, "record_type") != "D":
+            continue
+
+        row = citystate_layout.parse(record)
+        state = row.state
+
+        # ignore state codes AA, AE, and AP because they're just for military routing
+        if state in ['AA', 'AE', 'AP']:
+            continue
+
+        zip5 = row.zip5
+        # zip of 96898 is a special case
+        if zip5 == "96898":
+            congressional_district = "99"
+            state = "UM"
+            county = "450"
+        else:
+            congressional_district = None
+            county = row.county
+
+        # certain states require specific CDs
+        if state in ["AK", "DE", "MT", "ND", "SD", "VT", "WY"]:
+            congressional_district = "00"
+        elif state in ["AS", "DC", "GU", "MP", "PR", "VI"]:
+            congressional_district = "98"
+        elif state in ["FM", "MH", "PW", "UM"]:
+            congressional_district = "99"
+
+        data_array[zip5] = {"zip5": zip5, "zip4_low": None, "zip4_high": None, "state_abbreviation": state,
+                            "county_number": county, "congressional_district_no": congressional_district}
 
     # remove all zip5s that already exist in the table
-    for item in sess.query(Zips.zip5).distinct():
+    for item in sess.query(ZipRange.zip5).distinct():
         if item.zip5 in data_array:
             del data_array[item.zip5]
 
     logger.info("Starting insert on zip5 data")
-    add_to_table(data_array, sess)
+    zip5_data = list(data_array.values())
+    for start in range(0, len(zip5_data), batch_size):
+        add_to_table(zip5_data[start:start + batch_size], sess)
     return f
 
 
@@ -221,7 +180,7 @@ def read_zips():
         sess = GlobalDB.db().session
 
         # delete old values in case something changed and one is now invalid
-        sess.query(Zips).delete(synchronize_session=False)
+        sess.query(ZipRange).delete(synchronize_session=False)
         sess.commit()
 
         if CONFIG_BROKER["use_aws"]:
@@ -241,11 +200,13 @@ def read_zips():
             # creating the list while ignoring hidden files on mac
             file_list = [f for f in os.listdir(base_path) if not re.match('^\.', f)]
             for file in file_list:
-                parse_zip4_file(open(os.path.join(base_path, file)), sess)
+                with open(os.path.join(base_path, file), "rb") as zip4_file:
+                    parse_zip4_file(zip4_file, sess)
 
             # parse remaining 5 digit zips that weren't in the first file
             citystate_file = os.path.join(CONFIG_BROKER["path"], "dataactvalidator", "config", "ctystate.txt")
-            parse_citystate_file(open(citystate_file), sess)
+            with open(citystate_file, "rb") as citystate:
+                parse_citystate_file(citystate, sess)
 
         update_state_congr_table(sess)
 
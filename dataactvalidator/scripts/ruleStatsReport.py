@@ -0,0 +1,135 @@
+import argparse
+from datetime import datetime, timedelta
+import logging
+
+from sqlalchemy import func
+
+from dataactcore.interfaces.db import GlobalDB
+from dataactcore.logging import configure_logging
+from dataactcore.models.lookups import FILE_TYPE_DICT_ID
+from dataactcore.models.validationModels import RuleExecutionStats
+from dataactvalidator.health_check import create_app
+
+logger = logging.getLogger(__name__)
+
+
+def grouped_stats(sess, start, end=None):
+    """ Average stats of each rule or fused query by file type and submission size, files being grouped by the
+        power of ten of their row count
+
+    Args:
+        sess: current DB session
+        start: earliest time of the stats to include
+        end: time the stats must be before, defaults to now
+
+    Returns:
+        query of (query_name, file_type_id, size_bucket, runs, avg_total, max_total, avg_duration, avg_rows_returned,
+        avg_rows_scanned, avg_flex_duration, avg_report_duration) rows
+    """
+    stats = RuleExecutionStats
+    size_bucket = func.floor(func.log(func.greatest(func.coalesce(stats.file_rows, 0), 1))).label('size_bucket')
+    total = func.coalesce(stats.duration, 0) + func.coalesce(stats.flex_duration, 0) + \
+        func.coalesce(stats.report_duration, 0)
+    query = sess.query(stats.query_name, stats.file_type_id, size_bucket, func.count().label('runs'),
+                       func.avg(total).label('avg_total'), func.max(total).label('max_total'),
+                       func.avg(stats.duration).label('avg_duration'),
+                       func.avg(stats.rows_returned).label('avg_rows_returned'),
+                       func.avg(stats.rows_scanned).label('avg_rows_scanned'),
+                       func.avg(stats.flex_duration).label('avg_flex_duration'),
+                       func.avg(stats.report_duration).label('avg_report_duration')).\
+        filter(stats.created_at >= start)
+    if end is not None:
+        query = query.filter(stats.created_at < end)
+    return query.group_by(stats.query_name, stats.file_type_id, size_bucket)
+
+
+def slowest_rules(sess, start, limit=20):
+    """ The rules that took the longest on average since start, counting their query, flex field lookups and reports
+
+    Args:
+        sess: current DB session
+        start: earliest time of the stats to include
+        limit: number of rules to list
+
+    Returns:
+        list of rows of grouped_stats, slowest first
+    """
+    return grouped_stats(sess, start).order_by(func.avg(
+        func.coalesce(RuleExecutionStats.duration, 0) + func.coalesce(RuleExecutionStats.flex_duration, 0) +
+        func.coalesce(RuleExecutionStats.report_duration, 0)).desc()).limit(limit).all()
+
+
+def regressions(sess, recent_start, baseline_start, threshold=1.5, min_runs=5):
+    """ Rules that have gotten slower on files of the same type and size
+
+    Args:
+        sess: current DB session
+        recent_start: start of the recent stats, which are compared to everything from baseline_start up to it
+        baseline_start: start of the baseline stats
+        threshold: how many times slower the recent average must be to count as a regression
+        min_runs: number of runs a rule needs in both periods to be compared
+
+    Returns:
+        list of (baseline row, recent row) pairs of grouped_stats rows, the biggest slowdown first
+    """
+    baseline = {(row.query_name, row.file_type_id, row.size_bucket): row
+                for row in grouped_stats(sess, baseline_start, recent_start) if row.runs >= min_runs}
+    slower = []
+    for row in grouped_stats(sess, recent_start):
+        before = baseline.get((row.query_name, row.file_type_id, row.size_bucket))
+        if before is not None and row.runs >= min_runs and before.avg_total and \
+                row.avg_total >= threshold * before.avg_total:
+            slower.append((before, row))
+    return sorted(slower, key=lambda pair: pair[1].avg_total / pair[0].avg_total, reverse=True)
+
+
+def describe(row):
+    """ Name a row of grouped_stats by its rule, file type and file size """
+    file_type = FILE_TYPE_DICT_ID.get(row.file_type_id, row.file_type_id)
+    return '{} ({}, {:,}+ rows)'.format(row.query_name, file_type, 10 ** int(row.size_bucket or 0))
+
+
+def format_seconds(seconds):
+    return '-' if seconds is None else '{:.3f}s'.format(seconds)
+
+
+def print_report(sess, days, limit, recent_days, threshold, min_runs):
+    """ Print the slowest rules over the last days, then the rules that got slower over the last recent_days """
+    now = datetime.utcnow()
+    print('Slowest rules over the last {} days'.format(days))
+    for row in slowest_rules(sess, now - timedelta(days=days), limit):
+        print('  {}: {} average, {} max over {} runs; query {}, flex fields {}, report {}; {:.0f} rows returned, {} '
+              'rows scanned'.format(describe(row), format_seconds(row.avg_total), format_seconds(row.max_total),
+                                    row.runs, format_seconds(row.avg_duration), format_seconds(row.avg_flex_duration),
+                                    format_seconds(row.avg_report_duration), row.avg_rows_returned or 0,
+                                    '-' if row.avg_rows_scanned is None else '{:.0f}'.format(row.avg_rows_scanned)))
+
+    print('Rules at least {}x slower over the last {} days than the {} days before'.format(
+        threshold, recent_days, days - recent_days))
+    for before, after in regressions(sess, now - timedelta(days=recent_days), now - timedelta(days=days), threshold,
+                                     min_runs):
+        print('  {}: {} average, up from {} ({:.1f}x)'.format(describe(after), format_seconds(after.avg_total),
+                                                              format_seconds(before.avg_total),
+                                                              after.avg_total / before.avg_total))
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description='Report the slowest validation rules and the rules that have gotten '
+                                                 'slower, from the stats in rule_execution_stats')
+    parser.add_argument('-d', '--days', type=int, default=30, help='Days of stats to report on')
+    parser.add_argument('-l', '--limit', type=int, default=20, help='Number of slowest rules to list')
+    parser.add_argument('-r', '--recent-days', type=int, default=7,
+                        help='Days of recent stats to compare to the rest of the stats to find regressions')
+    parser.add_argument('-t', '--threshold', type=float, default=1.5,
+                        help='How many times slower a rule must have gotten to be listed as a regression')
+    parser.add_argument('-m', '--min-runs', type=int, default=5,
+                        help='Runs a rule needs in both periods to be checked for regressions')
+    return parser
+
+
+if __name__ == '__main__':
+    configure_logging()
+    args = get_parser().parse_args()
+
+    with create_app().app_context():
+        print_report(GlobalDB.db().session, args.days, args.limit, args.recent_days, args.threshold, args.min_runs)
@@ -0,0 +1,65 @@
+from decimal import Decimal, InvalidOperation
+
+from dataactvalidator.validation_handlers.rowRules import ROW_RULES
+
+
+def column_converter(column):
+    """ Function turning a cleaned CSV value into the value the staging table column stores """
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = str
+    if python_type not in (int, Decimal):
+        return lambda value: value
+
+    def convert(value):
+        try:
+            return None if value is None else python_type(value)
+        except (ValueError, InvalidOperation):
+            # The database rejects rows like this, so they're never checked
+            return value
+    return convert
+
+
+class RowRuleEngine:
+    """ Checks the Python twins of a file's SQL rules against each row as it's written to the staging table, so those
+        rules don't need to run against the table once the file is loaded. Failures are kept in the same form as the
+        rows the SQL rules would have returned. """
+
+    def __init__(self, model, rules):
+        """
+
+        args
+
+        model - ORM model class of the file's staging table
+        rules - RuleSql for each of the file's single file rules, those without a Python twin are ignored
+
+        """
+        self.twins = [ROW_RULES[rule.query_name] for rule in rules if rule.query_name in ROW_RULES]
+        columns = model.__table__.columns
+        self.converters = {name: column_converter(columns[name]) for twin in self.twins for name in twin.columns}
+        self.failures = {twin.query_name: [] for twin in self.twins}
+
+    def check(self, row_number, values):
+        """ Check a row that has been written to the staging table against every twin
+
+        Args:
+            row_number: row number of the record in the submitted file
+            values: dict of the cleaned values written for the row
+        """
+        if not self.twins:
+            return
+        row = {name: convert(values.get(name)) for name, convert in self.converters.items()}
+        row['row_number'] = row_number
+        for twin in self.twins:
+            if twin.check(row):
+                self.failures[twin.query_name].append(row)
+
+    def results(self):
+        """ The result of each twinned rule, as validate_file_by_sql expects
+
+        Returns:
+            dict of query_name to (column names, failed rows) for each rule with a Python twin
+        """
+        return {twin.query_name: (['row_number'] + twin.columns, self.failures[twin.query_name])
+                for twin in self.twins}
@@ -0,0 +1,118 @@
+""" Python twins of SQL rules that only look at one row of a file. A twin is checked against each row as it's written
+    to the staging table, and its SQL rule is then skipped. Each twin is registered under the query_name of its .sql
+    file in dataactvalidator/config/sqlrules and must fail exactly the rows its SQL returns. """
+import re
+
+# Python twin of each SQL rule that has one, by query_name
+ROW_RULES = {}
+
+
+class RowRule:
+    """ Python twin of a SQL rule """
+
+    def __init__(self, query_name, columns, check):
+        """
+
+        args
+
+        query_name - name of the SQL rule's .sql file
+        columns - the columns the SQL rule selects after row_number, in the same order
+        check - function called with a dict of a staging row's values, returning True if the row fails the rule
+
+        """
+        self.query_name = query_name
+        self.columns = columns
+        self.check = check
+
+
+def row_rule(query_name, *columns):
+    """ Register the decorated function as the Python twin of the SQL rule query_name, which selects columns """
+    def register(check):
+        ROW_RULES[query_name] = RowRule(query_name, list(columns), check)
+        return check
+    return register
+
+
+def is_blank(value):
+    """ NULL or an empty string """
+    return value is None or value == ''
+
+
+def lower(value):
+    """ LOWER(value), keeping NULLs """
+    return None if value is None else value.lower()
+
+
+@row_rule('fabs1_detached_award_financial_assistance', 'record_type', 'fain')
+def fabs1(row):
+    return row['record_type'] == 2 and is_blank(row['fain'])
+
+
+@row_rule('fabs3_detached_award_financial_assistance_1', 'action_type', 'record_type')
+def fabs3_1(row):
+    return row['record_type'] == 2 and is_blank(row['action_type'])
+
+
+@row_rule('fabs3_detached_award_financial_assistance_2', 'action_type', 'record_type')
+def fabs3_2(row):
+    return (row['action_type'] or '').lower() not in ('', 'a', 'b', 'c', 'd')
+
+
+@row_rule('fabs6_detached_award_financial_assistance', 'record_type')
+def fabs6(row):
+    return row['record_type'] not in (1, 2)
+
+
+@row_rule('fabs7_detached_award_financial_assistance', 'record_type', 'uri')
+def fabs7(row):
+    return row['record_type'] == 1 and is_blank(row['uri'])
+
+
+@row_rule('fabs9_detached_award_financial_assistance', 'record_type', 'awardee_or_recipient_legal')
+def fabs9(row):
+    legal_name = lower(row['awardee_or_recipient_legal'])
+    return row['record_type'] == 1 and legal_name is not None and legal_name != 'multiple recipients'
+
+
+@row_rule('fabs10_detached_award_financial_assistance_1', 'record_type', 'legal_entity_address_line1')
+def fabs10_1(row):
+    return row['record_type'] == 2 and is_blank(row['legal_entity_address_line1'])
+
+
+@row_rule('fabs10_detached_award_financial_assistance_2', 'record_type', 'legal_entity_address_line1')
+def fabs10_2(row):
+    return row['record_type'] == 1 and not is_blank(row['legal_entity_address_line1'])
+
+
+@row_rule('fabs11_detached_award_financial_assistance', 'record_type', 'legal_entity_address_line2')
+def fabs11(row):
+    return row['record_type'] == 1 and not is_blank(row['legal_entity_address_line2'])
+
+
+@row_rule('fabs12_detached_award_financial_assistance', 'record_type', 'legal_entity_address_line3')
+def fabs12(row):
+    return row['record_type'] == 1 and not is_blank(row['legal_entity_address_line3'])
+
+
+# Postgres regular expressions let . match line breaks and are case insensitive with ~*
+REPEATED_BUSINESS_TYPE = re.compile(r'([A-X]).*\1', re.IGNORECASE | re.DOTALL)
+BUSINESS_TYPES = re.compile(r'[A-X]{1,3}', re.IGNORECASE)
+
+
+@row_rule('fabs18_detached_award_financial_assistance', 'business_types')
+def fabs18(row):
+    business_types = row['business_types']
+    return business_types is not None and (REPEATED_BUSINESS_TYPE.search(business_types) is not None or
+                                           BUSINESS_TYPES.fullmatch(business_types) is None)
+
+
+@row_rule('fabs25_detached_award_financial_assistance', 'record_type', 'award_description')
+def fabs25(row):
+    return row['record_type'] == 2 and is_blank(row['award_description'])
+
+
+@row_rule('fabs31_detached_award_financial_assistance_1', 'record_type', 'business_types', 'awardee_or_recipient_uniqu',
+          'business_types', 'record_type')
+def fabs31_1(row):
+    return (row['record_type'] == 1 or 'p' in (lower(row['business_types']) or '')) and \
+        not is_blank(row['awardee_or_recipient_uniqu'])
@@ -0,0 +1,279 @@
+""" Compiles a file's SQL rules into as few queries as possible. Row-local rules, which only look at one row of the
+    file's staging table at a time, are fused into a single scan of the table per file, and their results are split
+    back out into the rows each rule would have returned on its own. Every other rule runs as written. """
+import re
+
+# Bind parameter rules are run with, in place of the {0} they're written with
+SUBMISSION_PARAMETER = ':submission_id'
+
+IDENTIFIER = r'[a-z_][a-z0-9_]*'
+
+# Anything that can make a rule look past the row it's checking, or change which rows come back
+NON_ROW_LOCAL_KEYWORDS = re.compile(r'\b(join|group|having|union|intersect|except|distinct|over|order|limit|offset|'
+                                    r'window|lateral|with)\b', re.IGNORECASE)
+AGGREGATE_FUNCTIONS = re.compile(r'\b(count|sum|avg|min|max|array_agg|string_agg|bool_and|bool_or|every)\s*\(',
+                                 re.IGNORECASE)
+RULE_PATTERN = re.compile(r'^\s*select\s+(?P<select>.*?)\s+from\s+(?P<from>.*?)\s+where\s+(?P<where>.*?)\s*;?\s*$',
+                          re.IGNORECASE | re.DOTALL)
+FROM_PATTERN = re.compile(r'^(?P<table>{0})(?:\s+(?:as\s+)?(?P<alias>{0}))?$'.format(IDENTIFIER), re.IGNORECASE)
+COLUMN_PATTERN = re.compile(r'^(?:(?P<qualifier>{0})\s*\.\s*)?(?P<name>{0})$'.format(IDENTIFIER), re.IGNORECASE)
+SUBMISSION_FILTER = re.compile(r'^(?:(?P<qualifier>{0})\s*\.\s*)?submission_id\s*=\s*:submission_id\s+and\s+'
+                               .format(IDENTIFIER), re.IGNORECASE)
+
+
+class RowLocalRule:
+    """ A rule that selects some of a staging table's columns for each row matching a condition on that row alone """
+
+    def __init__(self, table, columns, condition):
+        """
+
+        args
+
+        table - name of the staging table the rule checks
+        columns - names of the columns the rule returns, other than row_number
+        condition - SQL condition a row fails the rule on, with column names unqualified
+
+        """
+        self.table = table
+        self.columns = columns
+        self.condition = condition
+
+
+def normalize_rule_sql(sql):
+    """ Turn a rule's SQL from the form it's written in, with {0} standing for the submission ID, into a statement that
+        takes the submission ID as the :submission_id bind parameter, so it's the same for every submission. The
+        submission ID some rules add to the names of their CTEs is dropped, as CTE names are local to the statement
+        anyway. SQL that is already normalized is returned unchanged.
+
+        Args:
+            sql: SQL of the rule
+
+        Returns:
+            the rule's SQL with a :submission_id bind parameter
+    """
+    sql = re.sub(r'_\{0?\}', '', sql)
+    return re.sub(r'\{0?\}', SUBMISSION_PARAMETER, sql)
+
+
+def strip_comments(sql):
+    """ Remove -- and /* */ comments from SQL, leaving string literals alone """
+    result = []
+    i = 0
+    while i < len(sql):
+        if sql[i] == "'":
+            end = sql.find("'", i + 1)
+            end = len(sql) if end == -1 else end + 1
+            result.append(sql[i:end])
+            i = end
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            result.append(' ')
+            i = len(sql) if end == -1 else end + 2
+        else:
+            result.append(sql[i])
+            i += 1
+    return ''.join(result)
+
+
+def mask_strings(sql):
+    """ Blank out the contents of string literals so keywords and punctuation inside them aren't mistaken for SQL.
+        The result is the same length as the SQL, so positions found in it can be used on the original. """
+    return re.sub(r"'[^']*'", lambda match: "'" + ' ' * (len(match.group()) - 2) + "'", sql)
+
+
+def split_top_level(masked, separator=','):
+    """ Find the (start, end) spans of the parts of masked SQL between separators outside of any parentheses """
+    spans = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(masked):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == separator and depth == 0:
+            spans.append((start, i))
+            start = i + 1
+    spans.append((start, len(masked)))
+    return spans
+
+
+def has_top_level_or(masked):
+    """ Whether a masked condition has an OR outside of any parentheses, so it isn't just a chain of ANDs """
+    depth = 0
+    for match in re.finditer(r'\(|\)|\bor\b', masked, re.IGNORECASE):
+        if match.group() == '(':
+            depth += 1
+        elif match.group() == ')':
+            depth -= 1
+        elif depth == 0:
+            return True
+    return False
+
+
+def unqualify(sql, masked, qualifiers):
+    """ Drop table or alias qualifiers from the column names in SQL, which is safe when it only reads one table """
+    pattern = re.compile(r'\b(?:{})\s*\.\s*(?={})'.format('|'.join(re.escape(q) for q in qualifiers), IDENTIFIER),
+                         re.IGNORECASE)
+    result = []
+    last = 0
+    for match in pattern.finditer(masked):
+        result.append(sql[last:match.start()])
+        last = match.end()
+    result.append(sql[last:])
+    return ''.join(result)
+
+
+def parse_row_local(sql):
+    """ Recognize a rule that only looks at one row of one table at a time, which is any rule of the form
+
+            SELECT row_number, <columns> FROM <table> [alias] WHERE submission_id = :submission_id AND <condition>
+
+        where the columns are plain column names and the condition has no subqueries, aggregates or ORs outside of
+        parentheses that could get around the submission filter
+
+        Args:
+            sql: the rule's normalized SQL
+
+        Returns:
+            RowLocalRule, or None if the rule needs to run on its own
+    """
+    sql = strip_comments(sql)
+    masked = mask_strings(sql)
+    if len(re.findall(r'\bselect\b', masked, re.IGNORECASE)) != 1 or \
+            len(re.findall(r'\bfrom\b', masked, re.IGNORECASE)) != 1 or \
+            len(re.findall(r'\bwhere\b', masked, re.IGNORECASE)) != 1 or \
+            NON_ROW_LOCAL_KEYWORDS.search(masked) or AGGREGATE_FUNCTIONS.search(masked):
+        return None
+
+    match = RULE_PATTERN.match(masked)
+    if not match:
+        return None
+    from_match = FROM_PATTERN.match(sql[match.start('from'):match.end('from')])
+    if not from_match:
+        return None
+    table = from_match.group('table').lower()
+    qualifiers = {table}
+    if from_match.group('alias'):
+        qualifiers.add(from_match.group('alias').lower())
+
+    columns = []
+    select_start = match.start('select')
+    for start, end in split_top_level(masked[select_start:match.end('select')]):
+        column_match = COLUMN_PATTERN.match(sql[select_start + start:select_start + end].strip())
+        if not column_match or (column_match.group('qualifier') and
+                                column_match.group('qualifier').lower() not in qualifiers):
+            return None
+        columns.append(column_match.group('name').lower())
+    if 'row_number' not in columns:
+        return None
+
+    where_start, where_end = match.start('where'), match.end('where')
+    filter_match = SUBMISSION_FILTER.match(masked[where_start:where_end])
+    if not filter_match or (filter_match.group('qualifier') and
+                            filter_match.group('qualifier').lower() not in qualifiers):
+        return None
+    condition_start = where_start + filter_match.end()
+    if has_top_level_or(masked[condition_start:where_end]):
+        return None
+    condition = unqualify(sql[condition_start:where_end], masked[condition_start:where_end], qualifiers).strip()
+
+    return RowLocalRule(table, [column for column in columns if column != 'row_number'], condition)
+
+
+class RuleQuery:
+    """ A query run for one or more rules """
+
+    def __init__(self, query_name, sql, rules):
+        """
+
+        args
+
+        query_name - name to log the query under
+        sql - SQL to run
+        rules - the rules the query checks
+
+        """
+        self.query_name = query_name
+        self.sql = sql
+        self.rules = rules
+
+    def split(self, cols, failures):
+        """ Split the query's result into the result of each of its rules
+
+        Args:
+            cols: column names of the query's result
+            failures: rows of the query's result
+
+        Returns:
+            list of (cols, failures) for each rule, in the same order as the rules
+        """
+        return [(cols, failures)]
+
+
+class FusedRuleQuery(RuleQuery):
+    """ A single scan of a staging table checking any number of row-local rules, returning each row that fails at
+        least one of them along with a flag for each rule """
+
+    def __init__(self, table, rules, row_local_rules):
+        """
+
+        args
+
+        table - name of the staging table the rules check
+        rules - the rules being checked
+        row_local_rules - RowLocalRule for each rule
+
+        """
+        self.row_local_rules = row_local_rules
+        columns = []
+        for row_local_rule in row_local_rules:
+            columns.extend(column for column in row_local_rule.columns if column not in columns)
+        select = ['row_number'] + columns + ['({}) IS TRUE AS rule_{}_failed'.format(row_local_rule.condition, i)
+                                             for i, row_local_rule in enumerate(row_local_rules)]
+        sql = 'SELECT {}\nFROM {}\nWHERE submission_id = {}\n    AND ({})'.format(
+            ',\n    '.join(select), table, SUBMISSION_PARAMETER,
+            '\n        OR '.join('({})'.format(row_local_rule.condition) for row_local_rule in row_local_rules))
+        super(FusedRuleQuery, self).__init__('fused_' + table, sql, rules)
+
+    def split(self, cols, failures):
+        results = []
+        for i, row_local_rule in enumerate(self.row_local_rules):
+            rule_cols = ['row_number'] + row_local_rule.columns
+            flag = 'rule_{}_failed'.format(i)
+            results.append((rule_cols, [{col: failure[col] for col in rule_cols}
+                                        for failure in failures if failure[flag]]))
+        return results
+
+
+def compile_rules(rules):
+    """ Turn a file's rules into the queries to run for them, fusing the row-local rules on each table into one query.
+        The queries take the submission ID as the :submission_id bind parameter.
+
+    Args:
+        rules: RuleSql for each rule to check
+
+    Returns:
+        list of RuleQuery, each rule appearing in exactly one of them
+    """
+    queries = []
+    row_local = {}
+    for rule in rules:
+        sql = normalize_rule_sql(rule.rule_sql)
+        row_local_rule = parse_row_local(sql)
+        if row_local_rule is None:
+            queries.append(RuleQuery(rule.query_name, sql, [rule]))
+        else:
+            row_local.setdefault(row_local_rule.table, []).append((rule, sql, row_local_rule))
+
+    for table, table_rules in row_local.items():
+        if len(table_rules) == 1:
+            rule, sql, _ = table_rules[0]
+            queries.append(RuleQuery(rule.query_name, sql, [rule]))
+        else:
+            queries.append(FusedRuleQuery(table, [rule for rule, _, _ in table_rules],
+                                          [row_local_rule for _, _, row_local_rule in table_rules]))
+    return queries
@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+import random
+import threading
+import time
+
+from dataactcore.config import CONFIG_BROKER
+from dataactcore.models.validationModels import RuleExecutionStats
+
+
+class RuleProfile:
+    """ Timings and row counts of the rules run for a job, saved to the rule_execution_stats table when the
+        validator_rule_stats config value is set. Stats are kept under the name of the query that was run, so a fused
+        query has stats of its own, while the rules in it only have their rows returned and the time spent building
+        their reports. """
+
+    def __init__(self, submission_id, job_id, file_type_id, file_rows=None, target_file_type_id=None):
+        """
+
+        args
+
+        submission_id - ID of the submission being validated
+        job_id - ID of the job running the rules
+        file_type_id - file type the rules check
+        file_rows - number of rows in the file, or in both files for cross-file rules
+        target_file_type_id - other file type cross-file rules check
+
+        """
+        self.submission_id = submission_id
+        self.job_id = job_id
+        self.file_type_id = file_type_id
+        self.file_rows = file_rows
+        self.target_file_type_id = target_file_type_id
+        self.enabled = bool(CONFIG_BROKER.get('validator_rule_stats'))
+        self.explain_rate = CONFIG_BROKER.get('validator_rule_explain_rate') or 0
+        self.labels = {}
+        self.query_names = {}
+        # stats by query name, in the order the queries were first recorded
+        self.stats = {}
+        self.order = []
+        self.lock = threading.Lock()
+
+    def add_rules(self, rules):
+        """ Remember the labels of the rules, so stats can be recorded against a failure's label """
+        for rule in rules:
+            self.labels[rule.query_name] = rule.rule_label
+            self.query_names.setdefault(rule.rule_label, rule.query_name)
+
+    def query_name(self, rule_label):
+        """ Query name of the rule with a label, or the label itself if no rule has it """
+        return self.query_names.get(rule_label, rule_label)
+
+    def record(self, query_name, **metrics):
+        """ Add to the stats of a query. Safe to call from several threads at once
+
+        Args:
+            query_name: name of the rule or fused query
+            metrics: amounts to add to each of the query's stats, such as duration=1.5
+        """
+        with self.lock:
+            stats = self.stats.get(query_name)
+            if stats is None:
+                stats = self.stats[query_name] = {}
+                self.order.append(query_name)
+            for metric, amount in metrics.items():
+                stats[metric] = stats.get(metric, 0) + amount
+
+    @contextmanager
+    def timer(self, query_name, metric):
+        """ Add the seconds spent in the block to one of a query's stats """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(query_name, **{metric: time.perf_counter() - start})
+
+    def should_explain(self):
+        """ Whether to sample this query's plan with EXPLAIN ANALYZE, at the validator_rule_explain_rate """
+        return self.enabled and self.explain_rate > 0 and random.random() < self.explain_rate
+
+    def save(self, sess):
+        """ Save the stats of every query to the rule_execution_stats table, if the validator is set to """
+        if not self.enabled or not self.order:
+            return
+        sess.bulk_insert_mappings(RuleExecutionStats, [
+            dict(self.stats[query_name], submission_id=self.submission_id, job_id=self.job_id, query_name=query_name,
+                 rule_label=self.labels.get(query_name), file_type_id=self.file_type_id,
+                 target_file_type_id=self.target_file_type_id, file_rows=self.file_rows)
+            for query_name in self.order
+        ])
+        sess.commit()
+
+
+def plan_rows_scanned(plan):
+    """ Count the table rows read by the scans in an EXPLAIN ANALYZE plan
+
+    Args:
+        plan: a node of the plan from EXPLAIN (ANALYZE, FORMAT JSON), as a dict
+
+    Returns:
+        rows read from tables by the node and the nodes under it, including those its filters removed
+    """
+    rows = 0
+    if 'Relation Name' in plan:
+        rows_per_loop = plan.get('Actual Rows', 0) + plan.get('Rows Removed by Filter', 0)
+        rows += rows_per_loop * plan.get('Actual Loops', 1)
+    for child in plan.get('Plans', []):
+        rows += plan_rows_scanned(child)
+    return rows
@@ -0,0 +1,183 @@
+import io
+
+import psycopg2
+from sqlalchemy.exc import SQLAlchemyError
+
+from dataactcore.interfaces.db import GlobalDB
+from dataactcore.models.lookups import RULE_SEVERITY_DICT
+from dataactcore.models.stagingModels import FlexField
+from dataactvalidator.validation_handlers.validationError import ValidationError
+
+
+class StagingWriter(object):
+    """
+    Buffers validated records and writes them to a staging table in batches using COPY FROM STDIN. Rows are
+    reported back in the order they were read, so errors and warnings come out exactly as they would if each row
+    were inserted on its own.
+    """
+
+    BATCH_SIZE = 10000
+
+    def __init__(self, model, job, writer, error_list, row_callback, batch_size=None, written_callback=None):
+        """
+
+        args
+
+        model - ORM model class of the staging table
+        job - current job
+        writer - CsvWriter object for the error report
+        error_list - instance of ErrorInterface to keep track of errors
+        row_callback - function called with (row_number, failures) for each row that was not rejected by the
+            database, in file order
+        batch_size - number of rows to buffer before writing, defaults to BATCH_SIZE
+        written_callback - function called with (row_number, values) for each row written to the staging table, in
+            file order
+
+        """
+        self.job = job
+        self.writer = writer
+        self.error_list = error_list
+        self.row_callback = row_callback
+        self.written_callback = written_callback
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.table = model.__table__
+        self.flex_table = FlexField.__table__
+        self.entries = []
+        self.pending_inserts = 0
+        self.error_rows = []
+
+    def write(self, row_number, values, flex_fields, failures):
+        """ Add a row to the current batch
+
+        Args:
+            row_number: row number of the record in the submitted file
+            values: dict of column values to insert, None if the row should not be inserted
+            flex_fields: list of FlexFields to insert with this row
+            failures: list of Failure tuples to pass to the row callback
+        """
+        self.entries.append((row_number, values, flex_fields, failures))
+        if values is not None:
+            self.pending_inserts += 1
+        if self.pending_inserts >= self.batch_size:
+            self.finish_batch()
+
+    def finish_batch(self):
+        """ Write the unfinished batch to the staging table, then report each buffered row in file order """
+        entries, self.entries, self.pending_inserts = self.entries, [], 0
+        if not entries:
+            return
+
+        rows = [(row_number, values) for row_number, values, _, _ in entries if values is not None]
+        failed_rows = set(self.copy_rows(rows))
+
+        flex_rows = [flex_field_values(flex_field) for _, values, flex_fields, _ in entries if values is not None
+                     for flex_field in flex_fields]
+        if flex_rows:
+            sess = GlobalDB.db().session
+            copy_into_table(sess, self.flex_table, flex_rows)
+            sess.commit()
+
+        for row_number, values, _, failures in entries:
+            if values is not None and row_number in failed_rows:
+                # Write failed, move to next record
+                self.writer.write(["Formatting Error", ValidationError.writeErrorMsg, row_number, ""])
+                self.error_list.record_row_error(self.job.job_id, self.job.filename, "Formatting Error",
+                                                 ValidationError.writeError, row_number,
+                                                 severity_id=RULE_SEVERITY_DICT['fatal'])
+                self.error_rows.append(row_number)
+                continue
+            if values is not None and self.written_callback:
+                self.written_callback(row_number, values)
+            if failures:
+                self.row_callback(row_number, failures)
+
+    def copy_rows(self, rows):
+        """ COPY the rows into the staging table, bisecting the batch on failure to isolate the rows the database
+        rejects
+
+        Args:
+            rows: list of (row_number, dict of column values) pairs
+
+        Returns:
+            list of row numbers that could not be written
+        """
+        if not rows:
+            return []
+
+        sess = GlobalDB.db().session
+        try:
+            copy_into_table(sess, self.table, [values for _, values in rows])
+            sess.commit()
+        except (psycopg2.Error, SQLAlchemyError):
+            sess.rollback()
+            if len(rows) == 1:
+                return [rows[0][0]]
+            middle = len(rows) // 2
+            return self.copy_rows(rows[:middle]) + self.copy_rows(rows[middle:])
+        return []
+
+
+class _DefaultContext(object):
+    """ Stand-in for the execution context SQLAlchemy passes to column default functions """
+    def __init__(self, current_parameters):
+        self.current_parameters = current_parameters
+
+
+def fill_defaults(table, values):
+    """ Apply the Python-side column defaults (timestamps, concatenated TAS, etc.) the ORM would have applied
+
+    Args:
+        table: SQLAlchemy Table the row is written to
+        values: dict of column values for the row, only columns of the table are kept
+
+    Returns:
+        dict of values for every column of the table except those the database fills in itself
+    """
+    row = {column.key: values.get(column.key) for column in table.columns
+           if column.key in values or not (column.primary_key or column.default is not None or
+                                           column.server_default is not None)}
+    for column in table.columns:
+        if column.key in row or column.default is None:
+            continue
+        if column.default.is_callable:
+            row[column.key] = column.default.arg(_DefaultContext(row))
+        elif not (column.default.is_sequence or column.default.is_clause_element):
+            row[column.key] = column.default.arg
+    return row
+
+
+def copy_value(value):
+    """ Format a single value for a CSV COPY: unquoted empty means NULL, everything else is quoted """
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_into_table(sess, table, rows):
+    """ Write the rows to the table with a single COPY FROM STDIN on the session's connection
+
+    Args:
+        sess: current DB session
+        table: SQLAlchemy Table to write to
+        rows: list of dicts of column values
+    """
+    rows = [fill_defaults(table, values) for values in rows]
+    columns = [column.key for column in table.columns if any(column.key in row for row in rows)]
+
+    data = io.StringIO()
+    for row in rows:
+        data.write(','.join(copy_value(row.get(column)) for column in columns))
+        data.write('\n')
+    data.seek(0)
+
+    cursor = sess.connection().connection.cursor()
+    try:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN WITH CSV'.format(table.name, ', '.join(columns)), data)
+    finally:
+        cursor.close()
+
+
+def flex_field_values(flex_field):
+    """ Get the column values that have been set on a FlexField built by the CsvReader """
+    values = {column.key: getattr(flex_field, column.key) for column in FlexField.__table__.columns}
+    return {key: value for key, value in values.items() if value is not None}
@@ -1,22 +1,22 @@
-import csv
+import functools
 import os
 import logging
+import time
 from datetime import datetime
 
 from sqlalchemy import and_, or_
-from sqlalchemy.exc import SQLAlchemyError
 
 from dataactcore.config import CONFIG_BROKER
 from dataactcore.interfaces.db import GlobalDB
 from dataactcore.models.domainModels import matching_cars_subquery
 from dataactcore.models.jobModels import Submission
-from dataactcore.models.lookups import FILE_TYPE, FILE_TYPE_DICT, RULE_SEVERITY_DICT
+from dataactcore.models.lookups import FILE_TYPE, FILE_TYPE_DICT, JOB_TYPE_DICT, RULE_SEVERITY_DICT
 from dataactcore.models.validationModels import FileColumn
-from dataactcore.models.stagingModels import DetachedAwardFinancialAssistance, FlexField
+from dataactcore.models.stagingModels import DetachedAwardFinancialAssistance, FlexField, create_submission_partitions
 from dataactcore.interfaces.function_bag import (
     create_file_if_needed, write_file_error, mark_file_complete, run_job_checks,
     mark_job_status, populate_submission_error_info, populate_job_error_info,
-    get_action_dates
+    get_action_dates, refresh_submission_summary, clear_submission_rows
 )
 from dataactcore.models.errorModels import ErrorMetadata
 from dataactcore.models.jobModels import Job
@@ -29,9 +29,15 @@ from dataactvalidator.filestreaming.csvReader import CsvReader
 from dataactvalidator.filestreaming.csvLocalWriter import CsvLocalWriter
 from dataactvalidator.filestreaming.csvS3Writer import CsvS3Writer
 from dataactvalidator.validation_handlers.errorInterface import ErrorInterface
-from dataactvalidator.validation_handlers.validator import Validator, cross_validate_sql, validate_file_by_sql
+from dataactvalidator.validation_handlers.rowRuleEngine import RowRuleEngine
+from dataactvalidator.validation_handlers.ruleCompiler import normalize_rule_sql
+from dataactvalidator.validation_handlers.ruleProfile import RuleProfile
+from dataactvalidator.validation_handlers.stagingWriter import StagingWriter
+from dataactvalidator.validation_handlers.validator import (
+    BatchValidator, cross_validate_sql, run_cross_rule, run_rule_queries, validate_file_by_sql
+)
 from dataactvalidator.validation_handlers.validationError import ValidationError
-from dataactvalidator.filestreaming.fieldCleaner import FieldCleaner
+from dataactvalidator.filestreaming.fieldCleaner import ColumnPlan
 from dataactcore.models.validationModels import RuleSql
 
 
@@ -83,7 +89,7 @@ class ValidationManager:
         # Forcing forward slash here instead of using os.path to write a valid path for S3
         return "".join(["errors/", path])
 
-    def read_record(self, reader, writer, row_number, job, fields, error_list):
+    def read_record(self, reader, writer, row_number, job, column_plan, error_list, flush_rows=None):
         """ Read and process the next record
 
         Args:
@@ -91,8 +97,10 @@ class ValidationManager:
             writer: CsvWriter object
             row_number: Next row number to be read
             job: current job
-            fields: List of FileColumn objects for this file type
+            column_plan: ColumnPlan for this file type
             error_list: instance of ErrorInterface to keep track of errors
+            flush_rows: function called before reporting a formatting error, so earlier rows that are still buffered
+                are reported first and the error report stays in file order
 
         Returns:
             Tuple with six elements:
@@ -108,7 +116,7 @@ class ValidationManager:
         job_id = job.job_id
         try:
             (next_record, flex_fields) = reader.get_next_record()
-            record = FieldCleaner.clean_row(next_record, self.long_to_short_dict, fields)
+            record = column_plan.clean_row(next_record)
             record["row_number"] = row_number
             for flex_field in flex_fields:
                 flex_field.submission_id = job.submission_id
@@ -126,6 +134,8 @@ class ValidationManager:
                 # Don't count last row if empty
                 reduce_row = True
             else:
+                if flush_rows:
+                    flush_rows()
                 writer.write(["Formatting Error", ValidationError.readErrorMsg, str(row_number), ""])
                 error_list.record_row_error(job_id, job.filename, "Formatting Error", ValidationError.readError,
                                             row_number, severity_id=RULE_SEVERITY_DICT['fatal'])
@@ -171,12 +181,16 @@ class ValidationManager:
         sess.query(ErrorMetadata).filter(ErrorMetadata.job_id == job_id).delete()
         sess.commit()
 
+        # A submission's staging partitions are created once it's committed, this only creates any that weren't
+        create_submission_partitions(sess, submission_id)
+        sess.commit()
+
         # Clear existing records for this submission
-        sess.query(model).filter_by(submission_id=submission_id).delete()
+        clear_submission_rows(sess, model, submission_id)
         sess.commit()
 
-        # Clear existing flex fields for this job
-        sess.query(FlexField).filter_by(job_id=job_id).delete()
+        # Clear existing flex fields for this job, the submission's other files share its flex_field partition
+        sess.query(FlexField).filter_by(submission_id=submission_id, job_id=job_id).delete()
         sess.commit()
 
         # If local, make the error report directory
@@ -210,22 +224,15 @@ class ValidationManager:
             sess.expunge(field)
 
         csv_schema = {row.name_short: row for row in fields}
+        column_plan = ColumnPlan(self.long_to_short_dict, fields)
 
         try:
             extension = os.path.splitext(file_name)[1]
             if not extension or extension.lower() not in ['.csv', '.txt']:
                 raise ResponseException("", StatusCode.CLIENT_ERROR, None, ValidationError.fileTypeError)
 
-            # Count file rows: throws a File Level Error for non-UTF8 characters
-            temp_file = open(reader.get_filename(region_name, bucket_name, file_name), encoding='utf-8')
-            file_row_count = len(list(csv.reader(temp_file)))
-            try:
-                temp_file.close()
-            except AttributeError:
-                # File does not exist, and so does not need to be closed
-                pass
-
-            # Pull file and return info on whether it's using short or long col headers
+            # Pull file and return info on whether it's using short or long col headers. Rows are counted and
+            # checked for non-UTF8 characters (a File Level Error) as they are read below
             reader.open_file(region_name, bucket_name, file_name, fields, bucket_name, error_file_name,
                              self.long_to_short_dict, is_local=self.isLocal)
 
@@ -250,6 +257,58 @@ class ValidationManager:
 
             with self.get_writer(region_name, bucket_name, error_file_name, self.reportHeaders) as writer, \
                     self.get_writer(region_name, bucket_name, warning_file_name, self.reportHeaders) as warning_writer:
+
+                def report_row_failures(failed_row_number, failures):
+                    # called by the staging writer in file order, once the row's batch has been written
+                    if write_errors(failures, job, self.short_to_long_dict, writer, warning_writer,
+                                    failed_row_number, error_list):
+                        error_rows.append(failed_row_number)
+
+                # Rules with a Python twin are checked as each row is written instead of after the load
+                file_rules = sess.query(RuleSql).filter_by(file_id=FILE_TYPE_DICT[file_type],
+                                                           rule_cross_file_flag=False).all()
+                row_rule_engine = RowRuleEngine(model, file_rules)
+                staging_writer = StagingWriter(model, job, writer, error_list, report_row_failures,
+                                               CONFIG_BROKER.get('staging_batch_size'), row_rule_engine.check)
+                batch_validator = BatchValidator(csv_schema, file_type in ["detached_award"])
+                # (row number, record, flex fields) for rows read but not yet validated
+                pending_rows = []
+
+                def validate_pending_rows():
+                    #
+                    # second phase of validations: do basic schema checks
+                    # (e.g., require fields, field length, data type)
+                    #
+                    # D files are obtained from upstream systems (ASP and FPDS) that perform their own basic
+                    # validations, so these validations are not repeated here
+                    if file_type in ["award", "award_procurement"]:
+                        # Skip basic validations for D files, set as valid to trigger write to staging
+                        results = [(True, [], True)] * len(pending_rows)
+                    else:
+                        results = batch_validator.validate([record for _, record, _ in pending_rows])
+
+                    for (pending_row_number, record, flex_cols), (passed_validations, failures, valid) in \
+                            zip(pending_rows, results):
+                        values = None
+                        if valid:
+                            # todo: update this logic later when we have actual validations
+                            if file_type in ["detached_award"]:
+                                record["is_valid"] = True
+
+                            values = dict(record, job_id=job_id, submission_id=submission_id,
+                                          valid_record=passed_validations)
+
+                        # Rows that fail to write are recorded as formatting errors when their batch is written,
+                        # validation failures are reported for every other row
+                        if values is not None or not passed_validations:
+                            staging_writer.write(pending_row_number, values, flex_cols,
+                                                 [] if passed_validations else failures)
+                    del pending_rows[:]
+
+                def flush_rows():
+                    validate_pending_rows()
+                    staging_writer.finish_batch()
+
                 while not reader.is_finished:
                     row_number += 1
 
@@ -274,7 +333,7 @@ class ValidationManager:
                     # formatting error if there's a problem
                     #
                     (record, reduceRow, skip_row, doneReading, rowErrorHere, flex_cols) = \
-                        self.read_record(reader, writer, row_number, job, fields, error_list)
+                        self.read_record(reader, writer, row_number, job, column_plan, error_list, flush_rows)
                     if reduceRow:
                         row_number -= 1
                     if rowErrorHere:
@@ -286,45 +345,18 @@ class ValidationManager:
                         # Do not write this row to staging, but continue processing future rows
                         continue
 
-                    #
-                    # second phase of validations: do basic schema checks
-                    # (e.g., require fields, field length, data type)
-                    #
-                    # D files are obtained from upstream systems (ASP and FPDS) that perform their own basic
-                    # validations, so these validations are not repeated here
-                    if file_type in ["award", "award_procurement"]:
-                        # Skip basic validations for D files, set as valid to trigger write to staging
-                        passed_validations = True
-                        valid = True
-                    else:
-                        if file_type in ["detached_award"]:
-                            record['afa_generated_unique'] = (record['award_modification_amendme'] or '-none-') + "_" \
-                                                             + (record['awarding_sub_tier_agency_c'] or '-none-') + \
-                                                             "_" + (record['fain'] or '-none-') + "_" + \
-                                                             (record['uri'] or '-none-')
-                        passed_validations, failures, valid = Validator.validate(record, csv_schema,
-                                                                                 file_type in ["detached_award"])
-                    if valid:
-                        # todo: update this logic later when we have actual validations
-                        if file_type in ["detached_award"]:
-                            record["is_valid"] = True
-
-                        model_instance = model(job_id=job_id, submission_id=submission_id,
-                                               valid_record=passed_validations, **record)
-                        skip_row = not insert_staging_model(model_instance, job, writer, error_list)
-                        if flex_cols:
-                            sess.add_all(flex_cols)
-                            sess.commit()
-
-                        if skip_row:
-                            error_rows.append(row_number)
-                            continue
-
-                    if not passed_validations:
-                        fatal = write_errors(failures, job, self.short_to_long_dict, writer, warning_writer,
-                                             row_number, error_list)
-                        if fatal:
-                            error_rows.append(row_number)
+                    if file_type in ["detached_award"]:
+                        record['afa_generated_unique'] = (record['award_modification_amendme'] or '-none-') + "_" + \
+                                                         (record['awarding_sub_tier_agency_c'] or '-none-') + "_" + \
+                                                         (record['fain'] or '-none-') + "_" + \
+                                                         (record['uri'] or '-none-')
+                    pending_rows.append((row_number, record, flex_cols))
+                    if len(pending_rows) >= batch_validator.BATCH_SIZE:
+                        validate_pending_rows()
+
+                # Validate the remaining rows and write unfinished staging batch
+                flush_rows()
+                error_rows.extend(staging_writer.error_rows)
 
                 loading_duration = (datetime.now()-loading_start).total_seconds()
                 logger.info(
@@ -350,7 +382,8 @@ class ValidationManager:
                 # in the schema guidance. these validations are sql-based.
                 #
                 sql_error_rows = self.run_sql_validations(job, file_type, self.short_to_long_dict, writer,
-                                                          warning_writer, row_number, error_list)
+                                                          warning_writer, row_number, error_list,
+                                                          row_rule_engine.results())
                 error_rows.extend(sql_error_rows)
 
                 # Write unfinished batch
@@ -376,8 +409,8 @@ class ValidationManager:
                     update({"reporting_start_date": min_action_date, "reporting_end_date": max_action_date},
                            synchronize_session=False)
 
-            # Ensure validated rows match initial row count
-            if file_row_count != row_number:
+            # Ensure validated rows match the number of rows read from the file
+            if reader.row_count != row_number:
                 raise ResponseException("", StatusCode.CLIENT_ERROR, None, ValidationError.rowCountError)
 
             # Update job metadata
@@ -392,6 +425,8 @@ class ValidationManager:
             if file_type in ["detached_award"]:
                 # set number of errors and warnings for detached submission
                 populate_submission_error_info(submission_id)
+                # count the rows that were just validated for the status checks
+                refresh_submission_summary(submission_id, count_fabs_rows=True)
 
             # Mark validation as finished in job tracker
             mark_job_status(job_id, "finished")
@@ -418,7 +453,8 @@ class ValidationManager:
 
         return True
 
-    def run_sql_validations(self, job, file_type, short_colnames, writer, warning_writer, row_number, error_list):
+    def run_sql_validations(self, job, file_type, short_colnames, writer, warning_writer, row_number, error_list,
+                            row_rule_results=None):
         """ Run all SQL rules for this file type
 
         Args:
@@ -429,14 +465,17 @@ class ValidationManager:
             warning_writer: CsvWriter for warnings
             row_number: Current row number
             error_list: instance of ErrorInterface to keep track of errors
+            row_rule_results: results of the rules checked by their Python twins while the file was loaded
 
         Returns:
             a list of the row numbers that failed one of the sql-based validations
         """
         job_id = job.job_id
         error_rows = []
-        sql_failures = validate_file_by_sql(job, file_type, self.short_to_long_dict)
+        profile = RuleProfile(job.submission_id, job_id, FILE_TYPE_DICT[file_type], row_number - 1)
+        sql_failures = validate_file_by_sql(job, file_type, self.short_to_long_dict, row_rule_results, profile)
         for failure in sql_failures:
+            write_start = time.perf_counter()
             # convert shorter, machine friendly column names used in the
             # SQL validation queries back to their long names
             if failure.field_name in short_colnames:
@@ -464,6 +503,9 @@ class ValidationManager:
             error_list.record_row_error(job_id, job.filename, field_name, failure.error, row_number,
                                         failure.original_label, failure.file_type_id, failure.target_file_id,
                                         failure.severity_id)
+            profile.record(profile.query_name(failure.original_label),
+                           report_duration=time.perf_counter() - write_start)
+        profile.save(GlobalDB.db().session)
         return error_rows
 
     def run_cross_validation(self, job):
@@ -481,8 +523,6 @@ class ValidationManager:
         error_list = ErrorInterface()
 
         submission_id = job.submission_id
-        bucket_name = CONFIG_BROKER['aws_bucket']
-        region_name = CONFIG_BROKER['aws_region']
         job_start = datetime.now()
         logger.info(
             {
@@ -500,7 +540,8 @@ class ValidationManager:
         # get all cross file rules from db
         cross_file_rules = sess.query(RuleSql).filter_by(rule_cross_file_flag=True)
 
-        # for each cross-file combo, run associated rules and create error report
+        # collect the rules for each cross-file combo
+        pairs = []
         for c in get_cross_file_pairs():
             first_file = c[0]
             second_file = c[1]
@@ -508,31 +549,34 @@ class ValidationManager:
                 RuleSql.file_id == first_file.id,
                 RuleSql.target_file_id == second_file.id), and_(
                 RuleSql.file_id == second_file.id,
-                RuleSql.target_file_id == first_file.id)))
-            # send comboRules to validator.crossValidate sql
-            failures = cross_validate_sql(combo_rules.all(), submission_id, self.short_to_long_dict, first_file.id,
-                                          second_file.id, job)
-            # get error file name
-            report_filename = self.get_file_name(report_file_name(submission_id, False, first_file.name,
-                                                                  second_file.name))
-            warning_report_filename = self.get_file_name(report_file_name(submission_id, True, first_file.name,
-                                                                          second_file.name))
-
-            # loop through failures to create the error report
-            with self.get_writer(region_name, bucket_name, report_filename, self.crossFileReportHeaders) as writer, \
-                    self.get_writer(region_name, bucket_name, warning_report_filename, self.crossFileReportHeaders) as \
-                    warning_writer:
-                for failure in failures:
-                    if failure[9] == RULE_SEVERITY_DICT['fatal']:
-                        writer.write(failure[0:7])
-                    if failure[9] == RULE_SEVERITY_DICT['warning']:
-                        warning_writer.write(failure[0:7])
-                    error_list.record_row_error(job_id, "cross_file",
-                                                failure[0], failure[3], failure[5], failure[6],
-                                                failure[7], failure[8], severity_id=failure[9])
-                # write the last unfinished batch
-                writer.finish_batch()
-                warning_writer.finish_batch()
+                RuleSql.target_file_id == first_file.id))).order_by(RuleSql.rule_sql_id)
+            pairs.append((first_file, second_file, combo_rules.all()))
+
+        # Profile each pair's rules against the number of rows in both of its files
+        file_rows = dict(sess.query(Job.file_type_id, Job.number_of_rows).
+                         filter_by(submission_id=submission_id, job_type_id=JOB_TYPE_DICT['csv_record_validation']))
+        profiles = [RuleProfile(submission_id, job_id, first_file.id,
+                                (file_rows.get(first_file.id) or 0) + (file_rows.get(second_file.id) or 0),
+                                second_file.id)
+                    for first_file, second_file, _ in pairs]
+
+        # The pairs share no state, so run every rule of every pair together, then build each pair's failures and
+        # write its reports, each on its own connection and with its own writers
+        rule_queries = [(rule.query_name, normalize_rule_sql(rule.rule_sql), submission_id, job_id, profile)
+                        for (_, _, rules), profile in zip(pairs, profiles) for rule in rules]
+        rule_results = iter(run_rule_queries(rule_queries, run_cross_rule))
+        pair_tasks = [(first_file, second_file, rules, [next(rule_results) for _ in rules], profile)
+                      for (first_file, second_file, rules), profile in zip(pairs, profiles)]
+        pair_failures = run_rule_queries(pair_tasks, functools.partial(self.write_cross_file_reports, submission_id))
+        for profile in profiles:
+            profile.save(sess)
+
+        # merge the failures into one error list in pair order, as if the pairs had been run one after the other
+        for failures in pair_failures:
+            for failure in failures:
+                error_list.record_row_error(job_id, "cross_file",
+                                            failure[0], failure[3], failure[5], failure[6],
+                                            failure[7], failure[8], severity_id=failure[9])
 
         # write all recorded errors to database
         error_list.write_all_row_errors(job_id)
@@ -565,6 +609,51 @@ class ValidationManager:
         # Mark validation complete
         mark_file_complete(job_id)
 
+    def write_cross_file_reports(self, submission_id, connection, first_file, second_file, rules, rule_results,
+                                 profile=None):
+        """ Build the failures for one cross-file pair and write its error and warning reports
+
+            Args:
+                submission_id: ID of the submission being validated
+                connection: connection or session used to look up flex fields for this pair
+                first_file: first file type in the pair
+                second_file: second file type in the pair
+                rules: list of RuleSql objects for this pair
+                rule_results: (columns, failed rows) for each of the rules
+                profile: RuleProfile to record the time spent building and writing each rule's failures in
+
+            Returns:
+                list of failures for this pair, as returned by cross_validate_sql
+        """
+        bucket_name = CONFIG_BROKER['aws_bucket']
+        region_name = CONFIG_BROKER['aws_region']
+
+        if profile is None:
+            profile = RuleProfile(submission_id, None, first_file.id, target_file_type_id=second_file.id)
+        failures = cross_validate_sql(rules, submission_id, self.short_to_long_dict, first_file.id, second_file.id,
+                                      None, rule_results, connection, profile)
+        # get error file name
+        report_filename = self.get_file_name(report_file_name(submission_id, False, first_file.name,
+                                                              second_file.name))
+        warning_report_filename = self.get_file_name(report_file_name(submission_id, True, first_file.name,
+                                                                      second_file.name))
+
+        # loop through failures to create the error report
+        with self.get_writer(region_name, bucket_name, report_filename, self.crossFileReportHeaders) as writer, \
+                self.get_writer(region_name, bucket_name, warning_report_filename, self.crossFileReportHeaders) as \
+                warning_writer:
+            for failure in failures:
+                write_start = time.perf_counter()
+                if failure[9] == RULE_SEVERITY_DICT['fatal']:
+                    writer.write(failure[0:7])
+                if failure[9] == RULE_SEVERITY_DICT['warning']:
+                    warning_writer.write(failure[0:7])
+                profile.record(profile.query_name(failure[6]), report_duration=time.perf_counter() - write_start)
+            # write the last unfinished batch
+            writer.finish_batch()
+            warning_writer.finish_batch()
+        return failures
+
     def validate_job(self, job_id):
         """ Gets file for job, validates each row, and sends valid rows to a staging table
         Args:
@@ -625,32 +714,6 @@ def update_tas_ids(model_class, submission_id):
     sess.commit()
 
 
-def insert_staging_model(model, job, writer, error_list):
-    """ If there is an error during ORM insertion, mark that and continue
-
-    Args:
-        model: ORM model instance for the current row
-        job: Current job
-        writer: CsvWriter object
-        error_list: instance of ErrorInterface to keep track of errors
-
-    Returns:
-        True if insertion was a success, False otherwise
-    """
-    sess = GlobalDB.db().session
-    try:
-        sess.add(model)
-        sess.commit()
-    except SQLAlchemyError:
-        sess.rollback()
-        # Write failed, move to next record
-        writer.write(["Formatting Error", ValidationError.writeErrorMsg, model.row_number, ""])
-        error_list.record_row_error(job.job_id, job.filename, "Formatting Error", ValidationError.writeError,
-                                    model.row_number, severity_id=RULE_SEVERITY_DICT['fatal'])
-        return False
-    return True
-
-
 def write_errors(failures, job, short_colnames, writer, warning_writer, row_number, error_list):
     """ Write errors to error database
 
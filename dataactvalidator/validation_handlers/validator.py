@@ -1,11 +1,22 @@
 from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal, DecimalException
 from datetime import datetime
+import hashlib
+import json
 import logging
+import re
 
+from sqlalchemy import and_, select, text
+from sqlalchemy.engine import Connection
+
+from dataactcore.config import CONFIG_BROKER
 from dataactcore.models.lookups import FIELD_TYPE_DICT_ID, FILE_TYPE_DICT_ID, FILE_TYPE_DICT, FILE_TYPE_DICT_LETTER
 from dataactcore.models.stagingModels import FlexField
 from dataactcore.models.validationModels import RuleSql
+from dataactvalidator.validation_handlers.ruleCompiler import (
+    compile_rules, mask_strings, normalize_rule_sql, strip_comments)
+from dataactvalidator.validation_handlers.ruleProfile import RuleProfile, plan_rows_scanned
 from dataactvalidator.validation_handlers.validationError import ValidationError
 from dataactcore.interfaces.db import GlobalDB
 
@@ -149,44 +160,187 @@ class Validator(object):
         raise ValueError("".join(["Data Type Error, Type: ", datatype, ", Value: ", data]))
 
 
-def cross_validate_sql(rules, submission_id, short_to_long_dict, first_file, second_file, job):
+def _is_int(data):
+    try:
+        int(data)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_decimal(data):
+    try:
+        Decimal(data)
+        return True
+    except DecimalException:
+        return False
+
+
+def _is_boolean(data):
+    return data.upper() in Validator.BOOLEAN_VALUES
+
+
+def type_checker(datatype):
+    """ Get a function that does the same check as Validator.check_type for a single, non-blank value
+
+    Args:
+        datatype: name of the type to check against
+
+    Returns:
+        function taking the stripped value and returning whether it matches the type, None if every non-blank value
+        matches
+    """
+    if datatype is None or datatype == "STRING":
+        return None
+    if datatype == "BOOLEAN":
+        return _is_boolean
+    if datatype in ("INT", "LONG"):
+        return _is_int
+    if datatype == "DECIMAL":
+        return _is_decimal
+
+    def unknown_type(data):
+        raise ValueError("".join(["Data Type Error, Type: ", datatype, ", Value: ", data]))
+    return unknown_type
+
+
+class BatchValidator(object):
+    """
+    Runs the checks of Validator.validate over a batch of records one column at a time. The schema lookups are done
+    once when the validator is built rather than for every field of every row.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, csv_schema, fabs_record=False):
+        """
+
+        args
+
+        csv_schema - dict of schema for the current file
+        fabs_record - True if length errors should be fatal, as they are for FABS records
+
+        """
+        self.csv_schema = csv_schema
+        self.fabs_record = fabs_record
+        self.length_severity = "fatal" if fabs_record else "warning"
+        self.required_fields = [field_name for field_name, schema in csv_schema.items() if schema.required]
+        self.columns = {field_name: (schema.required, type_checker(FIELD_TYPE_DICT_ID[schema.field_types_id]),
+                                     schema.length)
+                        for field_name, schema in csv_schema.items()}
+
+    def validate(self, records):
+        """ Validate a batch of records
+
+        Args:
+            records: list of dicts, each one a single record of data
+
+        Returns:
+            list with the same tuple Validator.validate returns for each record, in the same order
+        """
+        results = [None] * len(records)
+        if not records:
+            return results
+
+        # Records with the same fields as the first record are checked column by column, any other record (such as
+        # one missing a required field) is checked on its own
+        field_names = list(records[0])
+        indexes = []
+        for index, record in enumerate(records):
+            if list(record) == field_names and all(field_name in record for field_name in self.required_fields):
+                indexes.append(index)
+            else:
+                results[index] = Validator.validate(record, self.csv_schema, self.fabs_record)
+        if not indexes:
+            return results
+
+        failed_rules = {index: [] for index in indexes}
+        record_failed = set()
+        record_type_failure = set()
+        blank_fields = dict.fromkeys(indexes, 0)
+        total_fields = 0
+
+        for field_name in field_names:
+            if field_name in Validator.META_FIELDS:
+                # Skip fields that are not user submitted
+                continue
+            required, check, length = self.columns[field_name]
+            total_fields += 1
+
+            for index in indexes:
+                current_data = records[index][field_name]
+                if current_data is not None:
+                    current_data = current_data.strip()
+
+                if not current_data:
+                    blank_fields[index] += 1
+                    if required:
+                        record_failed.add(index)
+                        failed_rules[index].append(Failure(field_name, ValidationError.requiredError, "", "",
+                                                           "fatal"))
+                    continue
+
+                if check is not None and not check(current_data):
+                    record_type_failure.add(index)
+                    record_failed.add(index)
+                    failed_rules[index].append(Failure(field_name, ValidationError.typeError, current_data, "",
+                                                       "fatal"))
+                    continue
+
+                if length is not None and len(current_data) > length:
+                    record_failed.add(index)
+                    failed_rules[index].append(Failure(field_name, ValidationError.lengthError, current_data, "",
+                                                       self.length_severity))
+
+        for index in indexes:
+            if blank_fields[index] == total_fields:
+                # Empty row, don't report errors or write the line
+                results[index] = (True, failed_rules[index], False)
+            else:
+                results[index] = (index not in record_failed, failed_rules[index], index not in record_type_failure)
+        return results
+
+
+def cross_validate_sql(rules, submission_id, short_to_long_dict, first_file, second_file, job, rule_results=None,
+                       connection=None, profile=None):
     """ Evaluate all sql-based rules for cross file validation
 
     Args:
         rules -- List of Rule objects
         submission_id -- ID of submission to run cross-file validation
+        short_to_long_dict -- mapping of short to long schema column names
+        first_file -- ID of the first file type in the pair
+        second_file -- ID of the second file type in the pair
+        job -- the cross-file Job which is running, only used when the rule queries still need to be run
+        rule_results -- (columns, failed rows) for each rule if the rule queries have already been run, as returned by
+            run_cross_rule
+        connection -- connection or session used to look up flex fields, defaults to the current session. Pass the
+            worker's own connection when building failures outside of the main thread
+        profile -- RuleProfile to record the time spent looking up flex fields and building failures in
     """
-    failures = []
-    # Put each rule through evaluate, appending all failures into list
-    conn = GlobalDB.db().connection
-
-    for rule in rules:
-
-        rule_start = datetime.now()
-        logger.info(
-            {
-                'message': 'Beginning cross-file rule '+rule.query_name+' on submission_id: '+str(submission_id),
-                'message_type': 'ValidatorInfo',
-                'rule': rule.query_name,
-                'job_id': job.job_id,
-                'submission_id': submission_id,
-                'action': 'run_cross_validation_rule',
-                'status': 'start',
-                'start': rule_start})
-        failed_rows = conn.execute(
-            rule.rule_sql.format(submission_id))
-        if failed_rows.rowcount:
-            # get list of fields involved in this validation
-            # note: row_number is metadata, not a field being
-            # validated, so exclude it
-            cols = failed_rows.keys()
-            cols.remove('row_number')
-            column_string = ", ".join(short_to_long_dict[c] if c in short_to_long_dict else c for c in cols)
-
-            # materialize as we'll iterate over the failed_rows twice
-            failed_rows = list(failed_rows)
-            flex_data = relevant_cross_flex_data(failed_rows, submission_id, [first_file, second_file])
+    if profile is None:
+        profile = RuleProfile(submission_id, None, first_file, target_file_type_id=second_file)
+    profile.add_rules(rules)
+    if rule_results is None:
+        rule_queries = [(rule.query_name, normalize_rule_sql(rule.rule_sql), submission_id, job.job_id, profile)
+                        for rule in rules]
+        rule_results = run_rule_queries(rule_queries, run_cross_rule)
 
+    failures = []
+    for rule, (cols, failed_rows) in zip(rules, rule_results):
+        if not failed_rows:
+            continue
+        # get list of fields involved in this validation
+        # note: row_number is metadata, not a field being
+        # validated, so exclude it
+        cols = list(cols)
+        cols.remove('row_number')
+        column_string = ", ".join(short_to_long_dict[c] if c in short_to_long_dict else c for c in cols)
+
+        with profile.timer(rule.query_name, 'flex_duration'):
+            flex_data = relevant_cross_flex_data(failed_rows, submission_id, [first_file, second_file], connection)
+
+        with profile.timer(rule.query_name, 'report_duration'):
             for row in failed_rows:
                 # get list of values for each column
                 values = ["{}: {}".format(short_to_long_dict[c], str(row[c])) if c in short_to_long_dict else
@@ -201,34 +355,70 @@ def cross_validate_sql(rules, submission_id, short_to_long_dict, first_file, sec
                                                 FILE_TYPE_DICT_LETTER[field.file_type_id].lower(), field.cell)
 
                 target_file_type = FILE_TYPE_DICT_ID[rule.target_file_id]
-                failures.append([rule.file.name, target_file_type, full_column_string,
+                failures.append([FILE_TYPE_DICT_ID[rule.file_id], target_file_type, full_column_string,
                                 str(rule.rule_error_message), values, row['row_number'], str(rule.rule_label),
                                 rule.file_id, rule.target_file_id, rule.rule_severity_id])
 
-        rule_duration = (datetime.now()-rule_start).total_seconds()
-        logger.info(
-            {
-                'message': 'Completed cross-file rule '+rule.query_name+' on submission_id: '+str(submission_id),
-                'message_type': 'ValidatorInfo',
-                'rule': rule.query_name,
-                'job_id': job.job_id,
-                'submission_id': submission_id,
-                'action': 'run_cross_validation_rule',
-                'status': 'finish',
-                'start': rule_start,
-                'duration': rule_duration})
-
     # Return list of cross file validation failures
     return failures
 
 
-def validate_file_by_sql(job, file_type, short_to_long_dict):
+def run_cross_rule(connection, query_name, sql, submission_id, job_id, profile=None):
+    """ Run the sql for a single cross-file rule
+
+    Args:
+        connection: connection or session to run the query on
+        query_name: name of the rule, for logging
+        sql: normalized rule sql, taking the submission id as the :submission_id bind parameter
+        submission_id: ID of submission to run cross-file validation
+        job_id: ID of the cross-file job
+        profile: RuleProfile to record the rule's duration and rows in
+
+    Returns:
+        Tuple of the query's column names and the list of failed rows
+    """
+    rule_start = datetime.now()
+    logger.info(
+        {
+            'message': 'Beginning cross-file rule '+query_name+' on submission_id: '+str(submission_id),
+            'message_type': 'ValidatorInfo',
+            'rule': query_name,
+            'job_id': job_id,
+            'submission_id': submission_id,
+            'action': 'run_cross_validation_rule',
+            'status': 'start',
+            'start': rule_start})
+    failed_rows = execute_rule_sql(connection, sql, submission_id)
+    # materialize as we'll iterate over the failed_rows twice
+    cols, failed_rows = failed_rows.keys(), failed_rows.fetchall()
+
+    rule_duration = (datetime.now()-rule_start).total_seconds()
+    logger.info(
+        {
+            'message': 'Completed cross-file rule '+query_name+' on submission_id: '+str(submission_id),
+            'message_type': 'ValidatorInfo',
+            'rule': query_name,
+            'job_id': job_id,
+            'submission_id': submission_id,
+            'action': 'run_cross_validation_rule',
+            'status': 'finish',
+            'start': rule_start,
+            'duration': rule_duration})
+    if profile is not None:
+        record_rule_stats(profile, connection, query_name, sql, submission_id, rule_duration, len(failed_rows))
+    return cols, failed_rows
+
+
+def validate_file_by_sql(job, file_type, short_to_long_dict, row_rule_results=None, profile=None):
     """ Check all SQL rules
 
     Args:
         job: the Job which is running
         file_type: file type being checked
         short_to_long_dict: mapping of short to long schema column names
+        row_rule_results: dict of query_name to (column names, failed rows) for rules already checked by their Python
+            twins while the file was loaded, which aren't run again
+        profile: RuleProfile to record each rule's duration, rows and flex field lookup and failure building times in
 
     Returns:
         List of ValidationFailures
@@ -247,59 +437,83 @@ def validate_file_by_sql(job, file_type, short_to_long_dict):
             'status': 'start',
             'start_time': sql_val_start})
     sess = GlobalDB.db().session
+    submission_id = job.submission_id
+    job_id = job.job_id
+    file_type_name = job.file_type.name
 
     # Pull all SQL rules for this file type
     file_id = FILE_TYPE_DICT[file_type]
-    rules = sess.query(RuleSql).filter_by(file_id=file_id, rule_cross_file_flag=False)
+    rules = sess.query(RuleSql).filter_by(file_id=file_id, rule_cross_file_flag=False).\
+        order_by(RuleSql.rule_sql_id).all()
     errors = []
+    if profile is None:
+        profile = RuleProfile(submission_id, job_id, file_id)
+    profile.add_rules(rules)
 
-    # For each rule, execute sql for rule
-    for rule in rules:
-
+    def run_rule(connection, query_name, sql):
         rule_start = datetime.now()
         logger.info(
             {
-                'message': 'Beginning SQL validation rule ' + rule.query_name + ' on submission_id: ' +
-                str(job.submission_id) + ', job_id: ' + str(job.job_id) + ', file_type: ' + job.file_type.name,
+                'message': 'Beginning SQL validation rule ' + query_name + ' on submission_id: ' +
+                str(submission_id) + ', job_id: ' + str(job_id) + ', file_type: ' + file_type_name,
                 'message_type': 'ValidatorInfo',
-                'submission_id': job.submission_id,
-                'job_id': job.job_id,
-                'rule': rule.query_name,
-                'file_type': job.file_type.name,
+                'submission_id': submission_id,
+                'job_id': job_id,
+                'rule': query_name,
+                'file_type': file_type_name,
                 'action': 'run_sql_validation_rule',
                 'status': 'start',
                 'start_time': rule_start})
 
-        failures = sess.execute(rule.rule_sql.format(job.submission_id))
-        if failures.rowcount:
-            # Create column list (exclude row_number)
-            cols = failures.keys()
-            cols.remove("row_number")
-            col_headers = [short_to_long_dict.get(field, field) for field in cols]
-
-            # materialize as we'll iterate over the failures twice
-            failures = list(failures)
-            flex_data = relevant_flex_data(failures, job.job_id)
-
-            errors.extend(failure_row_to_tuple(rule, flex_data, cols, col_headers, file_id, failure)
-                          for failure in failures)
+        failures = execute_rule_sql(connection, sql, submission_id)
+        # materialize as we'll iterate over the failures twice
+        cols, failures = failures.keys(), failures.fetchall()
 
         rule_duration = (datetime.now() - rule_start).total_seconds()
         logger.info(
             {
-                'message': 'Completed SQL validation rule ' + rule.query_name + ' on submission_id: ' +
-                str(job.submission_id) + ', job_id: ' + str(job.job_id) + ', file_type: ' + job.file_type.name,
+                'message': 'Completed SQL validation rule ' + query_name + ' on submission_id: ' +
+                str(submission_id) + ', job_id: ' + str(job_id) + ', file_type: ' + file_type_name,
                 'message_type': 'ValidatorInfo',
-                'submission_id': job.submission_id,
-                'job_id': job.job_id,
-                'rule': rule.query_name,
-                'file_type': job.file_type.name,
+                'submission_id': submission_id,
+                'job_id': job_id,
+                'rule': query_name,
+                'file_type': file_type_name,
                 'action': 'run_sql_validation_rule',
                 'status': 'finish',
                 'start_time': rule_start,
                 'end_time': datetime.now(),
                 'duration': rule_duration
             })
+        record_rule_stats(profile, connection, query_name, sql, submission_id, rule_duration, len(failures))
+        return cols, failures
+
+    # Execute the sql for every rule, scanning the staging table once for all of the rules that only look at one row
+    # at a time, then build the failures in rule order so the result is the same however the rules were run
+    row_rule_results = row_rule_results or {}
+    queries = compile_rules([rule for rule in rules if rule.query_name not in row_rule_results])
+    results = run_rule_queries([(query.query_name, query.sql) for query in queries], run_rule)
+    rule_results = {rule: row_rule_results[rule.query_name] for rule in rules if rule.query_name in row_rule_results}
+    for query, (cols, failures) in zip(queries, results):
+        rule_results.update(zip(query.rules, query.split(cols, failures)))
+    run_queries = {query.query_name for query in queries}
+    for rule in rules:
+        cols, failures = rule_results[rule]
+        if rule.query_name not in run_queries:
+            # Rules checked in a fused query or by a Python twin have no query of their own
+            profile.record(rule.query_name, rows_returned=len(failures))
+        if failures:
+            # Create column list (exclude row_number)
+            cols = list(cols)
+            cols.remove("row_number")
+            col_headers = [short_to_long_dict.get(field, field) for field in cols]
+
+            with profile.timer(rule.query_name, 'flex_duration'):
+                flex_data = relevant_flex_data(failures, job_id, submission_id)
+
+            with profile.timer(rule.query_name, 'report_duration'):
+                errors.extend(failure_row_to_tuple(rule, flex_data, cols, col_headers, file_id, failure)
+                              for failure in failures)
 
     sql_val_duration = (datetime.now()-sql_val_start).total_seconds()
     logger.info(
@@ -319,29 +533,149 @@ def validate_file_by_sql(job, file_type, short_to_long_dict):
     return errors
 
 
-def relevant_flex_data(failures, job_id):
+def is_preparable(sql):
+    """ Whether rule sql is a single query that can be made a prepared statement, rather than a script that sets up
+    helper functions before its query """
+    statement = mask_strings(strip_comments(sql)).strip().rstrip(';')
+    return ';' not in statement and '$$' not in statement and re.match(r'(select|with)\b', statement.lstrip(),
+                                                                       re.IGNORECASE) is not None
+
+
+def positional_rule_sql(sql):
+    """ Replace the :submission_id bind parameter in rule sql without comments with the $1 a prepared statement
+    takes """
+    parts = []
+    last = 0
+    for match in re.finditer(r'(?<![:\w]):submission_id\b', mask_strings(sql)):
+        parts.extend([sql[last:match.start()], '$1'])
+        last = match.end()
+    parts.append(sql[last:])
+    return ''.join(parts)
+
+
+def execute_rule_sql(connection, sql, submission_id):
+    """ Run normalized rule sql for a submission. Single queries are prepared on the connection the first time they
+    are run and executed from then on, so Postgres parses and plans each rule once per connection rather than once per
+    submission. The prepared statements are kept as long as the pooled connection is.
+
+    Args:
+        connection: connection or session to run the query on
+        sql: normalized rule sql, taking the submission id as the :submission_id bind parameter
+        submission_id: ID of the submission to check
+
+    Returns:
+        ResultProxy of the rule's failed rows
+    """
+    if not isinstance(connection, Connection):
+        connection = connection.connection()
+    if not is_preparable(sql):
+        return connection.execute(text(sql), submission_id=submission_id)
+    return connection.execute('EXECUTE {} ({})'.format(prepare_rule_sql(connection, sql), int(submission_id)))
+
+
+def prepare_rule_sql(connection, sql):
+    """ Prepare a single query rule on a connection if it hasn't been already, returning the name it's prepared as """
+    # The info of a pooled connection lives as long as its database connection, as do its prepared statements
+    prepared = connection.info.get('prepared_rule_statements')
+    if prepared is None:
+        prepared = connection.info['prepared_rule_statements'] = {}
+    name = prepared.get(sql)
+    if name is None:
+        name = 'rule_' + hashlib.md5(sql.encode('utf-8')).hexdigest()
+        connection.execute('PREPARE {} (integer) AS {}'.format(name, positional_rule_sql(strip_comments(sql))))
+        prepared[sql] = name
+    return name
+
+
+def explain_rows_scanned(connection, sql, submission_id):
+    """ Run a rule under EXPLAIN ANALYZE and count the table rows it read
+
+    Args:
+        connection: connection or session to run the query on
+        sql: normalized rule sql, taking the submission id as the :submission_id bind parameter
+        submission_id: ID of the submission to check
+
+    Returns:
+        number of table rows the rule's plan read, or None if the rule isn't a single query
+    """
+    if not isinstance(connection, Connection):
+        connection = connection.connection()
+    if not is_preparable(sql):
+        return None
+    plan = connection.scalar('EXPLAIN (ANALYZE, FORMAT JSON) EXECUTE {} ({})'.format(
+        prepare_rule_sql(connection, sql), int(submission_id)))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan_rows_scanned(plan[0]['Plan'])
+
+
+def record_rule_stats(profile, connection, query_name, sql, submission_id, duration, rows_returned):
+    """ Record how long a rule query took and how many rows it returned, and sample how many rows it read when the
+    profile calls for it """
+    profile.record(query_name, duration=duration, rows_returned=rows_returned)
+    if profile.should_explain():
+        rows_scanned = explain_rows_scanned(connection, sql, submission_id)
+        if rows_scanned is not None:
+            profile.record(query_name, rows_scanned=rows_scanned)
+
+
+def run_rule_queries(rule_queries, run_rule, max_workers=None):
+    """ Run each rule query, several at once when the validator is configured to use more than one worker
+
+    Args:
+        rule_queries: list of argument tuples, one per rule
+        run_rule: function called as run_rule(connection, *args) for each rule, returning its result
+        max_workers: number of rules to run at once, each on its own connection from the engine's pool. Defaults to
+            the validator_rule_workers config value; rules run one at a time on the current connection if it is 1
+
+    Returns:
+        list of the results of run_rule, in the same order as rule_queries
+    """
+    if max_workers is None:
+        max_workers = CONFIG_BROKER.get('validator_rule_workers') or 1
+
+    db = GlobalDB.db()
+    if max_workers <= 1 or len(rule_queries) <= 1:
+        return [run_rule(db.session, *args) for args in rule_queries]
+
+    engine = db.engine
+
+    def run_on_own_connection(args):
+        with engine.connect() as connection:
+            return run_rule(connection, *args)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map hands back results in submission order regardless of which rules finish first
+        return list(executor.map(run_on_own_connection, rule_queries))
+
+
+def relevant_flex_data(failures, job_id, submission_id):
     """Create a dictionary mapping row numbers of failures to lists of
-    FlexFields"""
+    FlexFields. Filtering by submission keeps the lookup to the submission's partition of the flex_field table"""
     sess = GlobalDB.db().session
     flex_data = defaultdict(list)
     relevant_rows = {f['row_number'] for f in failures}
-    query = sess.query(FlexField).filter(FlexField.row_number.in_(relevant_rows), FlexField.job_id == job_id).\
+    query = sess.query(FlexField).filter(FlexField.row_number.in_(relevant_rows), FlexField.job_id == job_id,
+                                         FlexField.submission_id == submission_id).\
         order_by(FlexField.flex_field_id)
     for flex_field in query:
         flex_data[flex_field.row_number].append(flex_field)
     return flex_data
 
 
-def relevant_cross_flex_data(failed_rows, submission_id, files):
-    """Create a dictionary mapping row numbers of cross-file failures to lists of FlexFields"""
-    sess = GlobalDB.db().session
+def relevant_cross_flex_data(failed_rows, submission_id, files, connection=None):
+    """Create a dictionary mapping row numbers of cross-file failures to lists of FlexField rows. The lookup runs on
+    the given connection (or session), defaulting to the current session"""
+    if connection is None:
+        connection = GlobalDB.db().session
     flex_data = defaultdict(list)
     relevant_rows = {f['row_number'] for f in failed_rows}
-    query = sess.query(FlexField).filter(FlexField.row_number.in_(relevant_rows),
-                                         FlexField.submission_id == submission_id,
-                                         FlexField.file_type_id.in_(files)). \
-        order_by(FlexField.flex_field_id)
-    for flex_field in query:
+    flex_table = FlexField.__table__
+    query = select([flex_table]).where(and_(flex_table.c.row_number.in_(relevant_rows),
+                                            flex_table.c.submission_id == submission_id,
+                                            flex_table.c.file_type_id.in_(files))). \
+        order_by(flex_table.c.flex_field_id)
+    for flex_field in connection.execute(query):
         flex_data[flex_field.row_number].append(flex_field)
     return flex_data
 
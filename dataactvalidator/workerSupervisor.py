@@ -0,0 +1,81 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+from dataactcore.interfaces.db import dispose_engines
+
+logger = logging.getLogger(__name__)
+
+
+def run_worker_process(target, stop_event):
+    """ Entry point of each worker process. The supervisor handles interrupts and tells the worker to stop with
+        stop_event, and a worker sent SIGTERM directly also finishes its current job before stopping. """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    # Connections inherited from the supervisor can't be shared between processes
+    dispose_engines()
+    target(stop_event)
+
+
+class WorkerSupervisor:
+    """ Runs a number of worker processes, replacing any that exit unexpectedly, until told to stop by SIGTERM or
+        SIGINT. Stopping sets the workers' stop event so they can finish their current work, and any worker that
+        hasn't stopped within shutdown_timeout seconds is killed. """
+
+    # Seconds between checks that every worker is still running
+    CHECK_INTERVAL = 5
+    SHUTDOWN_TIMEOUT = 600
+
+    def __init__(self, target, worker_count, shutdown_timeout=None):
+        """
+
+        args
+
+        target - function each worker runs, called with the event set when it should stop
+        worker_count - number of workers to run at once
+        shutdown_timeout - seconds to wait for workers to finish when stopping, defaults to SHUTDOWN_TIMEOUT
+
+        """
+        self.target = target
+        self.worker_count = max(1, worker_count)
+        self.shutdown_timeout = shutdown_timeout if shutdown_timeout is not None else self.SHUTDOWN_TIMEOUT
+        self.stop_event = multiprocessing.Event()
+        self.workers = []
+
+    def start_worker(self):
+        worker = multiprocessing.Process(target=run_worker_process, args=(self.target, self.stop_event))
+        worker.start()
+        logger.info('Started worker process %s', worker.pid)
+        return worker
+
+    def stop(self, signum=None, frame=None):
+        """ Tell the workers to stop once their current work is done """
+        if not self.stop_event.is_set():
+            logger.info('Stopping %s worker processes', len(self.workers))
+        self.stop_event.set()
+
+    def run(self):
+        """ Start the workers and keep them running until stopped, then wait for them to finish """
+        previous_handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            self.workers = [self.start_worker() for _ in range(self.worker_count)]
+            while not self.stop_event.wait(self.CHECK_INTERVAL):
+                for i, worker in enumerate(self.workers):
+                    if not worker.is_alive() and not self.stop_event.is_set():
+                        logger.error('Worker process %s exited with code %s, starting a new one', worker.pid,
+                                     worker.exitcode)
+                        self.workers[i] = self.start_worker()
+
+            deadline = time.time() + self.shutdown_timeout
+            for worker in self.workers:
+                worker.join(max(0, deadline - time.time()))
+                if worker.is_alive():
+                    # Workers handle SIGTERM by stopping after their current work, so it has to be SIGKILL
+                    logger.warning('Worker process %s did not stop in time, killing it', worker.pid)
+                    os.kill(worker.pid, signal.SIGKILL)
+                    worker.join()
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
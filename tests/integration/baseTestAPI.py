@@ -5,7 +5,7 @@ from flask_bcrypt import Bcrypt
 from webtest import TestApp
 
 from dataactbroker.app import create_app as create_broker_app
-from dataactcore.interfaces.db import GlobalDB
+from dataactcore.interfaces.db import GlobalDB, dispose_engines
 from dataactcore.interfaces.function_bag import create_user_with_password, get_password_hash
 from dataactcore.models.domainModels import CGAC
 from dataactcore.models.userModel import User, UserAffiliation
@@ -114,6 +114,7 @@ class BaseTestAPI(unittest.TestCase):
     def tearDownClass(cls):
         """Tear down class-level resources."""
         GlobalDB.close()
+        dispose_engines()
         drop_database(CONFIG_DB['db_name'])
 
     def tearDown(self):
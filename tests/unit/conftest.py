@@ -8,7 +8,7 @@ import dataactcore.config
 from dataactcore.models import baseModel
 from dataactcore.scripts import setupJobTrackerDB, setupUserDB
 from dataactcore.scripts.databaseSetup import create_database, drop_database, run_migrations
-from dataactcore.interfaces.db import GlobalDB
+from dataactcore.interfaces.db import GlobalDB, dispose_engines
 
 
 @pytest.fixture(scope='session')
@@ -30,6 +30,7 @@ def full_database_setup():
     yield (db, list(reversed(creation_order)))  # drop order
 
     GlobalDB.close()
+    dispose_engines()
     drop_database(config['db_name'])
 
 
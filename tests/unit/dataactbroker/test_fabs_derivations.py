@@ -1,10 +1,12 @@
-from dataactbroker.handlers.fileHandler import fabs_derivations
+from dataactbroker.handlers.fileHandler import fabs_derivations, publish_fabs_rows
+from dataactcore.models.stagingModels import PublishedAwardFinancialAssistance
 
 from tests.unit.dataactcore.factories.domain import (
     CGACFactory, FRECFactory, SubTierAgencyFactory, StatesFactory, CountyCodeFactory, CFDAProgramFactory,
-    ZipCityFactory, ZipsFactory, CityCodeFactory, CountryCodeFactory)
+    ZipCityFactory, ZipRangeFactory, CityCodeFactory, CountryCodeFactory)
 
-from tests.unit.dataactcore.factories.staging import FPDSContractingOfficeFactory
+from tests.unit.dataactcore.factories.staging import (
+    DetachedAwardFinancialAssistanceFactory, FPDSContractingOfficeFactory, PublishedAwardFinancialAssistanceFactory)
 
 
 def initialize_db_values(db, cfda_title=None, cgac_code=None, frec_code=None, use_frec=False):
@@ -24,14 +26,14 @@ def initialize_db_values(db, cfda_title=None, cgac_code=None, frec_code=None, us
     sub_tier = SubTierAgencyFactory(sub_tier_agency_code="1234", cgac=cgac, frec=frec, is_frec=use_frec,
                                     sub_tier_agency_name="Test Subtier Agency")
     state = StatesFactory(state_code="NY", state_name="New York")
-    zip_code_1 = ZipsFactory(zip5="12345", zip_last4="6789", state_abbreviation=state.state_code, county_number="001",
-                             congressional_district_no="01")
-    zip_code_2 = ZipsFactory(zip5="12345", zip_last4="4321", state_abbreviation=state.state_code, county_number="001",
-                             congressional_district_no="02")
-    zip_code_3 = ZipsFactory(zip5="54321", zip_last4="4321", state_abbreviation=state.state_code, county_number="001",
-                             congressional_district_no="05")
-    zip_code_4 = ZipsFactory(zip5="98765", zip_last4="4321", state_abbreviation=state.state_code, county_number="001",
-                             congressional_district_no=None)
+    zip_code_1 = ZipRangeFactory(zip5="12345", zip4_low="6789", zip4_high="6789", state_abbreviation=state.state_code,
+                                 county_number="001", congressional_district_no="01")
+    zip_code_2 = ZipRangeFactory(zip5="12345", zip4_low="4321", zip4_high="4321", state_abbreviation=state.state_code,
+                                 county_number="001", congressional_district_no="02")
+    zip_code_3 = ZipRangeFactory(zip5="54321", zip4_low="4321", zip4_high="4321", state_abbreviation=state.state_code,
+                                 county_number="001", congressional_district_no="05")
+    zip_code_4 = ZipRangeFactory(zip5="98765", zip4_low="4321", zip4_high="4321", state_abbreviation=state.state_code,
+                                 county_number="001", congressional_district_no=None)
     zip_city = ZipCityFactory(zip_code=zip_code_1.zip5, city_name="Test Zip City")
     zip_city_2 = ZipCityFactory(zip_code=zip_code_3.zip5, city_name="Test Zip City 2")
     zip_city_3 = ZipCityFactory(zip_code=zip_code_4.zip5, city_name="Test Zip City 3")
@@ -324,3 +326,35 @@ def test_is_active(database):
     obj = initialize_test_obj(cldi="D")
     obj = fabs_derivations(obj, database.session)
     assert obj['is_active'] is False
+
+
+def test_publish_fabs_rows(database):
+    """ Valid rows are published with their derivations and corrections deactivate the rows they replace """
+    initialize_db_values(database, cfda_title="Test CFDA", cgac_code="000")
+    sess = database.session
+    old_row = PublishedAwardFinancialAssistanceFactory(afa_generated_unique='A', is_active=True)
+    other_row = PublishedAwardFinancialAssistanceFactory(afa_generated_unique='C', is_active=True)
+    sess.add_all([old_row, other_row])
+    sess.commit()
+
+    values = initialize_test_obj(cfda_num="12.345")
+    del values['legal_entity_city_name'], values['legal_entity_state_code']
+    sess.add_all([
+        DetachedAwardFinancialAssistanceFactory(submission_id=1, afa_generated_unique='A',
+                                                **dict(values, correction_late_delete_ind='c')),
+        DetachedAwardFinancialAssistanceFactory(submission_id=1, afa_generated_unique='B', **values),
+        DetachedAwardFinancialAssistanceFactory(submission_id=1, afa_generated_unique='C', is_valid=False, **values),
+        DetachedAwardFinancialAssistanceFactory(submission_id=2, afa_generated_unique='D', **values)
+    ])
+    sess.commit()
+
+    assert publish_fabs_rows(sess, 1) == ['000']
+    sess.commit()
+
+    published = sess.query(PublishedAwardFinancialAssistance).\
+        order_by(PublishedAwardFinancialAssistance.published_award_financial_assistance_id).all()
+    assert [(row.afa_generated_unique, row.is_active) for row in published] == [
+        ('A', False), ('C', True), ('A', True), ('B', True)]
+    assert published[2].cfda_title == "Test CFDA"
+    assert published[3].awarding_sub_tier_agency_n == "Test Subtier Agency"
+    assert published[3].place_of_perform_state_nam == "New York"
@@ -1,9 +1,13 @@
 from collections import OrderedDict
 import csv
+import io
+import logging
 import os
 import re
 from unittest.mock import Mock
 
+import pytest
+
 from dataactcore.models.jobModels import FileType, JobStatus, JobType
 from dataactcore.models.stagingModels import DetachedAwardProcurement, PublishedAwardFinancialAssistance
 from dataactcore.utils import fileE
@@ -107,6 +111,48 @@ def test_generate_d2_file_query(monkeypatch, mock_broker_config_paths, database,
     assert file_rows[2] == expected2
 
 
+@pytest.mark.parametrize('file_type, model, file_type_name, unique_column, extra', [
+    ('D1', DetachedAwardProcurementFactory, 'award_procurement', 'piid', {}),
+    ('D2', PublishedAwardFinancialAssistanceFactory, 'award', 'fain', {'is_active': True})
+])
+def test_generate_d_file_batches(monkeypatch, mock_broker_config_paths, database, job_constants, caplog, file_type,
+                                 model, file_type_name, unique_column, extra):
+    """Rows streamed in several batches are each written once, in the order the query returns them"""
+    monkeypatch.setattr(fileGenerationHandler, 'QUERY_SIZE', 2)
+    sess = database.session
+    records = [model(awarding_agency_code='123', action_date='201701{:02}'.format(day), **extra)
+               for day in range(1, 8)]
+    records.append(model(awarding_agency_code='234', action_date='20170115', **extra))
+    sess.add_all(records)
+
+    jf = JobFactory(
+        job_status=sess.query(JobStatus).filter_by(name='running').one(),
+        job_type=sess.query(JobType).filter_by(name='file_upload').one(),
+        file_type=sess.query(FileType).filter_by(name=file_type_name).one(),
+    )
+    sess.add(jf)
+    sess.commit()
+
+    file_utils = fileGenerationHandler.fileD1 if file_type == 'D1' else fileGenerationHandler.fileD2
+    # the rows a single unbatched run of the query returns, as they'd be read back from the CSV
+    query_rows = file_utils.query_data(sess, '123', '01/01/2017', '01/31/2017').all()
+    expected = io.StringIO()
+    csv.writer(expected, lineterminator='\n').writerows(query_rows)
+
+    caplog.set_level(logging.DEBUG, logger=fileGenerationHandler.logger.name)
+    fileGenerationHandler.generate_d_file(file_type, '123', '01/01/2017', '01/31/2017', jf.job_id, 'd', 'd',
+                                          is_local=True)
+
+    file_rows = read_file_rows(str(mock_broker_config_paths['d_file_storage_path'].join('d')))
+    assert file_rows[1:] == list(csv.reader(io.StringIO(expected.getvalue())))
+    column = list(file_utils.mapping).index(unique_column)
+    expected_values = [getattr(record, unique_column) for record in records[:7]]
+    assert sorted(row[column] for row in file_rows[1:]) == sorted(expected_values)
+    batches = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Writing rows')]
+    assert batches == ['Writing rows {}-{} to {} CSV'.format(start, min(start + 2, 7), file_type)
+                       for start in range(0, 7, 2)]
+
+
 def test_generate_f_file(monkeypatch, mock_broker_config_paths):
     """A CSV with fields in the right order should be written to the file system"""
     file_f_mock = Mock()
@@ -1,10 +1,16 @@
-import xmltodict
+from http.server import BaseHTTPRequestHandler, HTTPServer
 import os
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import xmltodict
 
 from dataactcore.config import CONFIG_BROKER
 from dataactcore.models.domainModels import SubTierAgency, CGAC
+from dataactcore.models.stagingModels import DetachedAwardProcurement
 
 from dataactcore.scripts import pullFPDSData
+from tests.unit.dataactcore.factories.staging import DetachedAwardProcurementFactory
 
 
 def test_list_data():
@@ -30,14 +36,14 @@ def test_calculate_remaining_fields(database):
     database.session.add(cgac)
     database.session.add(sub_tier)
     database.session.commit()
+    sub_tier_list = pullFPDSData.load_sub_tiers(database.session)
+    assert sub_tier_list == {'0000': pullFPDSData.SubTier('1700', 'test name', None)}
 
     tmp_obj = pullFPDSData.calculate_remaining_fields({'awarding_sub_tier_agency_c': "0000",
-                                                       'funding_sub_tier_agency_co': None},
-                                                      {sub_tier.sub_tier_agency_code: sub_tier})
+                                                       'funding_sub_tier_agency_co': None}, sub_tier_list)
     tmp_obj_2 = pullFPDSData.calculate_remaining_fields({'awarding_sub_tier_agency_c': None,
                                                          'funding_sub_tier_agency_co': "0001",
-                                                         'funding_sub_tier_agency_na': "Not Real"},
-                                                        {sub_tier.sub_tier_agency_code: sub_tier})
+                                                         'funding_sub_tier_agency_na': "Not Real"}, sub_tier_list)
     assert tmp_obj['awarding_agency_code'] == '1700'
     assert tmp_obj['awarding_agency_name'] == 'test name'
     assert tmp_obj_2['funding_agency_code'] == '999'
@@ -68,3 +74,117 @@ def test_process_data(database):
     assert tmp_obj_idv['idv_type'] == 'B'
     assert tmp_obj_idv['idv_type_description'] == 'IDC'
     assert tmp_obj_idv['referenced_idv_type'] is None
+
+
+class FeedStubHandler(BaseHTTPRequestHandler):
+    """ Serves a feed of numbered copies of the recorded award entry, failing the first request for each page in
+        failing_starts """
+    entry_count = 23
+    failing_starts = set()
+    requested_starts = []
+
+    def do_GET(self):  # noqa
+        start = int(parse_qs(urlparse(self.path).query)['start'][0])
+        self.requested_starts.append(start)
+        if start in self.failing_starts:
+            self.failing_starts.discard(start)
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        with open(os.path.join(CONFIG_BROKER['path'], 'tests', 'unit', 'data', 'fpdsXML.txt')) as f:
+            recorded = f.read()
+        header = recorded[:recorded.index('<entry>')]
+        entry = recorded[recorded.index('<entry>'):recorded.index('</entry>') + len('</entry>')]
+        entries = [entry.replace('<ns1:PIID>0001</ns1:PIID>', '<ns1:PIID>{:04}</ns1:PIID>'.format(i), 1)
+                   for i in range(start, min(start + 10, self.entry_count))]
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write((header + ''.join(entries) + '</feed>').encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_pull_feed(monkeypatch):
+    """ Test that pull_feed reads every page of a feed, retrying failed requests, and writes the processed entries in
+        feed order """
+    monkeypatch.setattr(pullFPDSData, 'FEED_REQUESTS', 3)
+    monkeypatch.setattr(pullFPDSData, 'FEED_LOOKAHEAD', 4)
+    monkeypatch.setattr(pullFPDSData, 'WRITE_BATCH_SIZE', 15)
+    monkeypatch.setattr(pullFPDSData, 'RETRY_SLEEP_TIMES', [0])
+    monkeypatch.setattr(FeedStubHandler, 'failing_starts', {10})
+    monkeypatch.setattr(FeedStubHandler, 'requested_starts', [])
+
+    server = HTTPServer(('localhost', 0), FeedStubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        written = []
+
+        def process_entries(entries):
+            return [pullFPDSData.process_data(entry['content']['award'], atom_type='award', sub_tier_list={})['piid']
+                    for entry in entries]
+
+        total = pullFPDSData.pull_feed('http://localhost:{}/feed?q=test'.format(server.server_port), process_entries,
+                                       lambda data: written.append(list(data)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert total == 23
+    assert written == [['{:04}'.format(i) for i in range(20)], ['{:04}'.format(i) for i in range(20, 23)]]
+    assert FeedStubHandler.requested_starts.count(10) == 2
+    # pages past the end of the feed are requested no further ahead than the lookahead
+    assert max(FeedStubHandler.requested_starts) <= 20 + 10 * 3
+
+
+def test_upsert_processed_data_list(database, monkeypatch):
+    """ Test that upsert_processed_data_list adds new entries and replaces existing ones, keeping the last copy of an
+        entry listed more than once """
+    monkeypatch.setattr(pullFPDSData, 'MAX_STATEMENT_PARAMS', 4)
+    sess = database.session
+    sess.add(DetachedAwardProcurementFactory(detached_award_proc_unique='existing', piid='old', agency_id='1'))
+    sess.commit()
+
+    pullFPDSData.upsert_processed_data_list([
+        {'detached_award_proc_unique': 'existing', 'piid': 'first'},
+        {'detached_award_proc_unique': 'new_1', 'piid': 'new_1', 'agency_id': '2'},
+        {'detached_award_proc_unique': 'new_2', 'piid': 'new_2'},
+        {'detached_award_proc_unique': 'new_3', 'piid': 'new_3'},
+        {'detached_award_proc_unique': 'existing', 'piid': 'last'}
+    ], sess)
+    sess.commit()
+
+    rows = {row.detached_award_proc_unique: row for row in sess.query(DetachedAwardProcurement)}
+    assert sorted(rows) == ['existing', 'new_1', 'new_2', 'new_3']
+    assert rows['existing'].piid == 'last'
+    # columns that weren't given are left alone
+    assert rows['existing'].agency_id == '1'
+    assert rows['new_1'].agency_id == '2'
+
+
+def test_delete_processed_data_list(database):
+    """ Test that delete_processed_data_list deletes entries that haven't been modified since they were deleted """
+    sess = database.session
+    sess.add_all([
+        DetachedAwardProcurementFactory(detached_award_proc_unique='deleted', last_modified='2017-01-01 00:00:00'),
+        DetachedAwardProcurementFactory(detached_award_proc_unique='modified', last_modified='2017-03-01 00:00:00'),
+        DetachedAwardProcurementFactory(detached_award_proc_unique='twice', last_modified='2017-02-01 00:00:00'),
+        DetachedAwardProcurementFactory(detached_award_proc_unique='kept', last_modified='2017-01-01 00:00:00')
+    ])
+    sess.commit()
+
+    deleted = pullFPDSData.delete_processed_data_list([
+        ('2017-02-01 00:00:00', 'deleted'),
+        ('2017-02-01 00:00:00', 'modified'),
+        ('2017-01-15 00:00:00', 'twice'),
+        ('2017-02-15 00:00:00', 'twice'),
+        ('2017-02-01 00:00:00', 'missing')
+    ], sess)
+    sess.commit()
+
+    assert deleted == 2
+    remaining = {row.detached_award_proc_unique for row in sess.query(DetachedAwardProcurement)}
+    assert remaining == {'modified', 'kept'}
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+from json import dumps
+from unittest.mock import Mock
+
+from flask import Flask
+
+from dataactbroker.handlers.aws import session as session_module
+from dataactbroker.handlers.aws.session import (SessionCache, SessionTable, StoredSession, UserSession,
+                                                UserSessionInterface, to_unix_time)
+
+
+def stored_session(data, expires_in):
+    return StoredSession(dumps(data), to_unix_time(datetime.utcnow() + timedelta(seconds=expires_in)))
+
+
+def make_session(data, stored=None):
+    session = UserSession()
+    session.update(data)
+    if stored is not None:
+        session.stored_session = stored
+    return session
+
+
+def test_session_cache_ttl(monkeypatch):
+    """ Cached sessions are dropped once they've been cached for longer than the TTL """
+    now = [1000.0]
+    monkeypatch.setattr(session_module.time, 'time', lambda: now[0])
+    cache = SessionCache(ttl=30)
+    cache.set('abc', StoredSession('{}', 5000))
+    assert cache.get('abc') == StoredSession('{}', 5000)
+    now[0] += 31
+    assert cache.get('abc') is None
+
+
+def test_session_cache_remove_expired():
+    cache = SessionCache(ttl=30)
+    cache.set('old', StoredSession('{}', 100))
+    cache.set('new', StoredSession('{}', 300))
+    cache.remove_expired(200)
+    assert cache.get('old') is None
+    assert cache.get('new') is not None
+
+
+def test_open_session(monkeypatch):
+    """ A live stored session is loaded, an expired or missing one is replaced with a new session """
+    stored = {'abc': stored_session({'sid': 'abc', 'name': 1}, 60), 'old': stored_session({'sid': 'old'}, -60)}
+    get_session = Mock(side_effect=lambda uid, use_cache: stored.get(uid))
+    monkeypatch.setattr(SessionTable, 'get_session', get_session)
+    interface = UserSessionInterface()
+    app = Flask(__name__)
+    monkeypatch.setattr(interface, 'start_sweeper', Mock())
+
+    session = interface.open_session(app, Mock(headers={'x-session-id': 'abc'}, path='/v1/list_submissions/'))
+    assert session == {'sid': 'abc', 'name': 1}
+    assert session.stored_session == stored['abc']
+    assert get_session.call_args[1] == {'use_cache': False}
+
+    # Only session checks may use a cached session
+    interface.open_session(app, Mock(headers={'x-session-id': 'abc'}, path='/v1/session/'))
+    assert get_session.call_args[1] == {'use_cache': True}
+
+    for sid in ('old', 'missing'):
+        session = interface.open_session(app, Mock(headers={'x-session-id': sid}, path='/v1/session/'))
+        assert list(session.keys()) == ['sid']
+        assert session['sid'] not in stored
+
+
+def test_save_session_only_writes_changes(monkeypatch):
+    """ Sessions are only written back when their data changes or their expiration needs extending """
+    data = {'sid': 'abc', '_uid': 'uid', 'name': 1}
+    new_session = Mock()
+    monkeypatch.setattr(SessionTable, 'new_session', new_session)
+    interface = UserSessionInterface()
+    app = Flask(__name__)
+
+    # Unchanged and recently extended
+    stored = stored_session(data, SessionTable.TIME_OUT_LIMIT)
+    response = Mock(headers={})
+    interface.save_session(app, make_session(data, stored), response)
+    assert not new_session.called
+    assert response.headers['x-session-id'] == 'abc'
+
+    # Changed, only written over the session as it was read
+    interface.save_session(app, make_session(dict(data, _uid='other'), stored), Mock(headers={}))
+    assert new_session.call_count == 1
+    assert new_session.call_args[0][1] == dict(data, _uid='other')
+    assert new_session.call_args[1] == {'previous': stored}
+
+    # Unchanged, but last extended over an hour ago
+    stored = stored_session(data, SessionTable.TIME_OUT_LIMIT - 3601)
+    interface.save_session(app, make_session(data, stored), Mock(headers={}))
+    assert new_session.call_count == 2
+    expiration = new_session.call_args[0][2]
+    assert abs(expiration - to_unix_time(datetime.utcnow()) - SessionTable.TIME_OUT_LIMIT) < 5
+
+    # New session
+    interface.save_session(app, make_session(data), Mock(headers={}))
+    assert new_session.call_count == 3
+    assert new_session.call_args[1] == {}
+
+
+def test_save_session_login_change(monkeypatch):
+    """ Logging in or out is always written, and the process's cached copy of the session is dropped """
+    data = {'sid': 'abc', '_uid': 'uid', 'name': 1, 'login': True}
+    stored = stored_session(data, SessionTable.TIME_OUT_LIMIT)
+    new_session = Mock()
+    monkeypatch.setattr(SessionTable, 'new_session', new_session)
+    SessionTable.cache.set('abc', stored)
+
+    UserSessionInterface().save_session(Flask(__name__), make_session({'sid': 'abc', '_uid': 'uid'}, stored),
+                                        Mock(headers={}))
+    assert new_session.call_args[0][1] == {'sid': 'abc', '_uid': 'uid'}
+    assert new_session.call_args[1] == {}
+    assert SessionTable.cache.get('abc') is None
+
+
+def test_new_session_conditional(monkeypatch):
+    """ A session that changed in the table since it was read isn't overwritten, and is dropped from the cache """
+    query = Mock()
+    query.filter_by.return_value = query
+    query.update.return_value = 0
+    sess = Mock()
+    sess.query.return_value = query
+    monkeypatch.setattr(session_module.GlobalDB, 'db', lambda: Mock(session=sess))
+    previous = StoredSession('{"sid": "abc", "login": true}', 1000)
+    SessionTable.cache.set('abc', previous)
+
+    assert not SessionTable.new_session('abc', {'sid': 'abc', 'login': True, 'session_check': False}, 1000.5,
+                                        previous=previous)
+    assert query.filter_by.call_args[1] == {'data': previous.data, 'expiration': 1000}
+    assert not sess.add.called
+    assert SessionTable.cache.get('abc') is None
+
+
+def test_save_session_check_keeps_expiration(monkeypatch):
+    """ Session checks don't extend the session """
+    data = {'sid': 'abc', '_uid': 'uid', 'session_check': False}
+    stored = stored_session(data, 60)
+    new_session = Mock()
+    monkeypatch.setattr(SessionTable, 'new_session', new_session)
+
+    UserSessionInterface().save_session(Flask(__name__), make_session(dict(data, session_check=True), stored),
+                                        Mock(headers={}))
+    assert not new_session.called
@@ -131,13 +131,14 @@ class CFDAProgramFactory(factory.Factory):
     archived_date = fuzzy.FuzzyText()
 
 
-class ZipsFactory(factory.Factory):
+class ZipRangeFactory(factory.Factory):
     class Meta:
-        model = domainModels.Zips
+        model = domainModels.ZipRange
 
-    zips_id = None
+    zip_range_id = None
     zip5 = fuzzy.FuzzyText()
-    zip_last4 = fuzzy.FuzzyText()
+    zip4_low = None
+    zip4_high = None
     state_abbreviation = fuzzy.FuzzyText()
     county_number = fuzzy.FuzzyText()
     congressional_district_no = fuzzy.FuzzyText()
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+from dataactcore.aws.sqsHandler import SQSMockQueue, VisibilityHeartbeat
+from dataactcore.models.jobModels import SQS
+
+
+def test_mock_queue_hides_received_messages(database):
+    """ Each received message is hidden from other receivers until its visibility runs out or it's deleted """
+    sess = database.session
+    SQSMockQueue.send_message('1')
+    SQSMockQueue.send_message('2')
+
+    first = SQSMockQueue.receive_messages(WaitTimeSeconds=0)
+    second = SQSMockQueue.receive_messages(WaitTimeSeconds=0)
+    assert [message.body for message in first] == [1]
+    assert [message.body for message in second] == [2]
+    assert SQSMockQueue.receive_messages(WaitTimeSeconds=0) == []
+
+    # Making a message visible again lets it be received again, deleting it removes it for good
+    first[0].change_visibility(VisibilityTimeout=0)
+    second[0].delete()
+    assert [message.body for message in SQSMockQueue.receive_messages(WaitTimeSeconds=0, MaxNumberOfMessages=10)] == [1]
+    assert sess.query(SQS).count() == 1
+
+
+def test_mock_queue_receives_expired_messages(database):
+    """ Messages whose visibility timeout has run out can be received by another worker """
+    sess = database.session
+    sess.add(SQS(job_id=3, hidden_until=datetime.utcnow() - timedelta(seconds=1)))
+    sess.commit()
+    assert [message.body for message in SQSMockQueue.receive_messages(WaitTimeSeconds=0)] == [3]
+
+
+def test_visibility_heartbeat():
+    """ The heartbeat keeps extending the message's visibility until stopped, carrying on after failures """
+    message = Mock(body='1')
+    message.change_visibility.side_effect = [Exception('Throttled'), None, None, None, None, None]
+    heartbeat = VisibilityHeartbeat(message, 60, interval=0.01)
+    heartbeat.start()
+    while message.change_visibility.call_count < 3:
+        heartbeat.stopped.wait(0.01)
+    heartbeat.stop()
+
+    calls = message.change_visibility.call_count
+    assert not heartbeat.is_alive()
+    message.change_visibility.assert_called_with(VisibilityTimeout=60)
+    heartbeat.stopped.wait(0.05)
+    assert message.change_visibility.call_count == calls
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+import pytest
+import sqlalchemy
+from sqlalchemy.pool import QueuePool
+
+from dataactcore.interfaces import db
+
+
+def make_engine(tmpdir, pre_ping=True):
+    engine = sqlalchemy.create_engine('sqlite:///{}'.format(tmpdir.join('pool.db')), poolclass=QueuePool,
+                                      pool_size=1, max_overflow=1)
+    db.instrument_engine(engine, pre_ping=pre_ping)
+    return engine
+
+
+def test_pool_status_counts_checkouts(tmpdir):
+    """ Checkouts beyond the pool size are counted as overflow """
+    engine = make_engine(tmpdir)
+    first = engine.connect()
+    second = engine.connect()
+
+    status = db.pool_status(engine)
+    assert status['size'] == 1
+    assert status['checkedout'] == 2
+    assert status['overflow'] == 1
+    assert status['checkouts'] == 2
+    assert status['overflow_checkouts'] == 1
+    assert status['connects'] == 2
+
+    first.close()
+    second.close()
+    # The connection within the pool's size is kept for the next checkout
+    engine.connect().close()
+    status = db.pool_status(engine)
+    assert status['checkedout'] == 0
+    assert status['checkouts'] == 3
+    assert status['connects'] == 2
+
+
+def test_pre_ping_replaces_dropped_connections(tmpdir):
+    """ A pooled connection the database has dropped is replaced when it's checked out """
+    engine = make_engine(tmpdir)
+    engine.connect().close()
+    # Drop the pooled DBAPI connection behind the pool's back
+    engine.pool._pool.queue[0].connection.close()
+
+    with patch.object(engine.dialect, 'is_disconnect', return_value=True), engine.connect() as connection:
+        assert connection.scalar(sqlalchemy.select([1])) == 1
+    status = db.pool_status(engine)
+    assert status['invalidations'] == 1
+    assert status['connects'] == 2
+
+
+def test_get_engine_reuses_engine():
+    """ Each database gets one engine per process, until the engines are disposed """
+    create_engine = sqlalchemy.create_engine
+
+    def create_queue_pool_engine(uri, **kwargs):
+        return create_engine(uri, poolclass=QueuePool, **kwargs)
+
+    with patch.object(db, '_engines', {}), patch.object(db, 'CONFIG_DB', {'pool_size': 3, 'max_overflow': 2}), \
+            patch.object(db.sqlalchemy, 'create_engine', create_queue_pool_engine):
+        engine = db.get_engine('sqlite://')
+        assert db.get_engine('sqlite://') is engine
+        assert db.pool_status(engine)['size'] == 3
+
+        db.dispose_engines()
+        assert db.get_engine('sqlite://') is not engine
+
+
+def test_custom_plans_survive_pool_return(database):
+    """ Connections keep planning prepared statements for their parameters after going back to the pool """
+    engine = database.engine
+    if engine.dialect.server_version_info < (12,):
+        pytest.skip('plan_cache_mode is new in Postgres 12')
+
+    connection = engine.connect()
+    dbapi_connection = connection.connection.connection
+    # leave a transaction open for the pool to roll back when the connection is checked back in
+    connection.execute('SELECT 1')
+    assert connection.scalar('SHOW plan_cache_mode') == 'force_custom_plan'
+    connection.close()
+
+    # check out every idle pooled connection, so the one checked in above is among them
+    connections = [engine.connect() for _ in range(engine.pool.checkedin())]
+    reused = [conn for conn in connections if conn.connection.connection is dbapi_connection]
+    assert len(reused) == 1
+    assert reused[0].scalar('SHOW plan_cache_mode') == 'force_custom_plan'
+    for conn in connections:
+        conn.close()
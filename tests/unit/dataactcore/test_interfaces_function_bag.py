@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from dataactcore.interfaces import function_bag
+from dataactcore.models.jobModels import FileType, JobStatus, JobType, SubmissionSummary
+from dataactcore.models.lookups import JOB_STATUS_DICT
+from dataactcore.models.stagingModels import Appropriation
+from tests.unit.dataactcore.factories.job import JobFactory, SubmissionFactory
+from tests.unit.dataactcore.factories.staging import AppropriationFactory, DetachedAwardFinancialAssistanceFactory
+
+
+def make_job(sess, submission, status, job_type='csv_record_validation', **kwargs):
+    return JobFactory(submission_id=submission.submission_id,
+                      job_status=sess.query(JobStatus).filter_by(name=status).one(),
+                      job_type=sess.query(JobType).filter_by(name=job_type).one(),
+                      file_type=sess.query(FileType).filter_by(name='award').one(), **kwargs)
+
+
+def test_submission_summary_follows_jobs(database, job_constants):
+    """ The summary is refreshed by mark_job_status and recomputed after jobs are changed any other way """
+    sess = database.session
+    sub = SubmissionFactory()
+    sess.add(sub)
+    sess.commit()
+    validated = datetime(2017, 10, 1)
+    job_1 = make_job(sess, sub, 'finished', number_of_rows=10, last_validated=validated)
+    job_2 = make_job(sess, sub, 'running', number_of_rows=5, last_validated=datetime(2017, 10, 2))
+    sess.add_all([job_1, job_2])
+    sess.commit()
+
+    summary = function_bag.get_submission_summary(sub.submission_id)
+    assert summary.status == 'running'
+    assert summary.number_of_rows == 15
+    assert summary.last_validated == validated
+
+    function_bag.mark_job_status(job_2.job_id, 'finished')
+    summary = sess.query(SubmissionSummary).filter_by(submission_id=sub.submission_id).one()
+    assert summary.status == 'validation_successful'
+
+    # Changing a job directly leaves the summary to be recomputed when it's next read
+    job_1.job_status_id = JOB_STATUS_DICT['failed']
+    sess.commit()
+    sess.refresh(summary)
+    assert summary.status is None
+    assert function_bag.get_submission_summary(sub.submission_id).status == 'failed'
+    assert function_bag.get_last_validated_date(sub.submission_id) == '10/01/2017'
+
+
+def test_get_fabs_meta_counts(database, job_constants):
+    """ FABS row counts come from the summary, recounted when the validator refreshes it """
+    sess = database.session
+    sub = SubmissionFactory(d2_submission=True)
+    sess.add(sub)
+    sess.commit()
+    sess.add_all([DetachedAwardFinancialAssistanceFactory(submission_id=sub.submission_id, is_valid=valid)
+                  for valid in (True, True, False)])
+    sess.commit()
+
+    assert function_bag.get_fabs_meta(sub.submission_id) == {'valid_rows': 2, 'total_rows': 3, 'publish_date': None}
+
+    sess.add(DetachedAwardFinancialAssistanceFactory(submission_id=sub.submission_id, is_valid=True))
+    sess.commit()
+    function_bag.refresh_submission_summary(sub.submission_id, count_fabs_rows=True)
+    assert function_bag.get_fabs_meta(sub.submission_id)['valid_rows'] == 3
+
+
+def test_clear_submission_rows(database, job_constants):
+    """ Clearing a submission's staging rows leaves the rows of other submissions, whether or not the table is
+        partitioned """
+    sess = database.session
+    subs = [SubmissionFactory() for _ in range(2)]
+    sess.add_all(subs)
+    sess.commit()
+    sub_id, other_id = subs[0].submission_id, subs[1].submission_id
+
+    for _ in range(2):
+        sess.add_all([AppropriationFactory(submission_id=sub_id), AppropriationFactory(submission_id=other_id)])
+        sess.commit()
+        function_bag.clear_submission_rows(sess, Appropriation, sub_id)
+        sess.commit()
+        assert [row.submission_id for row in sess.query(Appropriation)] == [other_id]
+        sess.query(Appropriation).delete()
+        sess.commit()
@@ -0,0 +1,23 @@
+from dataactcore.models.domainModels import find_zip
+from tests.unit.dataactcore.factories.domain import ZipRangeFactory
+
+
+def test_find_zip(database):
+    """ ZIP+4s are found in the range containing them, and zip5s on their own in their first range """
+    sess = database.session
+    sess.add_all([
+        ZipRangeFactory(zip5='12345', zip4_low='0001', zip4_high='0099', county_number='001'),
+        ZipRangeFactory(zip5='12345', zip4_low='0100', zip4_high='0199', county_number='002'),
+        ZipRangeFactory(zip5='12345', zip4_low='0150', zip4_high='0150', county_number='003'),
+        ZipRangeFactory(zip5='54321', zip4_low=None, zip4_high=None, county_number='004')
+    ])
+    sess.commit()
+
+    assert find_zip(sess, '12345').county_number == '001'
+    assert find_zip(sess, '12345', '0099').county_number == '001'
+    assert find_zip(sess, '12345', '0100').county_number == '002'
+    assert find_zip(sess, '12345', '0150').county_number == '003'
+    assert find_zip(sess, '12345', '0200') is None
+    assert find_zip(sess, '12345', '01') is None
+    assert find_zip(sess, '54321').county_number == '004'
+    assert find_zip(sess, '54321', '0001') is None
@@ -0,0 +1,64 @@
+from unittest.mock import Mock
+
+import pytest
+
+from dataactcore.models import jobModels
+from dataactcore.models.stagingModels import (FlexField, create_submission_partitions, partitioned_tables,
+                                              submission_partition_name)
+from tests.unit.dataactcore.factories.job import SubmissionFactory
+
+
+def staging_partitions(sess, submission_id):
+    """ Partitioned staging tables, mapped to whether the submission has a partition of its own in them """
+    tables = partitioned_tables(sess)
+    if not tables:
+        pytest.skip('the staging tables are not partitioned on this database')
+    return {table_name: sess.execute('SELECT to_regclass(:partition)', {
+        'partition': submission_partition_name(table_name, submission_id)}).scalar() is not None
+        for table_name in tables}
+
+
+def test_partitions_created_after_commit(database):
+    """ A new submission gets its staging partitions once it's committed, and its rows go to them """
+    sess = database.session
+    submission = SubmissionFactory()
+    sess.add(submission)
+    sess.flush()
+    submission_id = submission.submission_id
+    assert sess.info['new_submission_ids'] == {submission_id}
+    sess.commit()
+
+    assert 'new_submission_ids' not in sess.info
+    assert all(staging_partitions(sess, submission_id).values())
+    sess.add(FlexField(submission_id=submission_id, job_id=1, row_number=1, header='header', cell='cell'))
+    sess.commit()
+    assert sess.execute('SELECT COUNT(*) FROM {}'.format(
+        submission_partition_name('flex_field', submission_id))).scalar() == 1
+
+
+def test_no_partitions_for_rolled_back_submission(database):
+    """ A submission that's rolled back gets no staging partitions """
+    sess = database.session
+    submission = SubmissionFactory()
+    sess.add(submission)
+    sess.flush()
+    submission_id = submission.submission_id
+    sess.rollback()
+
+    assert 'new_submission_ids' not in sess.info
+    assert not any(staging_partitions(sess, submission_id).values())
+
+
+def test_missing_partitions_created_later(database, monkeypatch):
+    """ A failure to create a submission's partitions doesn't fail its commit, and the partitions are created when
+        its files are loaded """
+    sess = database.session
+    monkeypatch.setattr(jobModels, 'create_submission_partitions', Mock(side_effect=ValueError))
+    submission = SubmissionFactory()
+    sess.add(submission)
+    sess.commit()
+    assert not any(staging_partitions(sess, submission.submission_id).values())
+
+    create_submission_partitions(sess, submission.submission_id)
+    sess.commit()
+    assert all(staging_partitions(sess, submission.submission_id).values())
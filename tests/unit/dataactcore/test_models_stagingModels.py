@@ -0,0 +1,21 @@
+from unittest.mock import Mock
+
+from dataactcore.models import stagingModels
+
+
+def test_create_submission_partitions(monkeypatch):
+    """ Each partitioned table gets an empty partition for the submission that's then attached, unless it already
+        has one """
+    monkeypatch.setattr(stagingModels, 'partitioned_tables', lambda connection: ['flex_field', 'appropriation'])
+    connection = Mock()
+    # the flex_field partition doesn't exist yet, the appropriation one does
+    connection.execute.return_value.scalar.side_effect = [None, 'appropriation_submission_7']
+    stagingModels.create_submission_partitions(connection, 7)
+
+    statements = [str(call[0][0]) for call in connection.execute.call_args_list]
+    assert statements[1:3] == [
+        'CREATE TABLE flex_field_submission_7 (LIKE flex_field INCLUDING DEFAULTS, CHECK (submission_id >= 7 AND '
+        'submission_id < 8))',
+        'ALTER TABLE flex_field ATTACH PARTITION flex_field_submission_7 FOR VALUES FROM (7) TO (8)'
+    ]
+    assert len(statements) == 4
@@ -0,0 +1,11 @@
+from dataactcore.scripts import archiveStagingPartitions
+
+
+def test_archivable_runs():
+    """ Runs of inactive submissions are broken up by active submissions and existing archive partitions, and runs of
+        a single submission are left alone """
+    partitions = [(0, 10, True), (10, 11, False), (11, 12, False), (13, 14, False), (14, 15, False),
+                  (15, 16, False), (16, 20, True), (20, 21, False), (21, 22, False), (22, 23, False)]
+    assert archiveStagingPartitions.archivable_runs(partitions, active_ids={13, 21}) == [[10, 11], [14, 15]]
+    assert archiveStagingPartitions.archivable_runs(partitions, active_ids=set(), min_run=3) == [[10, 11, 13, 14, 15],
+                                                                                                 [20, 21, 22]]
@@ -0,0 +1,20 @@
+from io import BytesIO
+
+from dataactcore.utils.fixedWidthReader import FixedWidthLayout
+
+LAYOUT = FixedWidthLayout(6, [('code', 0, 2), ('number', 2, 5)])
+
+
+def test_records_across_reads():
+    """ Records split between reads are put back together, and a partial record at the end is ignored """
+    data = b'HEADERAA001\nBB002\nCC003\nDD'
+    records = [LAYOUT.parse(record) for record in LAYOUT.records(BytesIO(data), skip=1, read_size=4)]
+    assert records == [('AA', '001'), ('BB', '002'), ('CC', '003')]
+    assert records[1].number == '002'
+
+
+def test_field_and_buffer_records():
+    """ Single fields can be read from records in any buffer """
+    records = list(LAYOUT.buffer_records(bytearray(b'AA001\nBB002\n')))
+    assert [LAYOUT.field(record, 'code') for record in records] == ['AA', 'BB']
+    assert LAYOUT.text(records[1]) == 'BB002\n'
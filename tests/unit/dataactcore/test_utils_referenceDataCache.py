@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
+
+from dataactcore.utils import referenceDataCache
+from tests.unit.dataactcore.factories.domain import CountyCodeFactory, StatesFactory, ZipRangeFactory
+
+
+def test_reference_data_lookups(database):
+    """Lookups behave like the queries they replace"""
+    sess = database.session
+    sess.add_all([
+        StatesFactory(state_code='NY', state_name='New York'),
+        CountyCodeFactory(state_code='NY', county_number='001', county_name='First'),
+        CountyCodeFactory(state_code='NY', county_number='001', county_name='Second'),
+        ZipRangeFactory(zip5='12345', zip4_low='6789', zip4_high='6789', congressional_district_no='01'),
+        ZipRangeFactory(zip5='12345', zip4_low='4000', zip4_high='4999', congressional_district_no='02'),
+        ZipRangeFactory(zip5='12345', zip4_low='1111', zip4_high='1111', congressional_district_no=None),
+        ZipRangeFactory(zip5='54321', zip4_low='4321', zip4_high='4321', congressional_district_no='05'),
+        # overlapping ranges are resolved in favor of the one loaded last
+        ZipRangeFactory(zip5='12345', zip4_low='4300', zip4_high='4399', congressional_district_no='03')
+    ])
+    sess.commit()
+
+    reference_data = referenceDataCache.ReferenceData(sess)
+    assert reference_data.one('states', 'NY').state_name == 'New York'
+    with pytest.raises(NoResultFound):
+        reference_data.one('states', 'DC')
+    assert reference_data.first('county_code', ('001', 'NY')).county_name == 'First'
+    with pytest.raises(MultipleResultsFound):
+        reference_data.one_or_none('county_code', ('001', 'NY'))
+
+    reference_data.load_zips({'12345', '99999'}, {('12345', '4000'), ('12345', '4321'), ('12345', '0000'),
+                                                  ('12345', '4A00')})
+    assert reference_data.zip9('12345', '4000').congressional_district_no == '02'
+    assert reference_data.zip9('12345', '4321').congressional_district_no == '03'
+    assert reference_data.zip9('12345', '0000') is None
+    assert reference_data.zip9('12345', '4A00') is None
+    assert reference_data.zip9('12345', '4999').congressional_district_no == '02'
+    assert reference_data.zip5('12345').zip4_low == '6789'
+    assert reference_data.zip5_district_count('12345') == 4
+    assert reference_data.zip5('99999') is None
+    # zips that weren't loaded up front are looked up as needed
+    assert reference_data.zip5('54321').congressional_district_no == '05'
+    assert reference_data.zip5_district_count('54321') == 1
+
+    # changes made by the loaders are picked up by the next ReferenceData
+    sess.add(StatesFactory(state_code='DC', state_name='District of Columbia'))
+    sess.commit()
+    assert referenceDataCache.ReferenceData(sess).one('states', 'DC').state_name == 'District of Columbia'
+
+
+def test_reference_data_cached_until_changed(monkeypatch):
+    """Tables are only reloaded when their version changes"""
+    versions = {'table': (1, 1, None)}
+    loads = []
+
+    def load(sess):
+        loads.append(versions['table'])
+        return {'things': [('a', 1), ('b', 2), ('b', 3)]}
+    monkeypatch.setattr(referenceDataCache, 'LOADERS', [(load, ['table'])])
+    monkeypatch.setattr(referenceDataCache, 'table_version', lambda sess, model: versions[model])
+    referenceDataCache.clear_reference_data_cache()
+
+    reference_data = referenceDataCache.ReferenceData(None)
+    referenceDataCache.ReferenceData(None)
+    assert loads == [(1, 1, None)]
+    assert reference_data.one('things', 'a') == 1
+    assert reference_data.first('things', 'b') == 2
+    assert reference_data.first('things', 'c') is None
+
+    versions['table'] = (2, 3, None)
+    referenceDataCache.ReferenceData(None)
+    assert loads == [(1, 1, None), (2, 3, None)]
+    referenceDataCache.clear_reference_data_cache()
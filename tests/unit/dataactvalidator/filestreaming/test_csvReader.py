@@ -2,7 +2,10 @@ import csv
 
 from unittest.mock import Mock
 
+import pytest
+
 from dataactvalidator.filestreaming import csvReader
+from tests.unit.dataactvalidator.filestreaming.utils import FakeS3
 
 
 def test_count_and_set_headers_flex():
@@ -47,3 +50,53 @@ def test_normalize_headers():
     ]
     result = csvReader.normalize_headers(headers, True, mapping)
     assert list(result) == ['ata', 'boa', 'flex_mycol', 'flex_another']
+
+
+def test_row_count_single_pass(tmpdir):
+    """Verify rows are counted while the file is read, matching a full csv.reader pass including blank rows"""
+    csv_file = tmpdir.join('file.csv')
+    csv_file.write('a,b\n1,2\n\n3,4\n')
+    reader = csvReader.CsvReader()
+    reader.open_file(None, None, str(csv_file), [Mock(name_short='a'), Mock(name_short='b')], None,
+                     str(tmpdir.join('error.csv')), {}, is_local=True)
+    records = []
+    while not reader.is_finished:
+        records.append(reader._get_line())
+    reader.close()
+
+    assert records == [['1', '2'], ['3', '4'], '']
+    with open(str(csv_file)) as f:
+        assert reader.row_count == len(list(csv.reader(f))) == 4
+
+
+def test_encoding_error_raised_while_reading(tmpdir):
+    """Non-UTF8 characters should raise as the offending row is read, not end the file early"""
+    csv_file = tmpdir.join('file.csv')
+    csv_file.write_binary(b'a,b\n' + b'1,2\n' * 10000 + b'\xff,4\n')
+    reader = csvReader.CsvReader()
+    reader.open_file(None, None, str(csv_file), [Mock(name_short='a'), Mock(name_short='b')], None,
+                     str(tmpdir.join('error.csv')), {}, is_local=True)
+    with pytest.raises(UnicodeDecodeError):
+        while not reader.is_finished:
+            reader._get_line()
+    reader.close()
+    assert not reader.is_finished
+    assert reader.row_count > 1
+
+
+def test_open_file_streams_from_s3(monkeypatch):
+    """Files in S3 are read as they download rather than being saved to a temp file first"""
+    client = FakeS3(b'some_col,other\n1,2\n\n3,4\n')
+    monkeypatch.setattr(csvReader.boto3, 'client', Mock(return_value=client))
+    monkeypatch.setattr(csvReader.tempfile, 'mkstemp', Mock(side_effect=AssertionError))
+
+    reader = csvReader.CsvReader()
+    reader.open_file('region', 'bucket', 'file.csv', [Mock(name_short='some_col'), Mock(name_short='other')],
+                     'bucket', 'error.csv', {})
+    assert reader.get_next_record() == ({'some_col': '1', 'other': '2'}, [])
+    assert reader.get_next_record() == ({'some_col': '3', 'other': '4'}, [])
+    assert reader._get_line() == ''
+    assert reader.is_finished
+    assert reader.row_count == 4
+    assert reader._get_file_size() == len(client.body)
+    reader.close()
@@ -0,0 +1,21 @@
+from dataactcore.models.lookups import FIELD_TYPE_DICT
+from dataactcore.models.validationModels import FileColumn
+from dataactvalidator.filestreaming.fieldCleaner import ColumnPlan
+
+
+def test_column_plan_clean_row():
+    """Whitespace and quotes are stripped, numbers lose their commas, blanks become None and padded fields are padded"""
+    fields = [
+        FileColumn(name='Amount Long', field_types_id=FIELD_TYPE_DICT['DECIMAL'], padded_flag=False, length=None),
+        FileColumn(name='Code Long', field_types_id=FIELD_TYPE_DICT['STRING'], padded_flag=True, length=3),
+        FileColumn(name='Text Long', field_types_id=FIELD_TYPE_DICT['STRING'], padded_flag=False, length=3),
+        FileColumn(name='Count Long', field_types_id=FIELD_TYPE_DICT['INT'], padded_flag=True, length=None)
+    ]
+    long_to_short_dict = {'Amount Long': 'amount', 'Code Long': 'code', 'Text Long': 'text', 'Count Long': 'count'}
+    plan = ColumnPlan(long_to_short_dict, fields)
+
+    row = plan.clean_row({'amount': ' "1,234.5" ', 'code': '7', 'text': '1,2', 'count': '1,2,a', 'extra': ' x '})
+    assert row == {'amount': '1234.5', 'code': '007', 'text': '1,2', 'count': '1,2,a', 'extra': ' x '}
+
+    row = plan.clean_row({'amount': '" "', 'code': '', 'text': None, 'count': ' 12 '})
+    assert row == {'amount': None, 'code': None, 'text': None, 'count': '12'}
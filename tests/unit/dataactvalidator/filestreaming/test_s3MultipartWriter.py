@@ -0,0 +1,71 @@
+import pytest
+
+from dataactvalidator.filestreaming import s3MultipartWriter
+
+
+class FakeS3(object):
+    """Stands in for a boto3 S3 client, keeping uploaded objects in memory"""
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = 'upload{}'.format(len(self.uploads))
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = Body
+        return {'ETag': 'etag{}'.format(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = MultipartUpload['Parts']
+        assert [part['PartNumber'] for part in parts] == list(range(1, len(parts) + 1))
+        assert [part['ETag'] for part in parts] == ['etag{}'.format(part['PartNumber']) for part in parts]
+        self.objects[Key] = b''.join(self.uploads[UploadId][part['PartNumber']] for part in parts)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(UploadId)
+
+
+def test_small_file_single_put():
+    client = FakeS3()
+    with s3MultipartWriter.s3_text_writer(client, 'bucket', 'key') as writer:
+        writer.write('a,b\né,1\n')
+    assert client.objects == {'key': 'a,b\né,1\n'.encode('utf-8')}
+    assert client.uploads == {}
+
+
+def test_large_file_uploaded_in_parts():
+    """Parts are uploaded in order and joined back into the whole file"""
+    client = FakeS3()
+    text = ''.join('{},row\n'.format(i) for i in range(1000))
+    with s3MultipartWriter.s3_text_writer(client, 'bucket', 'key', part_size=100, max_concurrency=3) as writer:
+        for line in text.splitlines(True):
+            writer.write(line)
+    assert client.objects['key'] == text.encode('utf-8')
+    assert len(client.uploads['upload0']) > 1
+    assert client.aborted == []
+
+
+def test_error_aborts_upload():
+    """Nothing is written to the key if writing the file fails"""
+    client = FakeS3()
+    with pytest.raises(ValueError):
+        with s3MultipartWriter.s3_text_writer(client, 'bucket', 'key', part_size=10) as writer:
+            writer.write('x' * 10000)
+            writer.flush()
+            raise ValueError()
+    assert client.objects == {}
+    assert client.aborted == ['upload0']
+
+    client = FakeS3()
+    with pytest.raises(ValueError):
+        with s3MultipartWriter.s3_text_writer(client, 'bucket', 'key') as writer:
+            writer.write('x')
+            raise ValueError()
+    assert client.objects == {}
@@ -0,0 +1,61 @@
+from unittest.mock import Mock, call
+
+import pytest
+from botocore.exceptions import ClientError
+
+from dataactvalidator.filestreaming import s3StreamReader
+from tests.unit.dataactvalidator.filestreaming.utils import FakeS3
+
+
+def test_stream_reads_whole_object():
+    """Small chunks are read in order and multi-byte characters split across chunks are decoded"""
+    body = 'a,b\n1,é\n2,ü\n'.encode('utf-8') * 50
+    client = FakeS3(body)
+    with s3StreamReader.open_s3_text(client, 'bucket', 'key', chunk_size=7, buffer_chunks=2) as file:
+        assert file.read() == body.decode('utf-8')
+    assert client.ranges[0] == (0, 6)
+    assert client.ranges[-1][1] == len(body) - 1
+
+
+def test_stream_empty_object():
+    client = FakeS3(b'')
+    with s3StreamReader.open_s3_text(client, 'bucket', 'key') as file:
+        assert file.read() == ''
+    assert client.ranges == []
+
+
+def test_stream_retries_and_raises(monkeypatch):
+    """Failed GETs are retried, and the error is raised to the reader once retries run out"""
+    monkeypatch.setattr(s3StreamReader.S3StreamReader, 'RETRY_DELAY', 0)
+    client = FakeS3(b'a,b\n', fail_ranges=2)
+    with s3StreamReader.open_s3_text(client, 'bucket', 'key') as file:
+        assert file.read() == 'a,b\n'
+
+    client = FakeS3(b'a,b\n', fail_ranges=s3StreamReader.S3StreamReader.RETRIES)
+    with s3StreamReader.open_s3_text(client, 'bucket', 'key') as file:
+        with pytest.raises(ClientError):
+            file.read()
+
+
+def test_stream_retry_backoff():
+    """The wait between retries doubles after each failure, and closing the reader stops waiting"""
+    client = FakeS3(b'a,b\n', fail_ranges=2)
+    reader = s3StreamReader.S3StreamReader(client, 'bucket', 'key', size=0)
+    reader.stopped = Mock(wait=Mock(return_value=False))
+    assert reader._get_range(0, 3) == b'a,b\n'
+    delay = s3StreamReader.S3StreamReader.RETRY_DELAY
+    assert reader.stopped.wait.call_args_list == [call(delay), call(delay * 2)]
+
+    client.fail_ranges = 1
+    reader.stopped.wait.return_value = True
+    with pytest.raises(ClientError):
+        reader._get_range(0, 3)
+    assert client.ranges == [(0, 3)]
+
+
+def test_stream_non_utf8():
+    """Non-UTF8 characters raise an error while reading"""
+    client = FakeS3(b'a,b\n' * 10 + b'\xff\n')
+    with s3StreamReader.open_s3_text(client, 'bucket', 'key', chunk_size=5) as file:
+        with pytest.raises(UnicodeDecodeError):
+            file.read()
@@ -0,0 +1,22 @@
+import io
+
+from botocore.exceptions import ClientError
+
+
+class FakeS3(object):
+    """Stands in for a boto3 S3 client, serving ranged GETs from bytes held in memory"""
+    def __init__(self, body, fail_ranges=0):
+        self.body = body
+        self.fail_ranges = fail_ranges
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self.body)}
+
+    def get_object(self, Bucket, Key, Range):
+        if self.fail_ranges:
+            self.fail_ranges -= 1
+            raise ClientError({'Error': {'Code': '500'}}, 'GetObject')
+        start, end = (int(part) for part in Range[len('bytes='):].split('-'))
+        self.ranges.append((start, end))
+        return {'Body': io.BytesIO(self.body[start:end + 1])}
@@ -1,5 +1,5 @@
 from tests.unit.dataactcore.factories.staging import DetachedAwardFinancialAssistanceFactory
-from tests.unit.dataactcore.factories.domain import ZipsFactory
+from tests.unit.dataactcore.factories.domain import ZipRangeFactory
 from tests.unit.dataactvalidator.utils import number_of_errors, query_columns
 
 _FILE = 'fabs35_detached_award_financial_assistance_2'
@@ -13,7 +13,7 @@ def test_column_headers(database):
 
 def test_success(database):
     """ LegalEntityZIP5 is not a valid zip code. Null/blank zip codes ignored. """
-    zip_1 = ZipsFactory(zip5="12345")
+    zip_1 = ZipRangeFactory(zip5="12345")
     det_award_1 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5="12345")
     det_award_2 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5=None)
     det_award_3 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5="")
@@ -24,7 +24,7 @@ def test_success(database):
 
 def test_failure(database):
     """ LegalEntityZIP5 is not a valid zip code. """
-    zip_1 = ZipsFactory(zip5="12345")
+    zip_1 = ZipRangeFactory(zip5="12345")
     det_award_1 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5="54321")
     # add a valid one to make sure NOT EXISTS is doing what we expect
     det_award_2 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5="12345")
@@ -1,5 +1,5 @@
 from tests.unit.dataactcore.factories.staging import DetachedAwardFinancialAssistanceFactory
-from tests.unit.dataactcore.factories.domain import ZipsFactory
+from tests.unit.dataactcore.factories.domain import ZipRangeFactory
 from tests.unit.dataactvalidator.utils import number_of_errors, query_columns
 
 _FILE = 'fabs35_detached_award_financial_assistance_3'
@@ -13,7 +13,7 @@ def test_column_headers(database):
 
 def test_success(database):
     """ LegalEntityZIP5 + LegalEntityZIPLast4 is not a valid 9 digit zip. Null/blank zip codes ignored. """
-    zip_1 = ZipsFactory(zip5="12345", zip_last4="6789")
+    zip_1 = ZipRangeFactory(zip5="12345", zip4_low="6780", zip4_high="6789")
     det_award_1 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5="12345", legal_entity_zip_last4="6789")
     det_award_2 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5="12345", legal_entity_zip_last4=None)
     det_award_3 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5=None, legal_entity_zip_last4="6789")
@@ -31,7 +31,7 @@ def test_success(database):
 
 def test_failure(database):
     """ LegalEntityZIP5 is not a valid zip code. """
-    zip_1 = ZipsFactory(zip5="12345", zip_last4="6789")
+    zip_1 = ZipRangeFactory(zip5="12345", zip4_low="6780", zip4_high="6789")
     det_award_1 = DetachedAwardFinancialAssistanceFactory(legal_entity_zip5="12345", legal_entity_zip_last4="9876")
 
     errors = number_of_errors(_FILE, database, models=[zip_1, det_award_1])
@@ -1,6 +1,6 @@
 from tests.unit.dataactcore.factories.staging import DetachedAwardFinancialAssistanceFactory
 from tests.unit.dataactvalidator.utils import number_of_errors, query_columns
-from dataactcore.models.domainModels import Zips
+from dataactcore.models.domainModels import ZipRange
 
 _FILE = 'fabs41_detached_award_financial_assistance_3'
 
@@ -16,7 +16,7 @@ def test_success(database):
         In this specific submission row, the ZIP5 (and by extension the full ZIP+4) is not a valid ZIP code in the
         state in question."""
 
-    zips = Zips(zip5="12345", zip_last4="6789", state_abbreviation="NY")
+    zips = ZipRange(zip5="12345", zip4_low="6789", zip4_high="6789", state_abbreviation="NY")
     # ignored because no zip4
     det_award_1 = DetachedAwardFinancialAssistanceFactory(place_of_performance_code="NY*****",
                                                           place_of_performance_zip4a="")
@@ -61,7 +61,7 @@ def test_failure(database):
         PrimaryPlaceOfPerformanceCode. In this specific submission row, the ZIP5 (and by extension the full ZIP+4) is
         not a valid ZIP code in the state in question."""
 
-    zips = Zips(zip5="12345", zip_last4="6789", state_abbreviation="NY")
+    zips = ZipRange(zip5="12345", zip4_low="6789", zip4_high="6789", state_abbreviation="NY")
     # invalid 5 digit zip
     det_award_1 = DetachedAwardFinancialAssistanceFactory(place_of_performance_code="ny10986",
                                                           place_of_performance_zip4a="12346")
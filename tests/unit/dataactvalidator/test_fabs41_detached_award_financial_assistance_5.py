@@ -1,6 +1,6 @@
 from tests.unit.dataactcore.factories.staging import DetachedAwardFinancialAssistanceFactory
 from tests.unit.dataactvalidator.utils import number_of_errors, query_columns
-from dataactcore.models.domainModels import Zips
+from dataactcore.models.domainModels import ZipRange
 
 _FILE = 'fabs41_detached_award_financial_assistance_5'
 
@@ -16,7 +16,7 @@ def test_success(database):
         In this specific submission row, the first five digits are valid and located in the correct state, but the
         last 4 are invalid."""
 
-    zips = Zips(zip5="12345", zip_last4="6789", state_abbreviation="NY")
+    zips = ZipRange(zip5="12345", zip4_low="6789", zip4_high="6799", state_abbreviation="NY")
     # ignored because no zip4
     det_award_1 = DetachedAwardFinancialAssistanceFactory(place_of_performance_code="NY*****",
                                                           place_of_performance_zip4a="")
@@ -65,7 +65,7 @@ def test_failure(database):
     """ Test failure for when the provided PrimaryPlaceofPerformanceZIP+4 must be in the state specified by
         PrimaryPlaceOfPerformanceCode. In this specific submission row, the first five digits are valid and located
         in the correct state, but the last 4 are invalid."""
-    zips = Zips(zip5="12345", zip_last4="6789", state_abbreviation="NY")
+    zips = ZipRange(zip5="12345", zip4_low="6789", zip4_high="6799", state_abbreviation="NY")
 
     # invalid 9 digit zip - first 5 digits good
     det_award_1 = DetachedAwardFinancialAssistanceFactory(place_of_performance_code="ny10986",
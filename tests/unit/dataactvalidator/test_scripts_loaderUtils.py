@@ -0,0 +1,33 @@
+import zipfile
+
+from dataactvalidator.scripts.loaderUtils import read_zipped_csv
+
+
+def write_zip(tmpdir, lines):
+    zip_path = str(tmpdir.join('data.zip'))
+    with zipfile.ZipFile(zip_path, 'w') as zip_file:
+        zip_file.writestr('data.dat', '\n'.join(lines) + '\n')
+    return zip_path
+
+
+def test_read_zipped_csv_chunks(tmpdir):
+    """ Every row after the header is read, a chunk at a time and indexed from 0 """
+    zip_path = write_zip(tmpdir, ['HEADER'] + ['{}|row {}'.format(i, i) for i in range(7)])
+    chunks = list(read_zipped_csv(zip_path, 'data.dat', chunk_size=3, dtype=str, header=None, skiprows=1, sep='|',
+                                  names=['number', 'text']))
+    assert [len(chunk.index) for chunk in chunks] == [3, 3, 1]
+    assert list(chunks[1]['number']) == ['3', '4', '5']
+    assert list(chunks[1].index) == [0, 1, 2]
+
+
+def test_read_zipped_csv_skip_footer(tmpdir):
+    """ The footer is left out of the last chunk, even when it's the only row in it """
+    zip_path = write_zip(tmpdir, ['HEADER'] + ['{}|row {}'.format(i, i) for i in range(6)] + ['FOOTER'])
+    chunks = list(read_zipped_csv(zip_path, 'data.dat', chunk_size=3, skip_footer=1, dtype=str, header=None,
+                                  skiprows=1, sep='|', names=['number', 'text']))
+    assert [list(chunk['number']) for chunk in chunks] == [['0', '1', '2'], ['3', '4', '5']]
+
+    zip_path = write_zip(tmpdir, ['HEADER', '0|row 0', 'FOOTER'])
+    chunks = list(read_zipped_csv(zip_path, 'data.dat', chunk_size=3, skip_footer=1, dtype=str, header=None,
+                                  skiprows=1, sep='|', names=['number', 'text']))
+    assert [list(chunk['number']) for chunk in chunks] == [['0']]
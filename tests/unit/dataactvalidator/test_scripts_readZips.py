@@ -0,0 +1,66 @@
+from io import BytesIO
+from unittest.mock import Mock
+
+from dataactvalidator.scripts import readZips
+
+
+def zip4_line(zip5, zip4_low, zip4_high, state, county='001', congressional_district='01'):
+    """ Build a line of a USPS zip4 file with the fields readZips uses filled in """
+    line = [' '] * readZips.zip4_line_size
+    for start, value in ((1, zip5), (140, zip4_low), (144, zip4_high), (157, state), (159, county),
+                         (162, congressional_district)):
+        line[start:start + len(value)] = value
+    return ''.join(line)
+
+
+def citystate_line(record_type, zip5, state, county='001'):
+    """ Build a line of the USPS city/state file with the fields readZips uses filled in """
+    line = [' '] * readZips.citystate_line_size
+    for start, value in ((0, record_type), (1, zip5), (99, state), (101, county)):
+        line[start:start + len(value)] = value
+    return ''.join(line)
+
+
+def test_parse_zip4_file_stores_ranges():
+    """ Each line is stored as a range, with consecutive lines continuing the same range merged """
+    lines = [
+        'copyright'.ljust(readZips.zip4_line_size),
+        zip4_line('12345', '0001', '0099', 'NY'),
+        zip4_line('12345', '0100', '0199', 'NY'),
+        # a gap starts a new range
+        zip4_line('12345', '0300', '0399', 'NY'),
+        # as does a different district
+        zip4_line('12345', '0400', '0499', 'NY', congressional_district='02'),
+        zip4_line('12345', '0500', '0500', 'AK', congressional_district='07'),
+        zip4_line('12345', '12ND', '12ND', 'NY'),
+        zip4_line('54321', '0000', '9999', 'AE')
+    ]
+    sess = Mock()
+    readZips.parse_zip4_file(BytesIO(''.join(lines).encode()), sess)
+
+    ranges = [data for call in sess.bulk_insert_mappings.call_args_list for data in call[0][1]]
+    assert [(data['zip5'], data['zip4_low'], data['zip4_high'], data['state_abbreviation'],
+             data['congressional_district_no']) for data in ranges] == [
+        ('12345', '0001', '0199', 'NY', '01'),
+        ('12345', '0300', '0399', 'NY', '01'),
+        ('12345', '0400', '0499', 'NY', '02'),
+        ('12345', '0500', '0500', 'AK', '00')
+    ]
+
+
+def test_parse_citystate_file_adds_missing_zip5s():
+    """ Detail records of zip5s that aren't already loaded are added without a range """
+    lines = [
+        'copyright'.ljust(readZips.citystate_line_size),
+        citystate_line('D', '12345', 'NY'),
+        citystate_line('D', '54321', 'DC', county='002'),
+        citystate_line('A', '11111', 'NY'),
+        citystate_line('D', '22222', 'AP')
+    ]
+    sess = Mock()
+    sess.query.return_value.distinct.return_value = [Mock(zip5='12345')]
+    readZips.parse_citystate_file(BytesIO(''.join(lines).encode()), sess)
+
+    ranges = [data for call in sess.bulk_insert_mappings.call_args_list for data in call[0][1]]
+    assert ranges == [{'zip5': '54321', 'zip4_low': None, 'zip4_high': None, 'state_abbreviation': 'DC',
+                       'county_number': '002', 'congressional_district_no': '98'}]
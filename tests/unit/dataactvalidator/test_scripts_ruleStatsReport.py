@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from dataactcore.models.lookups import FILE_TYPE_DICT
+from dataactcore.models.validationModels import RuleExecutionStats
+from dataactvalidator.scripts import ruleStatsReport
+
+
+def add_stats(sess, query_name, days_ago, durations, file_rows=500):
+    created_at = datetime.utcnow() - timedelta(days=days_ago)
+    sess.add_all([RuleExecutionStats(query_name=query_name, file_type_id=FILE_TYPE_DICT['appropriations'],
+                                     file_rows=file_rows, duration=duration, rows_returned=1, created_at=created_at)
+                  for duration in durations])
+    sess.commit()
+
+
+def test_slowest_rules(database, job_constants):
+    """ Rules are ranked by their average time on files of the same type and size """
+    sess = database.session
+    add_stats(sess, 'a1_appropriations', 1, [1.0, 3.0])
+    add_stats(sess, 'a1_appropriations', 1, [1.0], file_rows=50000)
+    add_stats(sess, 'a2_appropriations', 1, [4.0])
+    add_stats(sess, 'a3_appropriations', 40, [10.0])
+
+    slowest = ruleStatsReport.slowest_rules(sess, datetime.utcnow() - timedelta(days=30))
+    assert [(row.query_name, row.size_bucket, row.runs, row.avg_total) for row in slowest] == [
+        ('a2_appropriations', 2, 1, 4.0), ('a1_appropriations', 2, 2, 2.0), ('a1_appropriations', 4, 1, 1.0)
+    ]
+    assert ruleStatsReport.describe(slowest[0]) == 'a2_appropriations (appropriations, 100+ rows)'
+
+
+def test_regressions(database, job_constants):
+    """ Rules are regressions when they're slower recently than before, given enough runs in both periods """
+    sess = database.session
+    add_stats(sess, 'a1_appropriations', 20, [1.0, 1.0])
+    add_stats(sess, 'a1_appropriations', 2, [3.0, 3.0])
+    add_stats(sess, 'a2_appropriations', 20, [1.0, 1.0])
+    add_stats(sess, 'a2_appropriations', 2, [1.2, 1.2])
+    add_stats(sess, 'a3_appropriations', 20, [1.0])
+    add_stats(sess, 'a3_appropriations', 2, [5.0, 5.0])
+
+    now = datetime.utcnow()
+    slower = ruleStatsReport.regressions(sess, now - timedelta(days=7), now - timedelta(days=30), threshold=1.5,
+                                         min_runs=2)
+    assert [(before.avg_total, after.query_name, after.avg_total) for before, after in slower] == [
+        (1.0, 'a1_appropriations', 3.0)
+    ]
@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import signal
+import threading
+
+from dataactvalidator import workerSupervisor
+from dataactvalidator.workerSupervisor import WorkerSupervisor
+
+pids = multiprocessing.Array('i', 3)
+starts = multiprocessing.Value('i', 0)
+
+
+def wait_for_stop(stop_event):
+    with starts.get_lock():
+        pids[starts.value] = os.getpid()
+        starts.value += 1
+    stop_event.wait()
+
+
+def exit_once(stop_event):
+    with starts.get_lock():
+        starts.value += 1
+        first = starts.value == 1
+    if not first:
+        stop_event.wait()
+
+
+def run_until(supervisor, condition):
+    """ Run the supervisor, stopping it once condition() is true """
+    def stop_when_done():
+        while not condition():
+            threading.Event().wait(0.05)
+        supervisor.stop()
+    threading.Thread(target=stop_when_done, daemon=True).start()
+    supervisor.run()
+
+
+def test_workers_run_at_once_and_stop(monkeypatch):
+    """ Each worker runs in its own process until the supervisor is stopped """
+    monkeypatch.setattr(WorkerSupervisor, 'CHECK_INTERVAL', 0.05)
+    starts.value = 0
+    supervisor = WorkerSupervisor(wait_for_stop, 3, shutdown_timeout=10)
+    run_until(supervisor, lambda: starts.value == 3)
+
+    worker_pids = list(pids)
+    assert len(set(worker_pids)) == 3
+    assert os.getpid() not in worker_pids
+    assert all(worker.exitcode == 0 for worker in supervisor.workers)
+
+
+def test_exited_workers_are_replaced(monkeypatch):
+    """ A worker that exits while the supervisor is running is started again """
+    monkeypatch.setattr(WorkerSupervisor, 'CHECK_INTERVAL', 0.05)
+    starts.value = 0
+    supervisor = WorkerSupervisor(exit_once, 2, shutdown_timeout=10)
+    run_until(supervisor, lambda: starts.value == 3)
+    assert starts.value == 3
+    assert all(not worker.is_alive() for worker in supervisor.workers)
+
+
+def test_workers_not_stopping_are_killed(monkeypatch):
+    """ Workers still running after the shutdown timeout are killed """
+    monkeypatch.setattr(WorkerSupervisor, 'CHECK_INTERVAL', 0.05)
+    monkeypatch.setattr(workerSupervisor, 'dispose_engines', lambda: None)
+    supervisor = WorkerSupervisor(lambda stop_event: threading.Event().wait(), 1, shutdown_timeout=0.1)
+    supervisor.stop()
+    supervisor.run()
+    assert supervisor.workers[0].exitcode == -signal.SIGKILL
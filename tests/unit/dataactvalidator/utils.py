@@ -1,8 +1,12 @@
+from collections import Counter
 from datetime import datetime
 from random import randint
 
 from dataactcore.models.jobModels import Submission
 from dataactvalidator.filestreaming.sqlLoader import SQLLoader
+from dataactvalidator.validation_handlers.rowRules import ROW_RULES
+from dataactvalidator.validation_handlers.ruleCompiler import normalize_rule_sql
+from dataactvalidator.validation_handlers.validator import execute_rule_sql
 
 
 def insert_submission(db, submission):
@@ -22,14 +26,16 @@ def error_rows(rule_file, staging_db, submission=None, models=None, assert_num=N
         models = []
 
     submission_id = insert_submission(staging_db, submission)
-    sql = SQLLoader.read_sql_str(rule_file).format(submission_id)
+    sql = normalize_rule_sql(SQLLoader.read_sql_str(rule_file))
 
     for model in models:
         model.submission_id = submission_id
         staging_db.session.add(model)
 
     staging_db.session.commit()
-    result = staging_db.connection.execute(sql).fetchall()
+    result = execute_rule_sql(staging_db.connection, sql, submission_id).fetchall()
+    if rule_file in ROW_RULES:
+        assert_row_rule_parity(ROW_RULES[rule_file], models, result)
 
     if assert_num is not None:
         assert(len(result) == assert_num)
@@ -37,10 +43,23 @@ def error_rows(rule_file, staging_db, submission=None, models=None, assert_num=N
     return result
 
 
+def assert_row_rule_parity(twin, models, result):
+    """Check that a rule's Python twin fails exactly the rows its SQL returned"""
+    twin_rows = []
+    for model in models:
+        table = getattr(model, '__table__', None)
+        if table is None or not all(column in table.columns for column in twin.columns):
+            continue
+        row = {column.key: getattr(model, column.key) for column in table.columns}
+        if twin.check(row):
+            twin_rows.append(tuple(row[column] for column in ['row_number'] + twin.columns))
+    assert Counter(twin_rows) == Counter(tuple(row) for row in result)
+
+
 def number_of_errors(rule_file, staging_db, submission=None, models=None, assert_num=None):
     return len(error_rows(rule_file, staging_db, submission, models, assert_num))
 
 
 def query_columns(rule_file, staging_db):
-    sql = SQLLoader.read_sql_str(rule_file).format(randint(1, 9999))
-    return staging_db.connection.execute(sql).keys()
+    sql = normalize_rule_sql(SQLLoader.read_sql_str(rule_file))
+    return execute_rule_sql(staging_db.connection, sql, randint(1, 9999)).keys()
@@ -0,0 +1,39 @@
+import os
+from unittest.mock import Mock
+
+from dataactcore.models.stagingModels import DetachedAwardFinancialAssistance
+from dataactvalidator.filestreaming.sqlLoader import SQLLoader
+from dataactvalidator.validation_handlers.rowRuleEngine import RowRuleEngine
+from dataactvalidator.validation_handlers.rowRules import ROW_RULES
+from dataactvalidator.validation_handlers.ruleCompiler import normalize_rule_sql, parse_row_local
+
+
+def test_twins_match_sql_columns():
+    """ Every twin is of a row-local SQL rule, and reports the same columns in the same order """
+    for query_name, twin in ROW_RULES.items():
+        with open(os.path.join(SQLLoader.sql_rules_path, query_name + '.sql')) as f:
+            row_local_rule = parse_row_local(normalize_rule_sql(f.read()))
+        assert row_local_rule is not None, query_name
+        assert twin.columns == row_local_rule.columns, query_name
+
+
+def test_row_rule_engine():
+    """ Rows are checked with the values the staging table would hold, and failures kept per rule in file order """
+    rules = [Mock(query_name='fabs6_detached_award_financial_assistance'),
+             Mock(query_name='fabs18_detached_award_financial_assistance'),
+             Mock(query_name='fabs2_detached_award_financial_assistance_1')]
+    engine = RowRuleEngine(DetachedAwardFinancialAssistance, rules)
+
+    engine.check(2, {'record_type': '2', 'business_types': 'AB'})
+    engine.check(3, {'record_type': '3', 'business_types': 'AbA'})
+    engine.check(4, {'record_type': None, 'business_types': None})
+
+    results = engine.results()
+    # rules without a twin still run as SQL
+    assert set(results) == {'fabs6_detached_award_financial_assistance', 'fabs18_detached_award_financial_assistance'}
+    cols, failures = results['fabs6_detached_award_financial_assistance']
+    assert cols == ['row_number', 'record_type']
+    assert [(failure['row_number'], failure['record_type']) for failure in failures] == [(3, 3), (4, None)]
+    cols, failures = results['fabs18_detached_award_financial_assistance']
+    assert cols == ['row_number', 'business_types']
+    assert [(failure['row_number'], failure['business_types']) for failure in failures] == [(3, 'AbA')]
@@ -0,0 +1,130 @@
+from unittest.mock import Mock
+
+import sqlalchemy
+from sqlalchemy.engine import Connection
+
+from dataactvalidator.validation_handlers import ruleCompiler, validator
+
+
+def make_rule(query_name, sql):
+    return Mock(query_name=query_name, rule_sql=sql)
+
+
+def test_normalize_rule_sql():
+    """ The submission ID becomes a bind parameter, and is dropped from the names of CTEs """
+    sql = ("WITH award_financial_c8_{0} AS (SELECT row_number, tas FROM award_financial WHERE submission_id = {0}) "
+           "SELECT row_number, tas FROM award_financial_c8_{0} WHERE submission_id = {}")
+    normalized = ruleCompiler.normalize_rule_sql(sql)
+    assert normalized == ("WITH award_financial_c8 AS (SELECT row_number, tas FROM award_financial "
+                          "WHERE submission_id = :submission_id) SELECT row_number, tas FROM award_financial_c8 "
+                          "WHERE submission_id = :submission_id")
+    assert ruleCompiler.normalize_rule_sql(normalized) == normalized
+
+
+def test_parse_row_local():
+    """ Simple rules on one table are row-local, with their qualifiers dropped and comments removed """
+    rule = ruleCompiler.parse_row_local("""
+        -- Comments are ignored, even if they mention a JOIN
+        SELECT
+            dafa.row_number,
+            dafa.business_types
+        FROM detached_award_financial_assistance AS dafa
+        WHERE dafa.submission_id = :submission_id
+            AND (dafa.business_types ~* '([A-X]).*\\1' OR dafa.business_types = 'select x from y where z')""")
+    assert rule.table == 'detached_award_financial_assistance'
+    assert rule.columns == ['business_types']
+    assert rule.condition == "(business_types ~* '([A-X]).*\\1' OR business_types = 'select x from y where z')"
+
+
+def test_parse_not_row_local():
+    """ Rules that look at other rows or tables, or that could get around the submission filter, run on their own """
+    not_row_local = [
+        # joins another table
+        "SELECT af.row_number, af.tas FROM award_financial AS af JOIN tas_lookup AS tl ON af.tas_id = tl.tas_id "
+        "WHERE af.submission_id = :submission_id AND tl.tas_id IS NULL",
+        # subquery
+        "SELECT row_number, tas FROM award_financial WHERE submission_id = :submission_id "
+        "AND tas NOT IN (SELECT tas FROM sf_133)",
+        # aggregate
+        "SELECT row_number, SUM(amount) AS total FROM award_financial WHERE submission_id = :submission_id "
+        "AND amount > 0",
+        # window function
+        "SELECT row_number, tas FROM award_financial WHERE submission_id = :submission_id "
+        "AND ROW_NUMBER() OVER () > 1",
+        # OR outside of parentheses
+        "SELECT row_number, tas FROM award_financial WHERE submission_id = :submission_id "
+        "AND tas IS NULL OR tas = ''",
+        # a fixed submission
+        "SELECT row_number, tas FROM award_financial WHERE submission_id = 6 AND tas IS NULL",
+        # expressions in the select list
+        "SELECT row_number, UPPER(tas) AS tas FROM award_financial WHERE submission_id = :submission_id "
+        "AND tas IS NULL",
+        # no row numbers
+        "SELECT tas FROM award_financial WHERE submission_id = :submission_id AND tas IS NULL",
+    ]
+    for sql in not_row_local:
+        assert ruleCompiler.parse_row_local(sql) is None, sql
+
+
+def test_compile_rules():
+    """ Row-local rules on the same table are fused into one query, a row-local rule alone on its table isn't """
+    rules = [
+        make_rule('a_1', "SELECT row_number, amount FROM award_financial WHERE submission_id = {} AND amount < 0"),
+        make_rule('a_2', "SELECT af.row_number, af.tas FROM award_financial AS af JOIN sf_133 AS sf "
+                         "ON af.tas = sf.tas WHERE af.submission_id = {}"),
+        make_rule('a_3', "SELECT row_number, tas, amount FROM award_financial WHERE submission_id = {0} AND tas = ''"),
+        make_rule('b_1', "SELECT row_number, tas FROM appropriation WHERE submission_id = {} AND tas IS NULL"),
+    ]
+    queries = ruleCompiler.compile_rules(rules)
+    assert [query.rules for query in queries] == [[rules[1]], [rules[0], rules[2]], [rules[3]]]
+    assert isinstance(queries[1], ruleCompiler.FusedRuleQuery)
+    assert queries[0].sql == ruleCompiler.normalize_rule_sql(rules[1].rule_sql)
+    assert queries[2].query_name == 'b_1'
+
+
+def test_fused_query_matches_rules():
+    """ Splitting the fused query's result gives the rows each rule returns when run on its own """
+    engine = sqlalchemy.create_engine('sqlite://')
+    engine.execute("CREATE TABLE award_financial (submission_id INTEGER, row_number INTEGER, tas TEXT, amount INTEGER)")
+    engine.execute("INSERT INTO award_financial VALUES (5, 2, 'a', 1), (5, 3, '', -1), (5, 4, NULL, -2), "
+                   "(5, 5, 'b', NULL), (6, 2, '', -1)")
+    rules = [
+        make_rule('a_1', "SELECT row_number, amount FROM award_financial WHERE submission_id = {} AND amount < 0"),
+        make_rule('a_2', "SELECT af.row_number, af.tas, af.amount FROM award_financial AS af "
+                         "WHERE af.submission_id = {0} AND (af.tas = '' OR af.amount IS NULL)"),
+        make_rule('a_3', "SELECT row_number FROM award_financial WHERE submission_id = {} AND tas = 'z'"),
+    ]
+    query, = ruleCompiler.compile_rules(rules)
+    result = engine.execute(sqlalchemy.text(query.sql), submission_id=5)
+    split = query.split(result.keys(), result.fetchall())
+
+    for rule, (cols, failures) in zip(rules, split):
+        expected = engine.execute(sqlalchemy.text(ruleCompiler.normalize_rule_sql(rule.rule_sql)),
+                                  submission_id=5)
+        assert cols == expected.keys()
+        assert sorted(tuple(failure[col] for col in cols) for failure in failures) == \
+            sorted(tuple(row) for row in expected)
+
+
+def test_is_preparable():
+    """ Single queries are prepared, scripts that set up helper functions first are run as they are """
+    assert validator.is_preparable("-- comment; with a semicolon\nSELECT row_number FROM appropriation "
+                                   "WHERE submission_id = :submission_id AND tas = ';';")
+    assert validator.is_preparable("WITH approp AS (SELECT * FROM appropriation) SELECT row_number FROM approp")
+    assert not validator.is_preparable("CREATE OR REPLACE function pg_temp.is_zero(numeric) returns integer AS $$ "
+                                       "BEGIN return 0; END; $$ LANGUAGE plpgsql; SELECT row_number FROM appropriation")
+
+
+def test_execute_rule_sql_prepares_once():
+    """ Rule queries are prepared the first time they run on a connection and executed from then on """
+    connection = Mock(spec=Connection, info={})
+    sql = "SELECT row_number FROM appropriation WHERE submission_id = :submission_id AND tas = ':submission_id'"
+    validator.execute_rule_sql(connection, sql, 5)
+    validator.execute_rule_sql(connection, sql, '6')
+
+    statements = [call[0][0] for call in connection.execute.call_args_list]
+    assert len(statements) == 3
+    name = statements[1].split()[1]
+    assert statements[0] == ("PREPARE {} (integer) AS SELECT row_number FROM appropriation WHERE submission_id = $1 "
+                             "AND tas = ':submission_id'".format(name))
+    assert statements[1:] == ['EXECUTE {} (5)'.format(name), 'EXECUTE {} (6)'.format(name)]
@@ -0,0 +1,63 @@
+from unittest.mock import Mock
+
+from dataactcore.models.validationModels import RuleExecutionStats
+from dataactvalidator.validation_handlers import ruleProfile
+from dataactvalidator.validation_handlers.ruleProfile import RuleProfile, plan_rows_scanned
+
+
+def make_profile(monkeypatch, stats=True, explain_rate=0):
+    monkeypatch.setitem(ruleProfile.CONFIG_BROKER, 'validator_rule_stats', stats)
+    monkeypatch.setitem(ruleProfile.CONFIG_BROKER, 'validator_rule_explain_rate', explain_rate)
+    return RuleProfile(submission_id=1, job_id=2, file_type_id=3, file_rows=100)
+
+
+def test_record_adds_up(monkeypatch):
+    """ Stats recorded for the same query add up, and labels are looked up by query name """
+    profile = make_profile(monkeypatch)
+    profile.add_rules([Mock(query_name='a1_appropriations', rule_label='A1')])
+    profile.record('fused_appropriation', duration=1.5, rows_returned=2)
+    profile.record('a1_appropriations', rows_returned=1)
+    profile.record('fused_appropriation', duration=0.5, rows_returned=3)
+    with profile.timer(profile.query_name('A1'), 'report_duration'):
+        pass
+
+    assert profile.order == ['fused_appropriation', 'a1_appropriations']
+    assert profile.stats['fused_appropriation'] == {'duration': 2.0, 'rows_returned': 5}
+    assert profile.stats['a1_appropriations']['rows_returned'] == 1
+    assert profile.stats['a1_appropriations']['report_duration'] >= 0
+    assert profile.query_name('unknown') == 'unknown'
+
+
+def test_save(monkeypatch):
+    """ Each query gets a row of stats, but only when the validator is set to keep them """
+    sess = Mock()
+    profile = make_profile(monkeypatch, stats=False, explain_rate=1)
+    profile.record('a1_appropriations', duration=1.0)
+    assert not profile.should_explain()
+    profile.save(sess)
+    assert not sess.bulk_insert_mappings.called
+
+    profile = make_profile(monkeypatch, explain_rate=1)
+    profile.add_rules([Mock(query_name='a1_appropriations', rule_label='A1')])
+    profile.record('a1_appropriations', duration=1.0, rows_returned=4)
+    assert profile.should_explain()
+    profile.save(sess)
+    sess.bulk_insert_mappings.assert_called_once_with(RuleExecutionStats, [{
+        'submission_id': 1, 'job_id': 2, 'query_name': 'a1_appropriations', 'rule_label': 'A1', 'file_type_id': 3,
+        'target_file_type_id': None, 'file_rows': 100, 'duration': 1.0, 'rows_returned': 4
+    }])
+
+
+def test_plan_rows_scanned():
+    """ Rows read by every scan in the plan are counted, including those the scan's filter dropped """
+    plan = {
+        'Node Type': 'Hash Join', 'Actual Rows': 10, 'Actual Loops': 1,
+        'Plans': [
+            {'Node Type': 'Seq Scan', 'Relation Name': 'appropriation', 'Actual Rows': 10,
+             'Rows Removed by Filter': 90, 'Actual Loops': 1},
+            {'Node Type': 'Hash', 'Actual Rows': 5, 'Actual Loops': 1, 'Plans': [
+                {'Node Type': 'Index Scan', 'Relation Name': 'sf_133', 'Actual Rows': 5, 'Actual Loops': 2}
+            ]}
+        ]
+    }
+    assert plan_rows_scanned(plan) == 110
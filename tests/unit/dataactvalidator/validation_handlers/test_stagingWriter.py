@@ -0,0 +1,89 @@
+from unittest.mock import Mock
+
+import psycopg2
+
+from dataactcore.models.stagingModels import Appropriation
+from dataactvalidator.validation_handlers import stagingWriter
+from dataactvalidator.validation_handlers.errorInterface import ErrorInterface
+from dataactvalidator.validation_handlers.validator import Failure
+from tests.unit.dataactcore.factories.job import JobFactory, SubmissionFactory
+
+
+def test_staging_writer_isolates_failed_rows(database):
+    """A row the database rejects should be recorded as a formatting error without losing the rest of its batch"""
+    sess = database.session
+    submission = SubmissionFactory()
+    sess.add(submission)
+    sess.commit()
+
+    writer = Mock()
+    callback = Mock()
+    error_list = ErrorInterface()
+    job = JobFactory()
+    staging_writer = stagingWriter.StagingWriter(Appropriation, job, writer, error_list, callback, batch_size=10)
+    for row_number in range(2, 7):
+        value = 'shoulda-been-a-number' if row_number == 4 else str(row_number)
+        staging_writer.write(row_number, {'submission_id': submission.submission_id, 'job_id': 1,
+                                          'row_number': row_number, 'adjustments_to_unobligated_cpe': value,
+                                          'agency_identifier': '020'}, [], [])
+    staging_writer.finish_batch()
+
+    assert sorted(row.row_number for row in sess.query(Appropriation)) == [2, 3, 5, 6]
+    # defaults normally applied by the ORM are still filled in
+    assert {row.tas for row in sess.query(Appropriation)} == {'00002000000000 0000000'}
+    assert staging_writer.error_rows == [4]
+    assert writer.write.call_args[0] == (
+        ['Formatting Error', 'Could not write this record into the staging table', 4, ''],
+    )
+    assert len(error_list.rowErrors) == 1
+    error = list(error_list.rowErrors.values())[0]
+    assert error['firstRow'] == 4
+    assert error['fieldName'] == 'Formatting Error'
+    assert error['filename'] == job.filename
+    assert not callback.called
+
+
+def test_staging_writer_reports_rows_in_order(monkeypatch):
+    """Failures are passed back in file order once the batch is written, skipping rows the database rejected"""
+    def fake_copy(sess, table, rows):
+        if any(row.get('bad') for row in rows):
+            raise psycopg2.DataError()
+    monkeypatch.setattr(stagingWriter, 'GlobalDB', Mock())
+    monkeypatch.setattr(stagingWriter, 'copy_into_table', fake_copy)
+
+    reported = []
+    written = []
+    staging_writer = stagingWriter.StagingWriter(Appropriation, JobFactory(), Mock(), ErrorInterface(),
+                                                 lambda row, failures: reported.append((row, failures)),
+                                                 batch_size=3,
+                                                 written_callback=lambda row, values: written.append(row))
+    failure = Failure('agency_identifier', 'Error', 'a', '', 'fatal')
+    staging_writer.write(2, {'row_number': 2}, [], [failure])
+    staging_writer.write(3, None, [], [failure])
+    staging_writer.write(4, {'row_number': 4, 'bad': True}, [], [failure])
+    assert reported == []
+    staging_writer.write(5, {'row_number': 5}, [], [failure])
+
+    assert reported == [(2, [failure]), (3, [failure]), (5, [failure])]
+    # only the rows that made it into the staging table are passed to the written callback
+    assert written == [2, 5]
+    assert staging_writer.error_rows == [4]
+    assert staging_writer.entries == []
+
+
+def test_copy_value():
+    assert stagingWriter.copy_value(None) == ''
+    assert stagingWriter.copy_value('') == '""'
+    assert stagingWriter.copy_value('say "hi", bye') == '"say ""hi"", bye"'
+    assert stagingWriter.copy_value(True) == '"True"'
+
+
+def test_fill_defaults():
+    """Python-side defaults are applied and unknown keys are dropped"""
+    values = {'agency_identifier': '020', 'valid_record': True, 'main_account_code': None}
+    row = stagingWriter.fill_defaults(Appropriation.__table__, values)
+    assert 'valid_record' not in row
+    assert 'appropriation_id' not in row
+    assert row['main_account_code'] is None
+    assert row['tas'] == '00002000000000 0000000'
+    assert row['created_at'] is not None
@@ -1,12 +1,10 @@
 from datetime import date
-from unittest.mock import Mock
 
 import pytest
 
 from dataactvalidator.validation_handlers import validationManager
-from dataactvalidator.validation_handlers.errorInterface import ErrorInterface
 from tests.unit.dataactcore.factories.domain import TASFactory
-from tests.unit.dataactcore.factories.job import JobFactory, SubmissionFactory
+from tests.unit.dataactcore.factories.job import SubmissionFactory
 from tests.unit.dataactcore.factories.staging import (AppropriationFactory, AwardFinancialFactory,
                                                       ObjectClassProgramActivityFactory)
 
@@ -23,7 +21,7 @@ def test_update_tas_ids_has_match_open_ended(database, factory):
     sess = database.session
     submission = SubmissionFactory(reporting_start_date=date(2010, 10, 1), reporting_end_date=date(2010, 10, 1))
     sess.add(submission)
-    sess.flush()
+    sess.commit()
     tas = TASFactory(internal_start_date=date(2010, 9, 1))
     model = factory(submission_id=submission.submission_id, **tas.component_dict())
     assert model.tas_id is None
@@ -43,7 +41,7 @@ def test_update_tas_ids_has_match_closed(database, factory):
     sess = database.session
     submission = SubmissionFactory(reporting_start_date=date(2010, 10, 10), reporting_end_date=date(2010, 10, 31))
     sess.add(submission)
-    sess.flush()
+    sess.commit()
     tas = TASFactory(internal_start_date=date(2010, 9, 1), internal_end_date=date(2010, 10, 15))
     model = factory(submission_id=submission.submission_id, **tas.component_dict())
     assert model.tas_id is None
@@ -62,7 +60,7 @@ def test_update_tas_ids_no_match(database, factory):
     sess = database.session
     submission = SubmissionFactory(reporting_start_date=date(2010, 10, 10), reporting_end_date=date(2010, 10, 31))
     sess.add(submission)
-    sess.flush()
+    sess.commit()
     tas = TASFactory(internal_start_date=date(2010, 9, 1))
     # note these will have different fields
     model = factory(submission_id=submission.submission_id)
@@ -83,7 +81,7 @@ def test_update_tas_ids_bad_dates(database, factory):
     sess = database.session
     submission = SubmissionFactory(reporting_start_date=date(2010, 10, 1), reporting_end_date=date(2010, 10, 1))
     sess.add(submission)
-    sess.flush()
+    sess.commit()
     tas = TASFactory(internal_start_date=date(2011, 1, 1))
     model = factory(submission_id=submission.submission_id, **tas.component_dict())
     assert model.tas_id is None
@@ -94,20 +92,3 @@ def test_update_tas_ids_bad_dates(database, factory):
 
     model = sess.query(model.__class__).one()   # we'll only have one entry
     assert model.tas_id is None
-
-
-@pytest.mark.usefixtures('database')
-def test_insert_staging_model_failure():
-    writer = Mock()
-    error_list = ErrorInterface()
-    model = AppropriationFactory(row_number=1234, adjustments_to_unobligated_cpe='shoulda-been-a-number')
-    job = JobFactory()
-    assert not validationManager.insert_staging_model(model, job, writer, error_list)
-    assert writer.write.call_args[0] == (
-        ['Formatting Error', 'Could not write this record into the staging table', 1234, ''],
-    )
-    assert len(error_list.rowErrors) == 1
-    error = list(error_list.rowErrors.values())[0]
-    assert error['firstRow'] == 1234
-    assert error['fieldName'] == 'Formatting Error'
-    assert error['filename'] == job.filename
@@ -1,6 +1,10 @@
-from unittest.mock import Mock
+import threading
+import time
+from unittest.mock import MagicMock, Mock
 
+from dataactcore.models.lookups import FIELD_TYPE_DICT, FILE_TYPE_DICT
 from dataactcore.models.stagingModels import FlexField
+from dataactcore.models.validationModels import FileColumn
 from dataactvalidator.validation_handlers import validator
 from tests.unit.dataactcore.factories.job import JobFactory, SubmissionFactory
 
@@ -24,7 +28,7 @@ def test_relevant_flex_data(database):
     sess.commit()
 
     failures = [{'row_number': 3}, {'row_number': 7}]
-    result = validator.relevant_flex_data(failures, jobs[0].job_id)
+    result = validator.relevant_flex_data(failures, jobs[0].job_id, jobs[0].submission_id)
     assert {3, 7} == set(result.keys())
     assert len(result[3]) == 3
     # spot check some of the values
@@ -45,3 +49,87 @@ def test_failure_row_to_tuple_flex():
     result = validator.failure_row_to_tuple(Mock(), flex_data, [], [], Mock(), {'row_number': 2})
     assert result.field_name == 'A, B'
     assert result.failed_value == 'A: a, B: b'
+
+
+def test_run_rule_queries_keeps_order(monkeypatch):
+    """Rules run concurrently on separate connections, but results come back in rule order"""
+    monkeypatch.setattr(validator, 'GlobalDB', MagicMock())
+    lock = threading.Lock()
+    running = {'now': 0, 'max': 0}
+
+    def run_rule(connection, number):
+        with lock:
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+        # make earlier rules finish last
+        time.sleep(0.01 * (10 - number))
+        with lock:
+            running['now'] -= 1
+        return number * 2
+
+    results = validator.run_rule_queries([(number,) for number in range(10)], run_rule, max_workers=3)
+    assert results == [number * 2 for number in range(10)]
+    assert 1 < running['max'] <= 3
+
+
+def test_run_rule_queries_sequential(monkeypatch):
+    """With a single worker, every rule runs on the current session"""
+    db = Mock()
+    monkeypatch.setattr(validator, 'GlobalDB', Mock(db=Mock(return_value=db)))
+    connections = []
+
+    def run_rule(connection, number):
+        connections.append(connection)
+        return number
+
+    assert validator.run_rule_queries([(1,), (2,)], run_rule, max_workers=1) == [1, 2]
+    assert connections == [db.session, db.session]
+    assert not db.engine.connect.called
+
+
+def test_cross_validate_sql_with_rule_results():
+    """Failures can be built from rule results computed elsewhere, looking up flex fields on the given connection"""
+    approp_id, program_id = FILE_TYPE_DICT['appropriations'], FILE_TYPE_DICT['program_activity']
+    rule = Mock(file_id=approp_id, target_file_id=program_id, rule_error_message='Bad agency', rule_label='A1',
+                rule_severity_id=1)
+    connection = Mock()
+    connection.execute.return_value = [Mock(row_number=2, header='flex_a', cell='x', file_type_id=approp_id)]
+    rule_results = [(['row_number', 'agency_identifier'], [{'row_number': 2, 'agency_identifier': '020'}])]
+
+    failures = validator.cross_validate_sql([rule], 1, {'agency_identifier': 'agencyidentifier'}, approp_id,
+                                            program_id, None, rule_results, connection)
+    assert failures == [['appropriations', 'program_activity', 'agencyidentifier, flex_a_filea', 'Bad agency',
+                         'agencyidentifier: 020, flex_a_filea: x', 2, 'A1', approp_id, program_id, 1]]
+    assert connection.execute.call_count == 1
+
+
+def batch_schema():
+    return {
+        'amount': FileColumn(name='amount', required=True, field_types_id=FIELD_TYPE_DICT['DECIMAL'], length=None),
+        'count': FileColumn(name='count', required=False, field_types_id=FIELD_TYPE_DICT['INT'], length=None),
+        'flag': FileColumn(name='flag', required=False, field_types_id=FIELD_TYPE_DICT['BOOLEAN'], length=None),
+        'code': FileColumn(name='code', required=False, field_types_id=FIELD_TYPE_DICT['STRING'], length=3)
+    }
+
+
+def test_batch_validator_matches_validate():
+    """Every record gets the same result from the batch validator as from Validator.validate"""
+    schema = batch_schema()
+    records = [
+        {'amount': '1.5', 'count': '2', 'flag': 'yes', 'code': 'abc', 'row_number': 2},
+        {'amount': 'x', 'count': ' 3 ', 'flag': 'maybe', 'code': 'abcd', 'row_number': 3},
+        {'amount': '', 'count': None, 'flag': '', 'code': None, 'row_number': 4},
+        {'amount': ' ', 'count': '1.5', 'flag': None, 'code': ' ab ', 'row_number': 5},
+        {'amount': '3', 'count': 'a', 'flag': '0', 'code': 'toolong', 'row_number': 6},
+        {'count': '1', 'row_number': 7},
+        {'code': 'abcd', 'amount': '1', 'row_number': 8}
+    ]
+    for fabs_record in (False, True):
+        expected = [validator.Validator.validate(record, schema, fabs_record) for record in records]
+        assert validator.BatchValidator(schema, fabs_record).validate(records) == expected
+
+    passed, failures, valid = validator.BatchValidator(schema).validate(records)[1]
+    assert not passed and not valid
+    assert [(failure.field, failure.severity) for failure in failures] == [
+        ('amount', 'fatal'), ('flag', 'fatal'), ('code', 'warning')]
+    assert validator.BatchValidator(schema).validate([]) == []